@@ -1,6 +1,10 @@
 from .service import Service  # noqa: F401
 from .app import GrpcKitApp  # noqa: F401
 from .globals import current_app, g, request  # noqa: F401
+from .batch import BatchPolicy  # noqa: F401
+from .cache import TTL  # noqa: F401
+from .limit import ConcurrencyLimit  # noqa: F401
+from .executor import PriorityExecutor  # noqa: F401
 
 __version__ = "0.1.7"
 
@@ -1,17 +1,36 @@
-from typing import Dict, Optional, Callable, List, Any, Type
+from typing import Dict, Optional, Callable, List, Any, Tuple, Type, Union
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ThreadPoolExecutor
 from functools import cached_property
+import asyncio
 import os
+import signal
 import sys
 import inspect
 import logging
+import threading
+import time
 
 import grpc
 
 from .constant import (
+    K_GRPCKIT_ADAPTIVE_LIMIT,
+    K_GRPCKIT_ADAPTIVE_LIMIT_INITIAL,
+    K_GRPCKIT_ADAPTIVE_LIMIT_LATENCY_MS,
+    K_GRPCKIT_ADAPTIVE_LIMIT_MAX,
+    K_GRPCKIT_ADAPTIVE_LIMIT_MIN,
+    K_GRPCKIT_ADAPTIVE_LIMIT_STATUS,
     K_GRPCKIT_DEBUG,
+    K_GRPCKIT_EXECUTOR_STATS,
+    K_GRPCKIT_HEALTH,
+    K_GRPCKIT_HEALTH_MAX_WATCHERS,
+    K_GRPCKIT_LIGHTWEIGHT_ROUTES,
+    K_GRPCKIT_MAXIMUM_CONCURRENT_RPCS,
     K_GRPCKIT_MAX_WORKERS,
+    K_GRPCKIT_PARSER_ENGINE,
+    K_GRPCKIT_PRIORITY_LANES,
+    K_GRPCKIT_PROCESS_START_METHOD,
+    K_GRPCKIT_PROCESS_WORKERS,
     K_GRPCKIT_LOG_FORMAT,
     K_GRPCKIT_LOG_HANDLER,
     K_GRPCKIT_LOG_LEVEL,
@@ -19,20 +38,45 @@ from .constant import (
     K_GRPCKIT_PROMETHEUS_PORT,
     K_GRPCKIT_TLS_CA_CERT,
     K_GRPCKIT_SERVICE_SCAN_DIR,
+    K_GRPCKIT_SHUTDOWN_GRACE,
+    K_GRPCKIT_SO_REUSEPORT,
+    K_GRPCKIT_WORKERS,
+    K_GRPCKIT_WORKER_ID,
     K_GRPCKIT_TLS_SERVER_KEY,
     K_GRPCKIT_TLS_SERVER_CERT,
 )
 from .config import Config
 from .service import Service
-from .interceptor import MiddlewareInterceptor, RpcExceptionInterceptor
+from .route import uses_context
+from .executor import AdmissionExecutor, InstrumentedExecutor, PriorityExecutor
+from .health import SERVING, HealthServicer
+from .limit import AdaptiveLimiter, ConcurrencyLimit
+from .prefork import Supervisor
+from .process import (
+    PROCESS_POOL_DEFAULT,
+    add_process_pool,
+    has_process_pool_started,
+    set_process_start_method,
+    shutdown_process_pools,
+)
+from .interceptor import (
+    AdaptiveLimitInterceptor,
+    AsyncAdaptiveLimitInterceptor,
+    AsyncPipelineInterceptor,
+    PipelineInterceptor,
+)
 from .ctx import AppContext, RequestContext
-from .utils.proto import scan_pb_grpc
+from .utils.proto import scan_pb_grpc, scan_service_descriptors, precompile_pb_models
+from .utils.parser import PARSER_ENGINE_DESCRIPTOR, set_parser_engine
 from .utils import has_level_handler
 
 
 # a singleton sentinel value for parameter defaults
 _sentinel = object()
 
+# seconds after the first stop signal in which a repeated one doesn't stop at once
+_REPEATED_SIGNAL_INTERVAL = 1.0
+
 
 class GrpcKitApp:
 
@@ -44,6 +88,10 @@ class GrpcKitApp:
 
     default_config = {
         K_GRPCKIT_MAX_WORKERS: 10,
+        K_GRPCKIT_PRIORITY_LANES: None,
+        K_GRPCKIT_PROCESS_WORKERS: None,
+        K_GRPCKIT_PROCESS_START_METHOD: "spawn",
+        K_GRPCKIT_EXECUTOR_STATS: False,
         K_GRPCKIT_DEBUG: False,
         K_GRPCKIT_SERVICE_SCAN_DIR: ".",
         K_GRPCKIT_LOG_LEVEL: "WARNING",
@@ -51,6 +99,20 @@ class GrpcKitApp:
         K_GRPCKIT_LOG_FORMAT: "[%(asctime)s %(levelname)s in %(module)s] %(message)s",
         K_GRPCKIT_PROMETHEUS_SCRAPE: False,
         K_GRPCKIT_PROMETHEUS_PORT: 9091,
+        K_GRPCKIT_PARSER_ENGINE: PARSER_ENGINE_DESCRIPTOR,
+        K_GRPCKIT_MAXIMUM_CONCURRENT_RPCS: None,
+        K_GRPCKIT_SO_REUSEPORT: None,
+        K_GRPCKIT_SHUTDOWN_GRACE: 10,
+        K_GRPCKIT_HEALTH: True,
+        K_GRPCKIT_HEALTH_MAX_WATCHERS: 2,
+        K_GRPCKIT_LIGHTWEIGHT_ROUTES: False,
+        K_GRPCKIT_WORKERS: 1,
+        K_GRPCKIT_ADAPTIVE_LIMIT: False,
+        K_GRPCKIT_ADAPTIVE_LIMIT_INITIAL: 20,
+        K_GRPCKIT_ADAPTIVE_LIMIT_MIN: 1,
+        K_GRPCKIT_ADAPTIVE_LIMIT_MAX: 1000,
+        K_GRPCKIT_ADAPTIVE_LIMIT_LATENCY_MS: 100,
+        K_GRPCKIT_ADAPTIVE_LIMIT_STATUS: "UNAVAILABLE",
     }
 
     def __init__(self, name=None, threadpool=None):
@@ -66,15 +128,183 @@ class GrpcKitApp:
         self.interceptors = {}
         self.teardown_app_context_funcs: List[Callable] = []
         self.teardown_request_context_funcs: List[Callable] = []
+        self.shutdown_funcs: List[Callable] = []
+        self.exception_handlers: Dict[Type[Exception], Callable] = dict()
         self._threadpool = threadpool
         self._extensions = {}
-
-    def run(self, host: Optional[str] = None, port: Optional[int] = None, **kwargs: Any) -> None:
-        # run prometheus client
+        # `add_xServicer_to_server` functions, filled by scanning pb models
+        self._register_funcs: Optional[Dict[str, Callable]] = None
+        self._service_descriptors: Dict[str, Any] = dict()
+        self._message_classes: Dict[str, Any] = dict()
+        # request context, middlewares and exception mapping fused per method
+        self._pipeline: Optional[PipelineInterceptor] = None
+        # server wide admission control, created by `GRPCKIT_ADAPTIVE_LIMIT`
+        self.adaptive_limiter: Optional[AdaptiveLimiter] = None
+
+        # running server, and its event loop in asyncio mode
+        self._server = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # False while the server is not started or is draining
+        self.serving = False
+        # when the stop signal which started draining arrived
+        self._signalled_at: Optional[float] = None
+        # status of services, reported by grpc.health.v1.Health
+        self.health = HealthServicer()
+        # names of services reported by health, both short and full names
+        self._health_names: List[str] = [""]
+
+    def _prepare_run(self) -> None:
+        # run prometheus client, every pre-fork worker serves its own metrics on the port
+        # next to the previous one's, `GRPCKIT_PROMETHEUS_PORT` + index of worker
         if self.config.get(K_GRPCKIT_PROMETHEUS_SCRAPE):
             from prometheus_client import start_http_server
 
-            start_http_server(self.config[K_GRPCKIT_PROMETHEUS_PORT])
+            port = self.config[K_GRPCKIT_PROMETHEUS_PORT]
+            start_http_server(port + int(os.environ.get(K_GRPCKIT_WORKER_ID, 0)))
+
+        # dict <-> protobuf conversion engine, `json` falls back to the JSON round-trip
+        set_parser_engine(self.config.get(K_GRPCKIT_PARSER_ENGINE, PARSER_ENGINE_DESCRIPTOR))
+
+        # thread pools are only instrumented when their stats are asked for
+        instrument = self.config.get(K_GRPCKIT_EXECUTOR_STATS) or self.config.get(
+            K_GRPCKIT_PROMETHEUS_SCRAPE
+        )
+        if not self._threadpool:
+            max_workers = self.config.get(K_GRPCKIT_MAX_WORKERS, 10)
+            lanes = self.config.get(K_GRPCKIT_PRIORITY_LANES)
+            if lanes:
+                # lanes from the highest to the lowest, picked by `x-priority` metadata
+                self._threadpool = PriorityExecutor(max_workers=max_workers, lanes=lanes)
+            else:
+                self._threadpool = ThreadPoolExecutor(max_workers=max_workers)
+                if instrument:
+                    self._threadpool = InstrumentedExecutor(self._threadpool, max_workers)
+        if instrument:
+            for service in self._services.values():
+                if isinstance(service.executor, ThreadPoolExecutor):
+                    service.executor = InstrumentedExecutor(service.executor)
+
+        # process pools are started lazily and shut down when the server terminates
+        set_process_start_method(self.config.get(K_GRPCKIT_PROCESS_START_METHOD, "spawn"))
+        process_workers = self.config.get(K_GRPCKIT_PROCESS_WORKERS)
+        if process_workers and not has_process_pool_started(PROCESS_POOL_DEFAULT):
+            add_process_pool(PROCESS_POOL_DEFAULT, process_workers)
+
+        if self.config.get(K_GRPCKIT_ADAPTIVE_LIMIT) and self.adaptive_limiter is None:
+            self.adaptive_limiter = AdaptiveLimiter(
+                initial_limit=self.config.get(K_GRPCKIT_ADAPTIVE_LIMIT_INITIAL, 20),
+                min_limit=self.config.get(K_GRPCKIT_ADAPTIVE_LIMIT_MIN, 1),
+                max_limit=self.config.get(K_GRPCKIT_ADAPTIVE_LIMIT_MAX, 1000),
+                latency_threshold_ms=self.config.get(K_GRPCKIT_ADAPTIVE_LIMIT_LATENCY_MS, 100),
+            )
+            if self.config.get(K_GRPCKIT_PROMETHEUS_SCRAPE):
+                from prometheus_client import Gauge
+
+                limiter = self.adaptive_limiter
+                Gauge("grpckit_adaptive_limit", "Current limit of concurrent RPCs").set_function(
+                    lambda: limiter.limit
+                )
+                Gauge(
+                    "grpckit_adaptive_in_flight", "Concurrent RPCs admitted by adaptive limit"
+                ).set_function(lambda: limiter.in_flight)
+
+    def _limit_interceptors(self, aio: bool = False) -> tuple:
+        """Adaptive limit interceptor, which is the most outer one"""
+        if self.adaptive_limiter is None:
+            return ()
+        code = getattr(
+            grpc.StatusCode, self.config.get(K_GRPCKIT_ADAPTIVE_LIMIT_STATUS, "UNAVAILABLE")
+        )
+        if aio:
+            return (AsyncAdaptiveLimitInterceptor(self.adaptive_limiter, code),)
+        return (AdaptiveLimitInterceptor(self.adaptive_limiter, code),)
+
+    def _pipeline_interceptors(self, aio: bool = False) -> tuple:
+        """Build the fused pipeline, which is wrapped into the handlers of services at bind
+        time. It's only installed as interceptor for the services registered by
+        `add_xServicer_to_server`, or to keep the custom interceptors inside request context.
+        """
+        self._load_pb_models()
+        self._pipeline = (AsyncPipelineInterceptor if aio else PipelineInterceptor)(
+            self,
+            self.before_request_funcs.get(None, ()),
+            self.after_request_funcs.get(None, ()),
+            self.exception_handlers,
+            resolve_chains=self._request_hooks,
+            resolve_lightweight=self._is_lightweight,
+        )
+        if self.interceptors.get(None) or any(
+            name not in self._service_descriptors for name in self._services
+        ):
+            return (self._pipeline,)
+        return ()
+
+    def _lookup_method(self, method: str) -> Tuple[Optional[Service], str]:
+        """Service and method name of full method name "/package.Service/Method" """
+        _, service_name, method_name = method.split("/")
+        return self._services.get(service_name.rsplit(".", 1)[-1]), method_name
+
+    def _request_hooks(self, method: str) -> Tuple[List[Callable], List[Callable]]:
+        """Before and after request funcs of full method name, resolved once per method:
+        before funcs run from app to service to route, and after funcs from route to
+        service to app.
+        """
+        before = list(self.before_request_funcs.get(None, ()))
+        after = []
+        service, method_name = self._lookup_method(method)
+        if service is not None:
+            name = service.name
+            before.extend(self.before_request_funcs.get(name, ()))
+            service_before, service_after = service.request_hooks(method_name)
+            before.extend(service_before)
+            after.extend(service_after)
+            after.extend(self.after_request_funcs.get(name, ()))
+        after.extend(self.after_request_funcs.get(None, ()))
+        return before, after
+
+    def _is_lightweight(self, method: str) -> bool:
+        """Whether the route of full method name is served without request context.
+        Explicit `lightweight` of route wins, otherwise with `GRPCKIT_LIGHTWEIGHT_ROUTES`
+        it's inferred: no request hooks and teardown funcs, and the route function itself
+        does not refer `request`, `g` or `current_app`.
+        """
+        service, method_name = self._lookup_method(method)
+        route = service.get_route(method_name) if service is not None else None
+        if route is None:
+            return False
+        if route.lightweight is not None:
+            return route.lightweight
+        if not self.config.get(K_GRPCKIT_LIGHTWEIGHT_ROUTES):
+            return False
+        if self.teardown_request_context_funcs or self.teardown_app_context_funcs:
+            return False
+        if any(self._request_hooks(method)):
+            return False
+        return not uses_context(route.func)
+
+    def _run_workers(self, workers: int, target: Callable[[], None]) -> None:
+        """Load routes and pb models, then fork `workers` processes which bind the same
+        address with SO_REUSEPORT, the supervisor restarts dead workers and forwards signals.
+        """
+        self.config[K_GRPCKIT_SO_REUSEPORT] = True
+        self._load_pb_models()
+        Supervisor(target, workers, logger=self.logger).run()
+
+    def run(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        workers: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Run server, with `workers` > 1 (or `GRPCKIT_WORKERS`) run a pre-fork server
+        of multiple processes.
+        """
+        workers = workers or self.config.get(K_GRPCKIT_WORKERS, 1)
+        if workers > 1:
+            return self._run_workers(workers, lambda: self.run(host, port, workers=1, **kwargs))
+
+        self._prepare_run()
 
         options = self.config.rpc_options()
         """With RpcExceptionInterceptor as the most inner interceptor,
@@ -97,40 +327,161 @@ class GrpcKitApp:
         Updated Handler A Returns Response ->
         """
         interceptors = (
-            RpcExceptionInterceptor(self),
-            MiddlewareInterceptor(
-                self.before_request_funcs.get(None, ()),
-                self.after_request_funcs.get(None, ()),
-            ),
+            *self._limit_interceptors(),
+            *self._pipeline_interceptors(),
             *self.interceptors.get(None, ()),
         )
 
-        max_workers = self.config.get(K_GRPCKIT_MAX_WORKERS, 10)
-
-        if not self._threadpool:
-            self._threadpool = ThreadPoolExecutor(max_workers=max_workers)
+        pool = self._threadpool
+        if self.adaptive_limiter is not None:
+            # shed calls skip the queue of server pool, and the slots of calls which never
+            # reach their handler are released
+            pool = AdmissionExecutor(pool)
         server = grpc.server(
-            self._threadpool,
+            pool,
             interceptors=interceptors,
             options=options,
+            maximum_concurrent_rpcs=self.config.get(K_GRPCKIT_MAXIMUM_CONCURRENT_RPCS),
         )
 
         # Bind service to gRPC server
         self._bind_service(server)
         # Enable health checking
-        # self._enable_health(server)
+        self._enable_health(server)
 
         address = "%s:%s" % (host or "[::]", port or 50051)
         server = self._bind_port(server, address, **kwargs)
         server.start()
+        self._server, self.serving = server, True
+        self._set_health(SERVING)
         print("start server", address)
 
         # self.log.info(
         #     f"Running on {address} (Press CTRL+C to quit)"
         # )  # pylint: disable=no-member
-        server.wait_for_termination()
+        handlers = self._install_signal_handlers()
+        try:
+            server.wait_for_termination()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            if pool is not self._threadpool:
+                pool.shutdown(wait=False)
+            self._shutdown()
         # self.log.info("gRPC server stopped!")
 
+    def run_async(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        workers: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Run server on asyncio event loop, `async def` routes are awaited directly
+        and plain routes are run in the threadpool. `workers` works the same as `run`.
+        """
+        workers = workers or self.config.get(K_GRPCKIT_WORKERS, 1)
+        if workers > 1:
+            return self._run_workers(
+                workers, lambda: self.run_async(host, port, workers=1, **kwargs)
+            )
+
+        asyncio.run(self.serve_async(host, port, **kwargs))
+
+    async def serve_async(
+        self, host: Optional[str] = None, port: Optional[int] = None, **kwargs: Any
+    ) -> None:
+        """Start asyncio server and wait for termination, to be awaited in a running loop"""
+        self._prepare_run()
+
+        options = self.config.rpc_options()
+        interceptors = (
+            *self._limit_interceptors(aio=True),
+            *self._pipeline_interceptors(aio=True),
+            *self.interceptors.get(None, ()),
+        )
+        server = grpc.aio.server(
+            migration_thread_pool=self._threadpool,
+            interceptors=interceptors,
+            options=options,
+            maximum_concurrent_rpcs=self.config.get(K_GRPCKIT_MAXIMUM_CONCURRENT_RPCS),
+        )
+
+        self._bind_service(server, aio=True)
+        self._enable_health(server, aio=True)
+
+        address = "%s:%s" % (host or "[::]", port or 50051)
+        server = self._bind_port(server, address, **kwargs)
+        await server.start()
+        self._server, self._loop, self.serving = server, asyncio.get_running_loop(), True
+        self._set_health(SERVING)
+        print("start server", address)
+
+        signums = self._install_signal_handlers(self._loop)
+        try:
+            await server.wait_for_termination()
+        finally:
+            for signum in signums:
+                self._loop.remove_signal_handler(signum)
+            self._shutdown()
+
+    def _install_signal_handlers(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Stop gracefully on SIGTERM/SIGINT, only possible in the main thread"""
+        if threading.current_thread() is not threading.main_thread():
+            return dict()
+        if loop is not None:
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(signum, self._handle_signal, signum)
+            return dict.fromkeys((signal.SIGTERM, signal.SIGINT))
+        return {
+            signum: signal.signal(signum, self._handle_signal)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+    def _handle_signal(self, signum: int, frame: Any = None) -> None:
+        # the second signal cancels in-flight RPCs at once, unless it follows the first one
+        # within a second, like a signal of the process group which the pre-fork supervisor
+        # forwards to the workers again
+        now = time.monotonic()
+        if self.serving:
+            self._signalled_at = now
+            self.stop()
+        elif self._signalled_at is None or now - self._signalled_at >= _REPEATED_SIGNAL_INTERVAL:
+            self.stop(grace=0)
+
+    def stop(self, grace: Optional[float] = None):
+        """Stop server gracefully, new RPCs are rejected and health reports NOT_SERVING,
+        in-flight RPCs are given `grace` seconds (default `GRPCKIT_SHUTDOWN_GRACE`) to finish.
+        Return an event (or a future in asyncio mode) which is done when the server is stopped.
+        """
+        server = self._server
+        if server is None:
+            return None
+        if grace is None:
+            grace = self.config.get(K_GRPCKIT_SHUTDOWN_GRACE)
+        if self.serving:
+            self.serving = False
+            self.health.enter_graceful_shutdown()
+            self.logger.warning("Stopping server, waiting %ss for in-flight RPCs", grace)
+        if self._loop is not None:
+            return asyncio.run_coroutine_threadsafe(server.stop(grace), self._loop)
+        return server.stop(grace)
+
+    def _shutdown(self) -> None:
+        """Release the resources of app after the server is terminated"""
+        self._server, self._loop, self.serving = None, None, False
+        self._signalled_at = None
+        self.health.stop()
+        try:
+            shutdown_process_pools()
+        finally:
+            with self.app_context():
+                for func in reversed(self.shutdown_funcs):
+                    func()
+                for ext in self._extensions.values():
+                    if hasattr(ext, "shutdown"):
+                        ext.shutdown(self)
+
     def before_request(self, func: Callable) -> Callable:
         self.before_request_funcs.setdefault(None, []).append(func)
         return func
@@ -175,15 +526,57 @@ class GrpcKitApp:
         server.add_secure_port(address, credentials)
         return server
 
-    def register_service(self, service: Service) -> None:
+    def register_service(
+        self,
+        service: Service,
+        concurrency: Union[int, ConcurrencyLimit, None] = None,
+        executor: Optional[Executor] = None,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+    ) -> None:
+        """Register service, `concurrency` bounds the concurrent calls of all its methods.
+        With `executor` or `max_workers`, plain handlers of service run on a dedicated pool,
+        isolated from the other services. Both need the service descriptor, the server fails
+        to start if the service is only bound by `add_xServicer_to_server`.
+        On sync server, at most `max_queue` (default 0) calls wait for the busy pool, holding
+        the threads of server, the others are rejected with `RESOURCE_EXHAUSTED`.
+        """
         if not service or not isinstance(service, Service):
             raise ValueError("Invalid service to register!")
 
         if self._services.get(service.name):
             raise AssertionError(f"Service is overwriting and existing: {service.name}")
 
+        if concurrency is not None:
+            service.limit = ConcurrencyLimit.of(concurrency, name=service.name)
+        if executor is None and max_workers:
+            executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix=f"grpckit-{service.name}"
+            )
+        if executor is not None:
+            service.executor = executor
+        if max_queue is not None:
+            service.max_queue = max_queue
         self._services[service.name] = service
 
+    def add_process_pool(self, name: str, max_workers: Optional[int] = None) -> None:
+        """Add named process pool for `@svc.route(executor=name)`, it's started lazily
+        and shut down when the server terminates.
+        """
+        add_process_pool(name, max_workers)
+
+    def executor_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Utilisation and queue length of the server pool and the pools of services,
+        thread pools are counted with `GRPCKIT_EXECUTOR_STATS` or prometheus scrape enabled.
+        """
+        rv = dict()
+        if hasattr(self._threadpool, "stats"):
+            rv[self.name] = self._threadpool.stats
+        for name, service in self._services.items():
+            if hasattr(service.executor, "stats"):
+                rv[name] = service.executor.stats
+        return rv
+
     def legacy_route(self, method: Optional[str] = None, service: Optional[str] = None) -> Callable:
         def decorator(func: Callable) -> Callable:
             if not service:
@@ -221,25 +614,97 @@ class GrpcKitApp:
             return decorator
         return decorator(func)
 
-    def _bind_service(self, server: grpc.Server) -> None:
+    def _load_pb_models(self) -> None:
+        """Scan pb models and compile their conversion plans, only once"""
+        if self._register_funcs is not None:
+            return
+
         register_funcs, pb_request_models = scan_pb_grpc(
             path=self.config.get(K_GRPCKIT_SERVICE_SCAN_DIR, "."),
             import_request_model=True,
         )
 
         self._register_funcs = register_funcs
+        for k, v in pb_request_models.items():
+            self._pb_request_models[k] = v
+
+        # compile conversion plans before serving, keep the first request fast
+        precompile_pb_models(pb_models=self._pb_request_models)
+        self._service_descriptors, self._message_classes = scan_service_descriptors(
+            self._pb_request_models
+        )
+
+    def _enable_health(self, server: grpc.Server, aio: bool = False) -> None:
+        """Register grpc.health.v1.Health, which bypasses middlewares and exception handlers"""
+        if not self.config.get(K_GRPCKIT_HEALTH):
+            return
+        handler = self.health.generic_handler(
+            aio=aio, max_watchers=self.config.get(K_GRPCKIT_HEALTH_MAX_WATCHERS)
+        )
+        server.add_generic_rpc_handlers((handler,))
+
+    def _set_health(self, status: int) -> None:
+        """Set status of the server and all services, then start the background checks"""
+        if not self.config.get(K_GRPCKIT_HEALTH):
+            return
+        for name in self._health_names:
+            self.health.set_status(name, status)
+        self.health.start()
+
+    def add_health_check(
+        self, func: Callable[[], Any], service: str = "", interval: float = 10
+    ) -> Callable:
+        """Register check of health, `func` runs every `interval` seconds in background and
+        returns a bool or a status of `service` ("" is the whole server). Probes only read
+        the latest result. Could be used as decorator and by extensions in `init_app`.
+        """
+        self.health.add_check(func, service, interval)
+        return func
+
+    def _bind_service(self, server: grpc.Server, aio: bool = False) -> None:
+        self._load_pb_models()
+        self._health_names = [""]
+
+        # custom interceptors are kept inside the pipeline, it can't be fused into handlers
+        wrap = None if self.interceptors.get(None) else self._pipeline.wrap
         for name, instance in self._services.items():
             if not isinstance(instance, Service):
                 raise TypeError(f"Service instance type must be `Service`, Please check: {name}")
 
+            descriptor = self._service_descriptors.get(name)
             func = self._register_funcs.get("add_%sServicer_to_server" % name)
-            if not func:
+            if not descriptor and not func:
                 raise ValueError(f"Can't find service '{name}' info from ProtoBuf files!")
-            # Use add_xServicer_to_server function in ProtoBuf to bind
-            # service to gRPC server
-            func(instance, server)
-            for k, v in pb_request_models.items():
-                self._pb_request_models[k] = v
+            self._health_names.append(name)
+            if descriptor and descriptor.full_name != name:
+                self._health_names.append(descriptor.full_name)
+            # resolve pb models and arguments of routes, fail fast if anything is missing
+            instance.compile(self._pb_request_models)
+            if descriptor:
+                # Register compiled handlers from service descriptor directly
+                server.add_generic_rpc_handlers(
+                    (
+                        instance.generic_handler(
+                            descriptor,
+                            self._message_classes,
+                            aio=aio,
+                            executor=self._threadpool,
+                            wrap=wrap,
+                        ),
+                    )
+                )
+            else:
+                # the generated servicer binding knows nothing about the streaming of methods,
+                # so the service limit and executor can't be applied to its handlers
+                if instance.limit is not None or instance.executor is not None:
+                    raise ValueError(
+                        f"Service '{name}' is bound by add_{name}Servicer_to_server without "
+                        "service descriptor, `concurrency` and `executor` of service are not "
+                        "supported there"
+                    )
+                # Use add_xServicer_to_server function in ProtoBuf to bind
+                # service to gRPC server
+                func(instance, server)
 
     def _is_ext(self, ins):
         return not inspect.isclass(ins) and hasattr(ins, "init_app")
@@ -304,8 +769,8 @@ class GrpcKitApp:
     def debug(self, value: bool) -> None:
         self.config[K_GRPCKIT_DEBUG] = value
 
-    def request_context(self, params, context):
-        return RequestContext(self, params, context)
+    def request_context(self, params, context, method=None):
+        return RequestContext(self, params, context, method)
 
     def app_context(self):
         return AppContext(self)
@@ -325,6 +790,15 @@ class GrpcKitApp:
         for func in reversed(self.teardown_app_context_funcs):
             func(exc)
 
+    def on_shutdown(self, func: Callable) -> Callable:
+        """Decorator for register funcs called in app context after the server is stopped"""
+        self.shutdown_funcs.append(func)
+        return func
+
+    def register_exception_handler(self, exception: Type[Exception], func: Callable) -> None:
+        """Register `func(exception, context)` which returns the response of `exception`"""
+        self.exception_handlers[exception] = func
+
     def exception_handler(self, exception: Type[Exception]) -> Callable:
         """Decorate for register exception handler"""
 
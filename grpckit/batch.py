@@ -0,0 +1,139 @@
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import threading
+
+
+class BatchPolicy:
+    """Policy of micro-batching route, a batch is flushed when `max_size` requests are
+    collected or `max_wait_ms` passed since the first request of the batch arrived.
+    """
+
+    __slots__ = ("max_size", "max_wait_ms")
+
+    def __init__(self, max_size: int = 64, max_wait_ms: float = 5) -> None:
+        if max_size <= 0:
+            raise ValueError(f"Invalid max_size: {max_size}, should be greater than 0")
+        if max_wait_ms < 0:
+            raise ValueError(f"Invalid max_wait_ms: {max_wait_ms}, should not be negative")
+        self.max_size = max_size
+        self.max_wait_ms = max_wait_ms
+
+    @property
+    def max_wait(self) -> float:
+        return self.max_wait_ms / 1000
+
+    def __repr__(self):
+        return f"BatchPolicy(max_size={self.max_size}, max_wait_ms={self.max_wait_ms})"
+
+
+class _Batch:
+    __slots__ = ("items", "results", "full", "done")
+
+    def __init__(self, full, done) -> None:
+        self.items: List[Any] = []
+        self.results: Optional[List[Any]] = None
+        self.full = full
+        self.done = done
+
+
+class Batcher:
+    """Collect concurrent calls into batches, `func` is called with a list of items and
+    returns a list of results in the same order. An exception instance in the results
+    is raised to its own caller only, an exception raised by `func` goes to every caller.
+    """
+
+    def __init__(self, func: Callable, policy: BatchPolicy) -> None:
+        self.func = func
+        self.policy = policy
+        self._batch: Optional[_Batch] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                batches=self.batches,
+                items=self.items,
+                mean_size=self.items / self.batches if self.batches else 0.0,
+            )
+
+    def _collect(self, batch: _Batch, results: Any) -> None:
+        n = len(batch.items)
+        if not isinstance(results, (list, tuple)) or len(results) != n:
+            error = AssertionError(f"Batch route must return a list of {n} results")
+            results = [error] * n
+        with self._lock:
+            self.batches += 1
+            self.items += n
+        batch.results = results
+
+    def _join(self, item: Any, factory: Callable):
+        """Add item to the open batch, return the batch, index of item and whether
+        the batch is opened by the item."""
+        with self._lock:
+            batch = self._batch
+            opened = batch is None
+            if opened:
+                batch = self._batch = factory()
+            index = len(batch.items)
+            batch.items.append(item)
+            if index + 1 >= self.policy.max_size:
+                # batch is closed, the following items go to a new batch
+                self._batch = None
+                batch.full.set()
+        return batch, index, opened
+
+    def _close(self, batch: _Batch) -> None:
+        with self._lock:
+            if self._batch is batch:
+                self._batch = None
+
+    @staticmethod
+    def _result(batch: _Batch, index: int) -> Any:
+        result = batch.results[index]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def submit(self, item: Any) -> Any:
+        """Submit item and wait for its result, the caller opening the batch runs it"""
+        batch, index, opened = self._join(
+            item, lambda: _Batch(threading.Event(), threading.Event())
+        )
+        if opened:
+            batch.full.wait(self.policy.max_wait)
+            self._close(batch)
+            try:
+                results = self.func(batch.items)
+            except Exception as e:
+                results = [e] * len(batch.items)
+            self._collect(batch, results)
+            batch.done.set()
+        else:
+            batch.done.wait()
+        return self._result(batch, index)
+
+    async def submit_async(self, item: Any) -> Any:
+        """Submit item of coroutine `func` and wait for its result, the batch is run by
+        a task of its own, so it's not affected by cancellation of any caller.
+        """
+        batch, index, opened = self._join(item, lambda: _Batch(asyncio.Event(), asyncio.Event()))
+        if opened:
+            asyncio.get_running_loop().create_task(self._flush_async(batch))
+        await batch.done.wait()
+        return self._result(batch, index)
+
+    async def _flush_async(self, batch: _Batch) -> None:
+        try:
+            await asyncio.wait_for(batch.full.wait(), self.policy.max_wait)
+        except asyncio.TimeoutError:
+            pass
+        self._close(batch)
+        try:
+            results = await self.func(batch.items)
+        except Exception as e:
+            results = [e] * len(batch.items)
+        self._collect(batch, results)
+        batch.done.set()
@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence, Tuple
+from inspect import iscoroutinefunction
+import threading
+import time
+
+import grpc
+
+from .metadata import metadata_of
+
+
+def serialize_response(response: Any) -> bytes:
+    """Serialize response, which may be serialized already by an inner wrapper"""
+    if type(response) is bytes:
+        return response
+    return response.SerializeToString()
+
+
+def _status_ok(context: Any) -> bool:
+    """Whether the status of call is still OK, the code is an int on grpc.aio of old grpcio"""
+    code = getattr(context, "code", None)
+    if code is None:
+        return True
+    code = code()
+    return code is None or code == grpc.StatusCode.OK or code == 0
+
+
+class TTL:
+    """Time to live of cached responses, in seconds"""
+
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds: float) -> None:
+        if seconds <= 0:
+            raise ValueError(f"Invalid TTL: {seconds}, should be greater than 0")
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"TTL({self.seconds})"
+
+
+class ResponseCache:
+    """LRU cache of serialized responses of a route, keyed by the deterministic serialized
+    request plus the selected invocation metadata. Entries expire after `ttl` and the least
+    recently used entry is evicted when `max_entries` is reached.
+    """
+
+    def __init__(
+        self,
+        ttl: TTL,
+        max_entries: int = 1024,
+        metadata: Sequence[str] = (),
+    ) -> None:
+        if max_entries <= 0:
+            raise ValueError(f"Invalid max_entries: {max_entries}, should be greater than 0")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # metadata keys are lower case in gRPC
+        self.metadata = tuple(key.lower() for key in metadata)
+
+        self._entries: "OrderedDict[Tuple, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, request: Any, metadata: Optional[Mapping[str, Any]] = None) -> Tuple:
+        """Build cache key from request message and metadata"""
+        data = request.SerializeToString(deterministic=True)
+        if not self.metadata:
+            return (data,)
+        metadata = metadata or {}
+        return (data,) + tuple(metadata.get(key) for key in self.metadata)
+
+    def _context_key(self, request: Any, context: Any) -> Tuple:
+        if not self.metadata or context is None:
+            return self.make_key(request)
+        return self.make_key(request, metadata_of(context))
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, data = entry
+            if expires <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def set(self, key: Tuple, data: bytes) -> None:
+        expires = time.monotonic() + self.ttl.seconds
+        with self._lock:
+            self._entries[key] = (expires, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, request: Any, metadata: Optional[Mapping[str, Any]] = None) -> bool:
+        """Drop the cached response of request, return whether it's cached"""
+        key = self.make_key(request, metadata)
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                entries=len(self._entries),
+            )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def wrap(self, handler: Callable) -> Callable:
+        """Wrap compiled handler of unary route, a hit returns the serialized response
+        without calling the handler, so the response serializer must pass bytes through,
+        see `passthrough_serializer`. A miss returns the response of handler, it's cached
+        only if the handler leaves the status of call OK.
+        The request hooks wrap this handler, so before request funcs run on hits too, and
+        after request funcs get the response message on a miss but its bytes on a hit.
+        """
+        if iscoroutinefunction(handler):
+
+            async def async_cached_handler(request, context):
+                key = self._context_key(request, context)
+                data = self.get(key)
+                if data is not None:
+                    return data
+                response = await handler(request, context)
+                if _status_ok(context):
+                    self.set(key, serialize_response(response))
+                return response
+
+            return async_cached_handler
+
+        def cached_handler(request, context):
+            key = self._context_key(request, context)
+            data = self.get(key)
+            if data is not None:
+                return data
+            response = handler(request, context)
+            if _status_ok(context):
+                self.set(key, serialize_response(response))
+            return response
+
+        return cached_handler
+
+
+def passthrough_serializer(serializer: Callable) -> Callable:
+    """Response serializer which sends bytes of cached response as it is"""
+
+    def serialize(response):
+        if type(response) is bytes:
+            return response
+        return serializer(response)
+
+    return serialize
@@ -5,7 +5,7 @@ import grpc
 
 from .common import ContextManager
 from .types import GrpcKitResponse, WrappedDict
-from .utils.proto import scan_pb_grpc
+from .utils.proto import scan_pb_grpc, precompile_pb_models
 from .utils.parser import DictToMessage, MessageToDict
 
 
@@ -99,6 +99,7 @@ class GrpcKitClient:
         )
         for k, v in pb_request_models.items():
             self._pb_request_models[k] = v
+        precompile_pb_models(pb_models=self._pb_request_models)
         self._timeout = timeout
 
     @property
@@ -6,6 +6,7 @@ from .constant import (
     K_GRPCKIT_SEND_MESSAGE_MAX_LENGHT,
     K_GRPCKIT_RECEIVE_MESSAGE_MAX_LENGHT,
     K_GRPCKIT_OPTIONS,
+    K_GRPCKIT_SO_REUSEPORT,
 )
 from .types import WrappedDict
 
@@ -47,6 +48,11 @@ class Config(dict):
         options.append(("grpc.max_send_message_length", max_send_message_length))
         options.append(("grpc.max_receive_message_length", max_receive_message_length))
 
+        # Several processes could bind the same address, for the pre-fork workers
+        so_reuseport = self.get(K_GRPCKIT_SO_REUSEPORT)
+        if so_reuseport is not None:
+            options.append(("grpc.so_reuseport", int(bool(so_reuseport))))
+
         # Add other custom defined grpc options
         for option in self.get(K_GRPCKIT_OPTIONS, list()):
             if not isinstance(option, tuple):
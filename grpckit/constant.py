@@ -13,6 +13,34 @@ K_GRPCKIT_TLS_SERVER_KEY = "GRPCKIT_TLS_SERVER_KEY"
 K_GRPCKIT_TLS_CA_CERT = "GRPCKIT_TLS_CA_CERT"
 
 K_GRPCKIT_MAX_WORKERS = "GRPCKIT_MAX_WORKERS"
+K_GRPCKIT_PRIORITY_LANES = "GRPCKIT_PRIORITY_LANES"
+K_GRPCKIT_PROCESS_WORKERS = "GRPCKIT_PROCESS_WORKERS"
+K_GRPCKIT_PROCESS_START_METHOD = "GRPCKIT_PROCESS_START_METHOD"
+# count queued/running work of the thread pools for `app.executor_stats()`
+K_GRPCKIT_EXECUTOR_STATS = "GRPCKIT_EXECUTOR_STATS"
 K_GRPCKIT_SEND_MESSAGE_MAX_LENGHT = "GRPCKIT_SEND_MESSAGE_MAX_LENGTH"
 K_GRPCKIT_RECEIVE_MESSAGE_MAX_LENGHT = "GRPCKIT_RECEIVE_MESSAGE_MAX_LENGTH"
 K_GRPCKIT_OPTIONS = "GRPCKIT_OPTIONS"
+K_GRPCKIT_MAXIMUM_CONCURRENT_RPCS = "GRPCKIT_MAXIMUM_CONCURRENT_RPCS"
+K_GRPCKIT_SO_REUSEPORT = "GRPCKIT_SO_REUSEPORT"
+# seconds given to in-flight RPCs to finish when the server stops
+K_GRPCKIT_SHUTDOWN_GRACE = "GRPCKIT_SHUTDOWN_GRACE"
+# register grpc.health.v1.Health service
+K_GRPCKIT_HEALTH = "GRPCKIT_HEALTH"
+# cap of the sync Watch streams of health, each one holds a thread of the server pool
+K_GRPCKIT_HEALTH_MAX_WATCHERS = "GRPCKIT_HEALTH_MAX_WATCHERS"
+# infer lightweight routes, which are served without request context
+K_GRPCKIT_LIGHTWEIGHT_ROUTES = "GRPCKIT_LIGHTWEIGHT_ROUTES"
+
+K_GRPCKIT_WORKERS = "GRPCKIT_WORKERS"
+# index of the worker process, set by the pre-fork supervisor
+K_GRPCKIT_WORKER_ID = "GRPCKIT_WORKER_ID"
+
+K_GRPCKIT_ADAPTIVE_LIMIT = "GRPCKIT_ADAPTIVE_LIMIT"
+K_GRPCKIT_ADAPTIVE_LIMIT_INITIAL = "GRPCKIT_ADAPTIVE_LIMIT_INITIAL"
+K_GRPCKIT_ADAPTIVE_LIMIT_MIN = "GRPCKIT_ADAPTIVE_LIMIT_MIN"
+K_GRPCKIT_ADAPTIVE_LIMIT_MAX = "GRPCKIT_ADAPTIVE_LIMIT_MAX"
+K_GRPCKIT_ADAPTIVE_LIMIT_LATENCY_MS = "GRPCKIT_ADAPTIVE_LIMIT_LATENCY_MS"
+K_GRPCKIT_ADAPTIVE_LIMIT_STATUS = "GRPCKIT_ADAPTIVE_LIMIT_STATUS"
+
+K_GRPCKIT_PARSER_ENGINE = "GRPCKIT_PARSER_ENGINE"
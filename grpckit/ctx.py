@@ -1,4 +1,5 @@
 import sys
+import threading
 from typing import Optional, List
 
 from .globals import (
@@ -11,15 +12,51 @@ from .wrapper import Request
 _sentinel = object()
 
 
+# max recycled contexts kept per thread
+_POOL_SIZE = 64
+
+
+class _FreeList(threading.local):
+    """Recycled contexts of current thread, no lock is needed"""
+
+    def __init__(self) -> None:
+        self.app_ctx: List["AppContext"] = []
+        self.request_ctx: List["RequestContext"] = []
+
+
+_free_list = _FreeList()
+
+
 class AppContext:
     """Application context"""
 
+    __slots__ = ("app", "g", "_ref_cnt")
+
     def __init__(self, app) -> None:
         self.app = app
         self.g = {}
 
         self._ref_cnt = 0
 
+    @classmethod
+    def acquire(cls, app) -> "AppContext":
+        """Take a recycled context of current thread, or create a new one"""
+        items = _free_list.app_ctx
+        if not items:
+            return cls(app)
+        ctx = items.pop()
+        ctx.app = app
+        return ctx
+
+    def release(self) -> None:
+        """Recycle the popped context, `g` is cleared"""
+        self.app = None
+        self.g.clear()
+        self._ref_cnt = 0
+        items = _free_list.app_ctx
+        if len(items) < _POOL_SIZE:
+            items.append(self)
+
     def push(self) -> None:
         self._ref_cnt += 1
         _app_ctx_stack.push(self)
@@ -43,16 +80,43 @@ class AppContext:
 
 
 class RequestContext:
-    def __init__(self, app, params=None, context=None) -> None:
+    """Request context, the ones taken by `acquire` are recycled by `release` per thread,
+    so `request`/`g` of a call should not be kept after the call is finished.
+    """
+
+    __slots__ = ("app", "request", "_implicit_app_ctx_stack", "preserved", "_preserved_exc")
+
+    def __init__(self, app, params=None, context=None, method=None) -> None:
         """Create request context"""
         self.app = app
-        self.request = Request(params, context)
+        self.request = Request(params, context, method)
 
         self._implicit_app_ctx_stack: List[Optional[AppContext]] = []
 
         self.preserved = False
         self._preserved_exc = None
 
+    @classmethod
+    def acquire(cls, app, params=None, context=None, method=None) -> "RequestContext":
+        """Take a recycled context of current thread, or create a new one"""
+        items = _free_list.request_ctx
+        if not items:
+            return cls(app, params, context, method)
+        ctx = items.pop()
+        ctx.app = app
+        ctx.request.reset(params, context, method)
+        return ctx
+
+    def release(self) -> None:
+        """Recycle the popped context, references to the call are dropped"""
+        self.app = None
+        self.request.reset()
+        self.preserved = False
+        self._preserved_exc = None
+        items = _free_list.request_ctx
+        if len(items) < _POOL_SIZE:
+            items.append(self)
+
     def push(self) -> None:
         """Push request context"""
         top = _request_ctx_stack.top
@@ -62,7 +126,7 @@ class RequestContext:
         # read context of current thread
         app_ctx = _app_ctx_stack.top
         if app_ctx is None or app_ctx.app != self.app:
-            app_ctx = self.app.app_context()
+            app_ctx = AppContext.acquire(self.app)
             app_ctx.push()
             self._implicit_app_ctx_stack.append(app_ctx)
         else:
@@ -83,7 +147,11 @@ class RequestContext:
             rv = _request_ctx_stack.pop()
 
             if app_ctx is not None:
-                app_ctx.pop(exc)
+                try:
+                    app_ctx.pop(exc)
+                finally:
+                    # implicit app context is owned by this request context only
+                    app_ctx.release()
 
             if rv is not self:
                 raise RuntimeError("Popped wrong request context")
@@ -0,0 +1,313 @@
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+import threading
+import time
+
+from .metadata import Metadata
+
+
+class _WorkItem:
+    __slots__ = ("future", "fn", "args", "kwargs", "enqueued")
+
+    def __init__(self, future: Future, fn: Callable, args: tuple, kwargs: dict) -> None:
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued = time.monotonic()
+
+    def run(self) -> None:
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except BaseException as e:  # pylint: disable=broad-except
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+
+
+class _LaneStats:
+    __slots__ = ("count", "total_wait", "max_wait")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.count += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            count=self.count,
+            mean_wait=self.total_wait / self.count if self.count else 0.0,
+            max_wait=self.max_wait,
+        )
+
+
+def _find_rpc_event(args: Iterable[Any]) -> Any:
+    # gRPC server submits `fn(rpc_event, state, behavior, ...)` to its thread pool
+    for arg in args:
+        if hasattr(arg, "invocation_metadata") and hasattr(arg, "call_details"):
+            return arg
+    return None
+
+
+class PriorityExecutor(Executor):
+    """Thread pool which schedules work by priority lanes, to be passed to
+    `GrpcKitApp(threadpool=...)`. `lanes` are ordered from the highest to the lowest.
+    The lane of RPC is read from invocation metadata `metadata_key`, then the lane declared
+    by the route (`@svc.route(priority=...)`), then `default_lane`.
+    Higher lanes run first, unless the head of a lower lane has waited longer than
+    `starvation_ms`, then the most overdue one runs first.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 10,
+        lanes: Sequence[str] = ("high", "normal", "low"),
+        default_lane: Optional[str] = None,
+        metadata_key: str = "x-priority",
+        starvation_ms: float = 1000,
+        thread_name_prefix: str = "grpckit-priority",
+    ) -> None:
+        if max_workers <= 0:
+            raise ValueError(f"Invalid max_workers: {max_workers}, should be greater than 0")
+        if not lanes:
+            raise ValueError("Invalid lanes, at least one lane is required")
+        self.max_workers = max_workers
+        self.lanes = tuple(lanes)
+        self.default_lane = default_lane or self.lanes[len(self.lanes) // 2]
+        if self.default_lane not in self.lanes:
+            raise ValueError(f"Invalid default lane: {self.default_lane}, not in {self.lanes}")
+        self.metadata_key = metadata_key.lower()
+        self.starvation = starvation_ms / 1000
+        self.thread_name_prefix = thread_name_prefix
+
+        # lane declared by routes, by full method name "/package.Service/Method"
+        self.route_lanes: Dict[str, str] = dict()
+
+        self._queues = {lane: deque() for lane in self.lanes}
+        self._stats = {lane: _LaneStats() for lane in self.lanes}
+        self._cond = threading.Condition()
+        self._threads = set()
+        self._idle = 0
+        self._shutdown = False
+
+    def set_route_lane(self, method: str, lane: str) -> None:
+        if lane not in self._queues:
+            raise ValueError(f"Invalid lane: {lane}, should be one of {self.lanes}")
+        self.route_lanes[method] = lane
+
+    def lane_for(self, method: Any = None, metadata: Iterable = ()) -> str:
+        """Resolve lane from invocation metadata (`Metadata` or tuples) and full method name"""
+        key = self.metadata_key
+        if isinstance(metadata, Metadata):
+            v = metadata.get(key)
+            if v in self._queues:
+                return v
+        else:
+            # a single key is looked up in the raw tuples without building a view
+            for k, v in metadata or ():
+                if k == key:
+                    if isinstance(v, bytes):
+                        v = v.decode("utf8")
+                    if v in self._queues:
+                        return v
+                    break
+        if method is not None:
+            if isinstance(method, bytes):
+                method = method.decode("utf8")
+            lane = self.route_lanes.get(method)
+            if lane is not None:
+                return lane
+        return self.default_lane
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        rpc_event = _find_rpc_event(args)
+        if rpc_event is None:
+            lane = self.default_lane
+        else:
+            lane = self.lane_for(rpc_event.call_details.method, rpc_event.invocation_metadata)
+        return self.submit_lane(lane, fn, *args, **kwargs)
+
+    def submit_lane(self, lane: str, fn: Callable, /, *args, **kwargs) -> Future:
+        future = Future()
+        item = _WorkItem(future, fn, args, kwargs)
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._queues[lane].append(item)
+            if self._idle > 0:
+                self._cond.notify()
+            # start a new worker if the idle ones can't take all the queued work
+            queued = sum(len(queue) for queue in self._queues.values())
+            if queued > self._idle and len(self._threads) < self.max_workers:
+                self._start_worker()
+        return future
+
+    def _start_worker(self) -> None:
+        thread = threading.Thread(
+            target=self._work,
+            name=f"{self.thread_name_prefix}_{len(self._threads)}",
+            daemon=True,
+        )
+        self._threads.add(thread)
+        thread.start()
+
+    def _next_item(self) -> Optional[_WorkItem]:
+        """Pick next work item, must be called with condition held"""
+        now = time.monotonic()
+        chosen = None
+        overdue = 0.0
+        for lane in self.lanes:
+            queue = self._queues[lane]
+            if not queue:
+                continue
+            if chosen is None:
+                chosen = lane
+                continue
+            # starvation protection of lower lanes
+            waited = now - queue[0].enqueued
+            if waited > self.starvation and waited > overdue:
+                chosen, overdue = lane, waited
+        if chosen is None:
+            return None
+        item = self._queues[chosen].popleft()
+        self._stats[chosen].record(now - item.enqueued)
+        return item
+
+    def _work(self) -> None:
+        while True:
+            item = self._get()
+            if item is None:
+                return
+            item.run()
+            del item
+
+    def _get(self) -> Optional[_WorkItem]:
+        with self._cond:
+            while True:
+                item = self._next_item()
+                if item is not None or self._shutdown:
+                    return item
+                self._idle += 1
+                try:
+                    self._cond.wait()
+                finally:
+                    self._idle -= 1
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue wait time (seconds) and depth by lane"""
+        with self._cond:
+            rv = dict()
+            for lane in self.lanes:
+                rv[lane] = self._stats[lane].to_dict()
+                rv[lane]["queued"] = len(self._queues[lane])
+            return rv
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for queue in self._queues.values():
+                    while queue:
+                        queue.popleft().future.cancel()
+            self._cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+class InstrumentedExecutor(Executor):
+    """Wrap executor to count the queued and running work, for utilisation metrics"""
+
+    def __init__(self, executor: Executor, max_workers: Optional[int] = None) -> None:
+        self.executor = executor
+        self.max_workers = max_workers or getattr(executor, "_max_workers", None)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+
+    def _run(self, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        with self._lock:
+            self.queued += 1
+        try:
+            return self.executor.submit(self._run, fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self.queued -= 1
+            raise
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                max_workers=self.max_workers,
+                active=self.active,
+                queued=self.queued,
+                completed=self.completed,
+                utilisation=self.active / self.max_workers if self.max_workers else None,
+            )
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        # `cancel_futures` is new in python 3.9, and unknown to some executors
+        if cancel_futures:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+        else:
+            self.executor.shutdown(wait=wait)
+
+
+class AdmissionExecutor(Executor):
+    """Thread pool of sync server with adaptive limit, which wraps the server pool.
+    `AdaptiveLimitInterceptor` marks the behavior of each call: shed calls are run by a small
+    pool of their own, so the rejection is sent at once instead of waiting behind the
+    admitted calls for a thread of saturated server pool. The slot of an admitted call is
+    released when its work item is done or cancelled, also when the handler never runs,
+    e.g. the call is cancelled while queued or its request fails to deserialize.
+    Only the shed pool is shut down by `shutdown`, the server pool is owned by the caller.
+    """
+
+    def __init__(self, executor: Executor, shed_workers: int = 2) -> None:
+        self.executor = executor
+        self.shed_pool = ThreadPoolExecutor(
+            max_workers=shed_workers, thread_name_prefix="grpckit-shed"
+        )
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        # gRPC server submits `fn(rpc_event, state, behavior, ...)` to its thread pool
+        for arg in args:
+            if getattr(arg, "__grpckit_shed__", False):
+                return self.shed_pool.submit(fn, *args, **kwargs)
+            admission = getattr(arg, "__grpckit_admission__", None)
+            if admission is not None:
+                try:
+                    future = self.executor.submit(fn, *args, **kwargs)
+                except BaseException:
+                    admission.release()
+                    raise
+                future.add_done_callback(lambda _: admission.release())
+                return future
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self.shed_pool.shutdown(wait=wait)
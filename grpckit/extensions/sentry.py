@@ -20,3 +20,8 @@ class Sentry:
             except DidNotEnable:
                 pass
             sentry_sdk.init(**config, integrations=integrations)
+
+    def shutdown(self, app):
+        # send the pending events before exit
+        if app.config.get("SENTRY_DSN"):
+            sentry_sdk.flush()
@@ -0,0 +1,142 @@
+from typing import Any, Callable, Dict, Optional
+from inspect import iscoroutinefunction
+import asyncio
+import threading
+
+from .cache import serialize_response
+from .exception import DeadlineExceeded
+
+
+def _time_remaining(context: Any) -> Optional[float]:
+    """Seconds before the deadline of call, None if there's no deadline"""
+    time_remaining = getattr(context, "time_remaining", None)
+    if time_remaining is None:
+        return None
+    rv = time_remaining()
+    # a call without deadline reports a time far beyond what a lock could wait for
+    return None if rv is None or rv > threading.TIMEOUT_MAX else rv
+
+
+class _Call:
+    __slots__ = ("done", "data", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.data: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls of a unary route carrying the same request payload,
+    the handler is run once by the leader and the followers share its serialized response
+    or exception. Nothing is kept after the leader finishes.
+    Context changes made by the handler (e.g. trailing metadata) only apply to the leader.
+    A follower waits until its own deadline at most, then fails with `DeadlineExceeded`.
+    If the leader of asyncio server is cancelled, a follower runs the handler instead.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[bytes, Any] = dict()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.leaders = 0
+        self.coalesced = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                calls=self.calls,
+                leaders=self.leaders,
+                coalesced=self.coalesced,
+                in_flight=len(self._calls),
+                ratio=self.coalesced / self.calls if self.calls else 0.0,
+            )
+
+    def _join(self, key: bytes, factory: Callable, rejoin: bool = False):
+        """Return the in-flight call of key and whether the caller is the leader,
+        `rejoin` for a follower whose leader is gone, which is not counted again.
+        """
+        with self._lock:
+            if not rejoin:
+                self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                if not rejoin:
+                    self.coalesced += 1
+                return call, False
+            call = self._calls[key] = factory()
+            self.leaders += 1
+            if rejoin:
+                self.coalesced -= 1
+            return call, True
+
+    def _leave(self, key: bytes) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def wrap(self, handler: Callable) -> Callable:
+        """Wrap compiled handler of unary route, the leader returns the response of handler
+        and the followers its serialized bytes, so the response serializer must pass bytes
+        through.
+        """
+        if iscoroutinefunction(handler):
+            return self._wrap_async(handler)
+
+        def coalesced_handler(request, context):
+            key = request.SerializeToString(deterministic=True)
+            call, leader = self._join(key, _Call)
+            if not leader:
+                if not call.done.wait(_time_remaining(context)):
+                    raise DeadlineExceeded()
+                if call.error is not None:
+                    raise call.error
+                return call.data
+
+            try:
+                response = handler(request, context)
+                call.data = serialize_response(response)
+                return response
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                self._leave(key)
+                call.done.set()
+
+        return coalesced_handler
+
+    def _wrap_async(self, handler: Callable) -> Callable:
+        async def coalesced_handler(request, context):
+            key = request.SerializeToString(deterministic=True)
+            loop = asyncio.get_running_loop()
+            future, leader = self._join(key, loop.create_future)
+            while not leader:
+                try:
+                    # shield the shared future from the cancellation of a follower
+                    return await asyncio.wait_for(asyncio.shield(future), _time_remaining(context))
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded() from None
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        # the follower itself is cancelled
+                        raise
+                # the leader is cancelled, run the handler unless another follower does
+                future, leader = self._join(key, loop.create_future, rejoin=True)
+
+            try:
+                response = await handler(request, context)
+                future.set_result(serialize_response(response))
+                return response
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                # the exception is raised by leader, avoid warning of never retrieved one
+                future.exception()
+                raise
+            finally:
+                self._leave(key)
+
+        return coalesced_handler
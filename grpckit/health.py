@@ -0,0 +1,225 @@
+from typing import Callable, Dict, List, Optional, Union
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+import grpc
+
+try:
+    # share the messages with grpcio-health-checking if it's installed
+    from grpc_health.v1 import health_pb2
+except ImportError:  # pragma: no cover
+    from .pb import health_pb2
+
+
+HEALTH_SERVICE = "grpc.health.v1.Health"
+HEALTH_METHODS = frozenset(("/grpc.health.v1.Health/Check", "/grpc.health.v1.Health/Watch"))
+
+UNKNOWN = health_pb2.HealthCheckResponse.UNKNOWN
+SERVING = health_pb2.HealthCheckResponse.SERVING
+NOT_SERVING = health_pb2.HealthCheckResponse.NOT_SERVING
+SERVICE_UNKNOWN = health_pb2.HealthCheckResponse.SERVICE_UNKNOWN
+
+# responses are serialized once, probes never build messages
+_RESPONSES = {
+    status: health_pb2.HealthCheckResponse(status=status).SerializeToString()
+    for status in (UNKNOWN, SERVING, NOT_SERVING, SERVICE_UNKNOWN)
+}
+
+logger = logging.getLogger(__name__)
+
+
+class _Check:
+    __slots__ = ("func", "service", "interval", "due")
+
+    def __init__(self, func: Callable[[], Union[bool, int]], service: str, interval: float):
+        self.func = func
+        self.service = service
+        self.interval = interval
+        self.due = 0.0
+
+
+class HealthServicer:
+    """`grpc.health.v1.Health` service, the status of each service is kept in memory and
+    updated by `set_status` or the background checks, so `Check` only looks up a dict.
+    The empty service name "" is the status of the whole server.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._statuses: Dict[str, int] = dict()
+        # callbacks of Watch streams, called with (service, status)
+        self._watchers: set = set()
+        self._checks: List[_Check] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # statuses are frozen to NOT_SERVING once the server is draining
+        self._draining = False
+        # each sync Watch stream holds a thread of the server pool, so they are capped
+        self._max_watchers: Optional[int] = None
+        self._sync_watchers = 0
+
+    def set_status(self, service: str, status: int) -> None:
+        with self._lock:
+            if self._draining or self._statuses.get(service) == status:
+                return
+            self._statuses[service] = status
+            watchers = list(self._watchers)
+        for watcher in watchers:
+            watcher(service, status)
+
+    def get_status(self, service: str = "") -> Optional[int]:
+        return self._statuses.get(service)
+
+    def add_check(
+        self,
+        func: Callable[[], Union[bool, int]],
+        service: str = "",
+        interval: float = 10,
+    ) -> None:
+        """Run `func` every `interval` seconds in background, it returns a bool or a status
+        of the service, an exception is NOT_SERVING.
+        """
+        self._checks.append(_Check(func, service, interval))
+
+    def _run_check(self, check: _Check) -> None:
+        try:
+            rv = check.func()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Health check of service '%s' failed", check.service)
+            rv = NOT_SERVING
+        if isinstance(rv, bool):
+            rv = SERVING if rv else NOT_SERVING
+        self.set_status(check.service, rv)
+
+    def _run_checks(self) -> None:
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for check in self._checks:
+                if check.due <= now:
+                    self._run_check(check)
+                    check.due = time.monotonic() + check.interval
+            wait = min(check.due for check in self._checks) - time.monotonic()
+            self._stop.wait(max(wait, 0))
+
+    def start(self) -> None:
+        """Run the checks in a daemon thread"""
+        if not self._checks or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_checks, name="grpckit-health")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def enter_graceful_shutdown(self) -> None:
+        """Report NOT_SERVING for every service, and ignore the later updates until `resume`"""
+        with self._lock:
+            self._draining = True
+            services = [s for s, status in self._statuses.items() if status != NOT_SERVING]
+            for service in services:
+                self._statuses[service] = NOT_SERVING
+            watchers = list(self._watchers)
+        for service in services:
+            for watcher in watchers:
+                watcher(service, NOT_SERVING)
+
+    def resume(self) -> None:
+        """Accept the updates of statuses again after `enter_graceful_shutdown`"""
+        with self._lock:
+            self._draining = False
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+        self.resume()
+
+    def Check(self, request, context):
+        status = self._statuses.get(request.service)
+        if status is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, "Unknown service")
+        return _RESPONSES[status]
+
+    async def CheckAsync(self, request, context):
+        status = self._statuses.get(request.service)
+        if status is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Unknown service")
+        return _RESPONSES[status]
+
+    def _watch(self, service: str, notify: Callable) -> Callable:
+        def watcher(name, status):
+            if name == service:
+                notify(status)
+
+        with self._lock:
+            self._watchers.add(watcher)
+            notify(self._statuses.get(service, SERVICE_UNKNOWN))
+        return watcher
+
+    def _unwatch(self, watcher: Callable) -> None:
+        with self._lock:
+            self._watchers.discard(watcher)
+
+    def Watch(self, request, context):
+        with self._lock:
+            if self._max_watchers is not None and self._sync_watchers >= self._max_watchers:
+                full = True
+            else:
+                full = False
+                self._sync_watchers += 1
+        if full:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Too many health watchers")
+        statuses = queue.SimpleQueue()
+        watcher = self._watch(request.service, statuses.put)
+        try:
+            # wakes the stream up when the call ends, instead of polling `context.is_active`
+            if not context.add_callback(lambda: statuses.put(None)):
+                return
+            last = None
+            while True:
+                status = statuses.get()
+                if status is None:
+                    return
+                if status != last:
+                    last = status
+                    yield _RESPONSES[status]
+        finally:
+            self._unwatch(watcher)
+            with self._lock:
+                self._sync_watchers -= 1
+
+    async def WatchAsync(self, request, context):
+        loop = asyncio.get_running_loop()
+        statuses = asyncio.Queue()
+        watcher = self._watch(
+            request.service, lambda status: loop.call_soon_threadsafe(statuses.put_nowait, status)
+        )
+        try:
+            last = None
+            while True:
+                status = await statuses.get()
+                if status != last:
+                    last = status
+                    yield _RESPONSES[status]
+        finally:
+            self._unwatch(watcher)
+
+    def generic_handler(
+        self, aio: bool = False, max_watchers: Optional[int] = None
+    ) -> grpc.GenericRpcHandler:
+        """Handlers send the pre-serialized responses. Sync `Watch` streams beyond
+        `max_watchers` are rejected with RESOURCE_EXHAUSTED, async ones hold no thread and
+        aren't capped.
+        """
+        self._max_watchers = None if aio else max_watchers
+        deserializer = health_pb2.HealthCheckRequest.FromString
+        handlers = {
+            "Check": grpc.unary_unary_rpc_method_handler(
+                self.CheckAsync if aio else self.Check, request_deserializer=deserializer
+            ),
+            "Watch": grpc.unary_stream_rpc_method_handler(
+                self.WatchAsync if aio else self.Watch, request_deserializer=deserializer
+            ),
+        }
+        return grpc.method_handlers_generic_handler(HEALTH_SERVICE, handlers)
@@ -1,18 +1,50 @@
 from functools import wraps
-from typing import Callable, List, Type, Dict
+from inspect import isawaitable
+from typing import Callable, Dict, List, Optional, Tuple, Type
+import time
 import traceback
 
+from .ctx import RequestContext
 from .exception import RpcException
+from .health import HEALTH_METHODS
+from .limit import AdaptiveLimiter, Admission
 from .pb import default_pb2
 
-from grpc import ServerInterceptor, StatusCode
+from grpc import ServerInterceptor, StatusCode, aio
 from grpc.experimental import wrap_server_method_handler
 
 
+# method of reflection service, which would not be processed by middlewares
+_REFLECTION_METHOD = "/grpc.reflection.v1alpha.ServerReflection/ServerReflectionInfo"
+# methods which bypass the middlewares, request context and limits, probes must stay fast
+_BYPASS_METHODS = HEALTH_METHODS | {_REFLECTION_METHOD}
+
+
 class BaseInterceptor(ServerInterceptor):
     ...
 
 
+class BaseAsyncInterceptor(aio.ServerInterceptor):
+    ...
+
+
+async def _maybe_await(value):
+    if isawaitable(value):
+        return await value
+    return value
+
+
+async def _iterate(response):
+    """Iterate response of streaming handler, which could be sync or async iterator"""
+    response = await _maybe_await(response)
+    if hasattr(response, "__aiter__"):
+        async for item in response:
+            yield item
+    else:
+        for item in response:
+            yield item
+
+
 class MiddlewareInterceptor(BaseInterceptor):
     def __init__(
         self,
@@ -26,14 +58,6 @@ class MiddlewareInterceptor(BaseInterceptor):
     def _wrapper(self, behavior):
         @wraps(behavior)
         def wrapper(request, context):
-            # Ignore method request for reflection
-            method = context._rpc_event.call_details.method
-            if (
-                method.decode()
-                == "/grpc.reflection.v1alpha.ServerReflection/ServerReflectionInfo"
-            ):
-                return behavior(request, context)
-
             # process pre processors one by one
             for chain in self.before_request_chains:
                 resp = chain(request, context)
@@ -44,19 +68,82 @@ class MiddlewareInterceptor(BaseInterceptor):
             # process post processors one by one
             for chain in self.after_request_chains:
                 response = chain(response)
-                if not response:
+                if response is None:
                     raise ValueError(
-                        "Miss response from after response interceptor: %s"
-                        % chain.__name__
+                        "Miss response from after response interceptor: %s" % chain.__name__
                     )
             return response
 
         return wrapper
 
     def intercept_service(self, continuation, handler_call_details):
-        return wrap_server_method_handler(
-            self._wrapper, continuation(handler_call_details)
-        )
+        handler = continuation(handler_call_details)
+        # Ignore method request for reflection and health checking
+        if handler is None or handler_call_details.method in _BYPASS_METHODS:
+            return handler
+        return wrap_server_method_handler(self._wrapper, handler)
+
+
+class AsyncMiddlewareInterceptor(BaseAsyncInterceptor):
+    """Middleware Interceptor for asyncio server,
+    chains could be either plain functions or coroutine functions.
+    """
+
+    def __init__(
+        self,
+        before_request_chains: List[Callable],
+        after_request_chains: List[Callable],
+    ) -> None:
+        self.before_request_chains = before_request_chains
+        self.after_request_chains = after_request_chains
+
+    async def _before_request(self, request, context):
+        for chain in self.before_request_chains:
+            resp = await _maybe_await(chain(request, context))
+            if resp:
+                return resp
+        return None
+
+    async def _after_request(self, response):
+        for chain in self.after_request_chains:
+            response = await _maybe_await(chain(response))
+            if response is None:
+                raise ValueError(
+                    "Miss response from after response interceptor: %s" % chain.__name__
+                )
+        return response
+
+    def _unary_wrapper(self, behavior):
+        @wraps(behavior)
+        async def wrapper(request, context):
+            resp = await self._before_request(request, context)
+            if resp:
+                return resp
+            response = await _maybe_await(behavior(request, context))
+            return await self._after_request(response)
+
+        return wrapper
+
+    def _stream_wrapper(self, behavior):
+        @wraps(behavior)
+        async def wrapper(request, context):
+            resp = await self._before_request(request, context)
+            if resp:
+                yield resp
+                return
+            response = await self._after_request(behavior(request, context))
+            async for item in _iterate(response):
+                yield item
+
+        return wrapper
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        # Ignore method request for reflection and health checking
+        if handler is None or handler_call_details.method in _BYPASS_METHODS:
+            return handler
+        wrapper = self._stream_wrapper if handler.response_streaming else self._unary_wrapper
+        return wrap_server_method_handler(wrapper, handler)
 
 
 class RpcExceptionInterceptor(BaseInterceptor):
@@ -76,6 +163,32 @@ class RpcExceptionInterceptor(BaseInterceptor):
         context.set_details("Internal Error")
         return default_pb2.Empty()
 
+    def _handle_exception(self, e, context):
+        """Map exception to status code and details, must be called in `except` block"""
+        # if debug, raise exception directly
+        if self.app.debug:
+            context.set_code(StatusCode.INTERNAL)
+            context.set_details(traceback.format_exc())
+            raise
+        # If the exception is instantiated from RpcException,
+        # use the code and details directly.
+        # NOTE: Maybe it's a good choice to give permission to choose
+        # whether to raise exception or catch all exceptions,
+        # but to achieve this goal, the teardown_request feature must be
+        # completed firstly.
+        if isinstance(e, RpcException):
+            context.set_code(e.status_code)
+            context.set_details(e.details)
+            return default_pb2.Empty()
+        else:
+            # common exceptions would defauld to RpcException
+            for cls in type(e).mro():
+                handler = self._exc_handlers.get(cls)
+                if handler and callable(handler):
+                    return handler(e, context)
+            # use default handler
+            return self._default_handler(e, context)
+
     def _wrapper(self, behavior):
         @wraps(behavior)
         def wrapper(request, context):
@@ -84,35 +197,425 @@ class RpcExceptionInterceptor(BaseInterceptor):
                 ctx.push()
                 return behavior(request, context)
             except Exception as e:
-                # if debug, raise exception directly
-                if self.app.debug:
-                    context.set_code(StatusCode.INTERNAL)
-                    context.set_details(traceback.format_exc())
-                    raise
-                # If the exception is instantiated from RpcException,
-                # use the code and details directly.
-                # NOTE: Maybe it's a good choice to give permission to choose
-                # whether to raise exception or catch all exceptions,
-                # but to achieve this goal, the teardown_request feature must be
-                # completed firstly.
-                if isinstance(e, RpcException):
-                    context.set_code(e.status_code)
-                    context.set_details(e.details)
-                    return default_pb2.Empty()
-                else:
-                    # common exceptions would defauld to RpcException
-                    for cls in type(e).mro():
-                        handler = self._exc_handlers.get(cls)
-                        if handler and callable(handler):
-                            return handler(e, context)
-                    # use default handler
-                    return self._default_handler(e, handler)
+                return self._handle_exception(e, context)
+            finally:
+                ctx.pop()
+
+        return wrapper
+
+    def _stream_wrapper(self, behavior):
+        @wraps(behavior)
+        def wrapper(request, context):
+            # keep the request context pushed until the response stream is exhausted
+            ctx = self.app.request_context(request, context)
+            try:
+                ctx.push()
+                yield from behavior(request, context)
+            except Exception as e:
+                # status code and details are set, the stream is ended
+                self._handle_exception(e, context)
             finally:
                 ctx.pop()
 
         return wrapper
 
     def intercept_service(self, continuation, handler_call_details):
-        return wrap_server_method_handler(
-            self._wrapper, continuation(handler_call_details)
+        handler = continuation(handler_call_details)
+        if handler is None or handler_call_details.method in _BYPASS_METHODS:
+            return handler
+        if handler.response_streaming:
+            return wrap_server_method_handler(self._stream_wrapper, handler)
+        return wrap_server_method_handler(self._wrapper, handler)
+
+
+class AsyncRpcExceptionInterceptor(RpcExceptionInterceptor, BaseAsyncInterceptor):
+    """Global RpcException Interceptor for asyncio server.
+    Every RPC is served by its own asyncio task with a copy of contextvars,
+    so the request/app context pushed here is isolated from the other RPCs.
+    """
+
+    def _unary_wrapper(self, behavior, method):
+        @wraps(behavior)
+        async def wrapper(request, context):
+            ctx = self.app.request_context(request, context, method)
+            try:
+                ctx.push()
+                return await _maybe_await(behavior(request, context))
+            except Exception as e:
+                return await _maybe_await(self._handle_exception(e, context))
+            finally:
+                ctx.pop()
+
+        return wrapper
+
+    def _stream_wrapper(self, behavior, method):
+        @wraps(behavior)
+        async def wrapper(request, context):
+            ctx = self.app.request_context(request, context, method)
+            try:
+                ctx.push()
+                async for item in _iterate(behavior(request, context)):
+                    yield item
+            except Exception as e:
+                # status code and details are set, the stream is ended
+                self._handle_exception(e, context)
+            finally:
+                ctx.pop()
+
+        return wrapper
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None or handler_call_details.method in _BYPASS_METHODS:
+            return handler
+        method = handler_call_details.method
+        if handler.response_streaming:
+            return wrap_server_method_handler(lambda b: self._stream_wrapper(b, method), handler)
+        return wrap_server_method_handler(lambda b: self._unary_wrapper(b, method), handler)
+
+
+class PipelineInterceptor(RpcExceptionInterceptor):
+    """Request context, middlewares, exception mapping and teardown fused in one frame,
+    the request contexts are recycled per thread.
+    The chains and lightweight flag of a method are resolved once, either at bind time by
+    `wrap` or at the first call, and cached by method name. The fused handler is cached
+    along with the handler it wraps, a new handler of the method (e.g. returned by a custom
+    interceptor on each call) is fused again with the resolved chains.
+    `resolve_chains(method)` returns the before/after request chains of the method,
+    default to `before_request_chains`/`after_request_chains` for all methods.
+    Methods for which `resolve_lightweight(method)` is True are served without request
+    context and teardown, only the chains and exception mapping are kept.
+    """
+
+    def __init__(
+        self,
+        app,
+        before_request_chains: List[Callable] = (),
+        after_request_chains: List[Callable] = (),
+        exc_handlers: Dict[Type[Exception], Callable] = None,
+        resolve_chains: Optional[Callable[[str], Tuple[List, List]]] = None,
+        resolve_lightweight: Optional[Callable[[str], bool]] = None,
+    ) -> None:
+        super().__init__(app, exc_handlers)
+        self.before_request_chains = before_request_chains
+        self.after_request_chains = after_request_chains
+        self.resolve_chains = resolve_chains
+        self.resolve_lightweight = resolve_lightweight
+        # method -> (before request chains, after request chains, lightweight)
+        self._plans: Dict[str, tuple] = dict()
+        # method -> (handler, fused handler)
+        self._handlers: Dict[str, tuple] = dict()
+
+    def _unary_wrapper(
+        self, behavior, method, before_request_chains, after_request_chains, lightweight=False
+    ):
+        app = self.app
+
+        @wraps(behavior)
+        def wrapper(request, context):
+            ctx = None if lightweight else RequestContext.acquire(app, request, context, method)
+            exc = None
+            try:
+                if ctx is not None:
+                    ctx.push()
+                for chain in before_request_chains:
+                    resp = chain(request, context)
+                    if resp:
+                        return resp
+                response = behavior(request, context)
+                for chain in after_request_chains:
+                    response = chain(response)
+                    if response is None:
+                        raise ValueError(
+                            "Miss response from after response interceptor: %s" % chain.__name__
+                        )
+                return response
+            except Exception as e:
+                exc = e
+                return self._handle_exception(e, context)
+            finally:
+                if ctx is not None:
+                    ctx.pop(exc)
+                    ctx.release()
+
+        return wrapper
+
+    def _stream_wrapper(
+        self, behavior, method, before_request_chains, after_request_chains, lightweight=False
+    ):
+        app = self.app
+
+        @wraps(behavior)
+        def wrapper(request, context):
+            # keep the request context pushed until the response stream is exhausted
+            ctx = None if lightweight else RequestContext.acquire(app, request, context, method)
+            exc = None
+            try:
+                if ctx is not None:
+                    ctx.push()
+                for chain in before_request_chains:
+                    resp = chain(request, context)
+                    if resp:
+                        yield resp
+                        return
+                response = behavior(request, context)
+                for chain in after_request_chains:
+                    response = chain(response)
+                    if response is None:
+                        raise ValueError(
+                            "Miss response from after response interceptor: %s" % chain.__name__
+                        )
+                yield from response
+            except Exception as e:
+                exc = e
+                # status code and details are set, the stream is ended
+                self._handle_exception(e, context)
+            finally:
+                if ctx is not None:
+                    ctx.pop(exc)
+                    ctx.release()
+
+        return wrapper
+
+    def _plan(self, method: str) -> tuple:
+        plan = self._plans.get(method)
+        if plan is None:
+            if self.resolve_chains is not None:
+                before, after = self.resolve_chains(method)
+            else:
+                before, after = self.before_request_chains, self.after_request_chains
+            lightweight = self.resolve_lightweight is not None and self.resolve_lightweight(method)
+            plan = self._plans[method] = (before, after, lightweight)
+        return plan
+
+    def wrap(self, handler, method: str):
+        """Build the fused handler of method, the result is cached"""
+        cached = self._handlers.get(method)
+        if cached is not None and cached[0] is handler:
+            return cached[1]
+        before, after, lightweight = self._plan(method)
+        wrapper = self._stream_wrapper if handler.response_streaming else self._unary_wrapper
+        fused = wrap_server_method_handler(
+            lambda b: wrapper(b, method, before, after, lightweight=lightweight), handler
         )
+        self._handlers[method] = (handler, fused)
+        return fused
+
+    def _lookup(self, handler, method: str):
+        # the fused handler itself is returned by continuation when it's registered at bind time
+        cached = self._handlers.get(method)
+        if cached is not None and (cached[0] is handler or cached[1] is handler):
+            return cached[1]
+        if handler is None or method in _BYPASS_METHODS:
+            return handler
+        return self.wrap(handler, method)
+
+    def intercept_service(self, continuation, handler_call_details):
+        return self._lookup(continuation(handler_call_details), handler_call_details.method)
+
+
+class AsyncPipelineInterceptor(PipelineInterceptor, BaseAsyncInterceptor):
+    """Fused pipeline for asyncio server, chains could be either plain functions
+    or coroutine functions.
+    """
+
+    @staticmethod
+    async def _before_request(chains, request, context):
+        for chain in chains:
+            resp = await _maybe_await(chain(request, context))
+            if resp:
+                return resp
+        return None
+
+    @staticmethod
+    async def _after_request(chains, response):
+        for chain in chains:
+            response = await _maybe_await(chain(response))
+            if response is None:
+                raise ValueError(
+                    "Miss response from after response interceptor: %s" % chain.__name__
+                )
+        return response
+
+    def _unary_wrapper(
+        self, behavior, method, before_request_chains, after_request_chains, lightweight=False
+    ):
+        app = self.app
+        has_chains = bool(before_request_chains or after_request_chains)
+
+        @wraps(behavior)
+        async def wrapper(request, context):
+            ctx = None if lightweight else RequestContext.acquire(app, request, context, method)
+            exc = None
+            try:
+                if ctx is not None:
+                    ctx.push()
+                if not has_chains:
+                    return await _maybe_await(behavior(request, context))
+                resp = await self._before_request(before_request_chains, request, context)
+                if resp:
+                    return resp
+                response = await _maybe_await(behavior(request, context))
+                return await self._after_request(after_request_chains, response)
+            except Exception as e:
+                exc = e
+                return await _maybe_await(self._handle_exception(e, context))
+            finally:
+                if ctx is not None:
+                    ctx.pop(exc)
+                    ctx.release()
+
+        return wrapper
+
+    def _stream_wrapper(
+        self, behavior, method, before_request_chains, after_request_chains, lightweight=False
+    ):
+        app = self.app
+        has_chains = bool(before_request_chains or after_request_chains)
+
+        @wraps(behavior)
+        async def wrapper(request, context):
+            ctx = None if lightweight else RequestContext.acquire(app, request, context, method)
+            exc = None
+            try:
+                if ctx is not None:
+                    ctx.push()
+                if has_chains:
+                    resp = await self._before_request(before_request_chains, request, context)
+                    if resp:
+                        yield resp
+                        return
+                    response = await self._after_request(
+                        after_request_chains, behavior(request, context)
+                    )
+                else:
+                    response = behavior(request, context)
+                async for item in _iterate(response):
+                    yield item
+            except Exception as e:
+                exc = e
+                # status code and details are set, the stream is ended
+                self._handle_exception(e, context)
+            finally:
+                if ctx is not None:
+                    ctx.pop(exc)
+                    ctx.release()
+
+        return wrapper
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        return self._lookup(handler, handler_call_details.method)
+
+
+class AdaptiveLimitInterceptor(BaseInterceptor):
+    """Shed RPCs beyond the adaptive limit, it should be the most outer interceptor
+    so that the excess load is rejected before the request context and any conversion.
+    Calls are admitted on arrival, before they wait for a thread of the server pool,
+    so the queued calls count as in flight and the latency includes the queueing.
+    Only unary responses are sampled, streams hold the slot till the end.
+    The server pool must be wrapped by `AdmissionExecutor`, which runs the rejections
+    without waiting for the server pool and releases the slots of calls whose handler
+    never runs.
+    """
+
+    def __init__(self, limiter: AdaptiveLimiter, code: StatusCode = StatusCode.UNAVAILABLE) -> None:
+        self.limiter = limiter
+        self.code = code
+
+    def _reject(self, context):
+        context.abort(self.code, "Server is overloaded, try again later")
+
+    def _reject_wrapper(self, behavior):
+        @wraps(behavior)
+        def wrapper(request, context):
+            self._reject(context)
+
+        # run by the shed pool of `AdmissionExecutor`
+        wrapper.__grpckit_shed__ = True
+        return wrapper
+
+    def _wrapper(self, behavior, admission: Admission):
+        @wraps(behavior)
+        def wrapper(request, context):
+            sample = False
+            try:
+                response = behavior(request, context)
+                sample = True
+                return response
+            finally:
+                admission.release(sample)
+
+        # released by `AdmissionExecutor` if the behavior is never called
+        wrapper.__grpckit_admission__ = admission
+        return wrapper
+
+    def _stream_wrapper(self, behavior, admission: Admission):
+        @wraps(behavior)
+        def wrapper(request, context):
+            try:
+                yield from behavior(request, context)
+            finally:
+                admission.release()
+
+        wrapper.__grpckit_admission__ = admission
+        return wrapper
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or handler_call_details.method in _BYPASS_METHODS:
+            return handler
+        admission = self.limiter.admit()
+        if admission is None:
+            return wrap_server_method_handler(self._reject_wrapper, handler)
+        wrapper = self._stream_wrapper if handler.response_streaming else self._wrapper
+        return wrap_server_method_handler(lambda b: wrapper(b, admission), handler)
+
+
+class AsyncAdaptiveLimitInterceptor(BaseAsyncInterceptor):
+    """Adaptive limit interceptor for asyncio server"""
+
+    def __init__(self, limiter: AdaptiveLimiter, code: StatusCode = StatusCode.UNAVAILABLE) -> None:
+        self.limiter = limiter
+        self.code = code
+
+    async def _reject(self, context):
+        await context.abort(self.code, "Server is overloaded, try again later")
+
+    def _unary_wrapper(self, behavior):
+        @wraps(behavior)
+        async def wrapper(request, context):
+            limiter = self.limiter
+            if not limiter.try_acquire():
+                await self._reject(context)
+            start = time.monotonic()
+            latency = None
+            try:
+                response = await _maybe_await(behavior(request, context))
+                latency = time.monotonic() - start
+                return response
+            finally:
+                limiter.release(latency)
+
+        return wrapper
+
+    def _stream_wrapper(self, behavior):
+        @wraps(behavior)
+        async def wrapper(request, context):
+            limiter = self.limiter
+            if not limiter.try_acquire():
+                await self._reject(context)
+            try:
+                async for item in _iterate(behavior(request, context)):
+                    yield item
+            finally:
+                limiter.release()
+
+        return wrapper
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None or handler_call_details.method in _BYPASS_METHODS:
+            return handler
+        wrapper = self._stream_wrapper if handler.response_streaming else self._unary_wrapper
+        return wrap_server_method_handler(wrapper, handler)
@@ -0,0 +1,262 @@
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Union
+from inspect import iscoroutinefunction, isasyncgenfunction, isgeneratorfunction
+import asyncio
+import threading
+import time
+
+from .exception import ResourceExhausted
+
+
+class ConcurrencyLimit:
+    """Bulkhead which bounds the concurrent calls of a route or a service.
+    When `max_concurrency` calls are in flight, a new call waits in a queue of at most
+    `max_queue` calls for `queue_timeout` seconds (None waits until a slot is released),
+    otherwise it's rejected with `ResourceExhausted` immediately.
+    The same instance could be shared by several routes to bound them together.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int = 0,
+        queue_timeout: Optional[float] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        if max_concurrency <= 0:
+            raise ValueError(
+                f"Invalid max_concurrency: {max_concurrency}, should be greater than 0"
+            )
+        if max_queue < 0:
+            raise ValueError(f"Invalid max_queue: {max_queue}, should not be negative")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.name = name
+
+        self._lock = threading.Lock()
+        # waiters are threading.Event of plain handlers, or (loop, future) of coroutines,
+        # a released slot is handed over to the first waiter directly
+        self._waiters: deque = deque()
+        self.in_flight = 0
+        self.rejected = 0
+
+    @classmethod
+    def of(cls, value: Union[int, "ConcurrencyLimit", None], name: Optional[str] = None):
+        """Build limit from the shorthand, an int is the max concurrency without queue"""
+        if value is None:
+            return None
+        if isinstance(value, ConcurrencyLimit):
+            if value.name is None:
+                value.name = name
+            return value
+        return cls(value, name=name)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                in_flight=self.in_flight,
+                queued=len(self._waiters),
+                rejected=self.rejected,
+                max_concurrency=self.max_concurrency,
+            )
+
+    def _reject(self):
+        # must be called with lock held
+        self.rejected += 1
+        return ResourceExhausted(msg=f"Too many concurrent calls of {self.name or 'route'}")
+
+    def _try_acquire(self, waiter_factory: Callable):
+        """Return None if a slot is acquired, or the waiter queued"""
+        with self._lock:
+            if self.in_flight < self.max_concurrency:
+                self.in_flight += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                raise self._reject()
+            waiter = waiter_factory()
+            self._waiters.append(waiter)
+            return waiter
+
+    def _give_up(self, waiter) -> bool:
+        """Remove waiter from queue, False if the waiter has been handed a slot"""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            return True
+
+    def acquire(self) -> None:
+        waiter = self._try_acquire(threading.Event)
+        if waiter is None or waiter.wait(self.queue_timeout):
+            return
+        if self._give_up(waiter):
+            with self._lock:
+                raise self._reject()
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = self._try_acquire(lambda: (loop, loop.create_future()))
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if self._give_up(waiter):
+                with self._lock:
+                    raise self._reject()  # pylint: disable=raise-missing-from
+        except asyncio.CancelledError:
+            if not self._give_up(waiter):
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self.in_flight -= 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(_set_future, future)
+
+    def wrap(self, handler: Callable, response_streaming: bool = False) -> Callable:
+        """Wrap handler, the slot is held until the response (stream) is finished"""
+        if iscoroutinefunction(handler):
+
+            async def async_limited_handler(request, context):
+                await self.acquire_async()
+                try:
+                    return await handler(request, context)
+                finally:
+                    self.release()
+
+            return async_limited_handler
+
+        if isasyncgenfunction(handler):
+
+            async def async_limited_stream_handler(request, context):
+                await self.acquire_async()
+                try:
+                    async for item in handler(request, context):
+                        yield item
+                finally:
+                    self.release()
+
+            return async_limited_stream_handler
+
+        if response_streaming or isgeneratorfunction(handler):
+
+            def limited_stream_handler(request, context):
+                self.acquire()
+                try:
+                    yield from handler(request, context)
+                finally:
+                    self.release()
+
+            return limited_stream_handler
+
+        def limited_handler(request, context):
+            self.acquire()
+            try:
+                return handler(request, context)
+            finally:
+                self.release()
+
+        return limited_handler
+
+
+def _set_future(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveLimiter:
+    """Server wide admission control, the limit of concurrent RPCs is adjusted by AIMD
+    from the observed latency: it's increased by 1 when a call finishes within
+    `latency_threshold_ms` while the limit is in use, and multiplied by `backoff_ratio`
+    when a call is slower. RPCs beyond the limit are shed without queueing.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        latency_threshold_ms: float = 100,
+        backoff_ratio: float = 0.9,
+    ) -> None:
+        if not 0 < min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                "Invalid adaptive limit, should be 0 < min_limit <= initial_limit <= max_limit"
+            )
+        if not 0 < backoff_ratio < 1:
+            raise ValueError(f"Invalid backoff_ratio: {backoff_ratio}, should be in (0, 1)")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold_ms / 1000
+        self.backoff_ratio = backoff_ratio
+
+        self._lock = threading.Lock()
+        self._limit = float(initial_limit)
+        self.in_flight = 0
+        self.shed = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            limit, in_flight, shed = int(self._limit), self.in_flight, self.shed
+        return dict(limit=limit, in_flight=in_flight, shed=shed)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= int(self._limit):
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def admit(self) -> Optional["Admission"]:
+        """Take a slot for a call arriving now, None if it's shed"""
+        if not self.try_acquire():
+            return None
+        return Admission(self)
+
+    def release(self, latency: Optional[float] = None) -> None:
+        """Release the slot, `latency` in seconds is sampled if given"""
+        with self._lock:
+            if latency is not None:
+                if latency > self.latency_threshold:
+                    self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+                elif self.in_flight * 2 >= self._limit:
+                    # only grow when the limit is actually in use
+                    self._limit = min(self.max_limit, self._limit + 1)
+            self.in_flight -= 1
+
+
+class Admission:
+    """Slot of an admitted call, the latency is measured from the arrival.
+    The slot is released once, by the first `release`, the later ones are ignored.
+    """
+
+    __slots__ = ("limiter", "start", "released")
+
+    def __init__(self, limiter: AdaptiveLimiter) -> None:
+        self.limiter = limiter
+        self.start = time.monotonic()
+        self.released = False
+
+    def release(self, sample: bool = False) -> None:
+        """Release the slot, the latency since the arrival is sampled with `sample`"""
+        if self.released:
+            return
+        self.released = True
+        self.limiter.release(time.monotonic() - self.start if sample else None)
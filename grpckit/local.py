@@ -1,66 +1,62 @@
 import copy
-from threading import get_ident
+from contextvars import ContextVar
 
 """ Code stolen from werkzeug
 """
 
 
 class Local:
-    """ """
+    """Storage of context local attributes, backed by contextvars.
+    Each thread has its own context and each asyncio task runs in a copy of
+    the context, so the attributes are isolated between threads and coroutines.
+    """
 
-    __slots__ = ("__storage__", "__ident_func__")
+    __slots__ = ("_storage",)
 
     def __init__(self):
-        object.__setattr__(self, "__storage__", {})
-        object.__setattr__(self, "__ident_func__", get_ident)
+        object.__setattr__(self, "_storage", ContextVar(f"grpckit.Local<{id(self)}>.storage"))
 
     def __iter__(self):
-        return iter(self.__storage__.items())
+        return iter(self._storage.get({}).items())
 
     def __call__(self, proxy):
         """ """
         return LocalProxy(self, proxy)
 
     def __release_local__(self):
-        self.__storage__.pop(self.__ident_func__(), None)
+        self._storage.set({})
 
     def __getattr__(self, name):
         try:
-            return self.__storage__[self.__ident_func__()][name]
+            return self._storage.get({})[name]
         except KeyError:
             raise AttributeError(name)  # pylint: disable=raise-missing-from
 
     def __setattr__(self, name, value):
-        ident = self.__ident_func__()
-        storage = self.__storage__
-        try:
-            storage[ident][name] = value
-        except KeyError:
-            storage[ident] = {name: value}
+        # copy on write, the change would not leak to the context it's copied from
+        values = self._storage.get({}).copy()
+        values[name] = value
+        self._storage.set(values)
 
     def __delattr__(self, name):
+        values = self._storage.get({}).copy()
         try:
-            del self.__storage__[self.__ident_func__()][name]
+            del values[name]
         except KeyError:
             raise AttributeError(name)  # pylint: disable=raise-missing-from
+        self._storage.set(values)
 
 
 class LocalStack:
-    """ """
+    """Context local stack, backed by contextvars."""
+
+    __slots__ = ("_storage",)
 
     def __init__(self):
-        self._local = Local()
+        self._storage = ContextVar(f"grpckit.LocalStack<{id(self)}>.storage")
 
     def __release_local__(self):
-        self._local.__release_local__()
-
-    @property
-    def __ident_func(self):  # pylint: disable=unused-private-member
-        return self._local.__ident_func__
-
-    @__ident_func.setter
-    def __ident_func__(self, value):
-        object.__setattr__(self._local, "__ident_func__", value)
+        self._storage.set(())
 
     def __call__(self):
         def _lookup():
@@ -73,30 +69,23 @@ class LocalStack:
 
     def push(self, obj):
         """Push into stack"""
-        rv = getattr(self._local, "stack", None)
-        if rv is None:
-            self._local.stack = rv = []  # pylint: disable=assigning-non-slot
-        rv.append(obj)
-        return rv
+        # stack is an immutable tuple, the contexts copied from current one keep their own
+        stack = self._storage.get(()) + (obj,)
+        self._storage.set(stack)
+        return stack
 
     def pop(self):
-        stack = getattr(self._local, "stack", None)
-        if stack is None:
+        stack = self._storage.get(())
+        if not stack:
             return None
-
-        if len(stack) == 1:
-            self._local.__release_local__()
-            return stack[-1]
-
-        return stack.pop()
+        self._storage.set(stack[:-1])
+        return stack[-1]
 
     @property
     def top(self):
         """return stack top"""
-        try:
-            return self._local.stack[-1]
-        except (AttributeError, IndexError):
-            return None
+        stack = self._storage.get(())
+        return stack[-1] if stack else None
 
 
 class LocalProxy:
@@ -104,6 +93,7 @@ class LocalProxy:
 
     __slots__ = (
         "__local",
+        "__lookup",
         "__dict__",
         "__name__",
         "__wrapped__",
@@ -115,11 +105,12 @@ class LocalProxy:
 
         if callable(local) and not hasattr(local, "__release_local__"):
             object.__setattr__(self, "__wrapped__", local)
+            # resolve the lookup once, instead of checking the local on every access
+            object.__setattr__(self, "_LocalProxy__lookup", local)
+        else:
+            object.__setattr__(self, "_LocalProxy__lookup", self._lookup_local)
 
-    def _get_current_object(self):
-        """ """
-        if not hasattr(self.__local, "__release_local__"):
-            return self.__local()
+    def _lookup_local(self):
         try:
             return getattr(self.__local, self.__name__)
         except AttributeError:
@@ -127,6 +118,10 @@ class LocalProxy:
                 f"no object bond to {self.__name__}"
             )  # pylint: disable=(raise-missing-from
 
+    def _get_current_object(self):
+        """ """
+        return self.__lookup()
+
     @property
     def __dict__(self):
         try:
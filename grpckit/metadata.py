@@ -0,0 +1,110 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .globals import _request_ctx_stack
+
+_sentinel = object()
+
+
+class Metadata(Mapping):
+    """Read-only multi-map view over the invocation metadata tuples of a call.
+    Nothing is copied until the first lookup, which indexes the tuples once, later lookups
+    are O(1). `metadata[key]` is the first value of key and `getall(key)` all of them,
+    values of binary `-bin` keys are memoryviews over the received bytes.
+    Keys are lower case in gRPC.
+    """
+
+    __slots__ = ("_items", "_index", "_multi")
+
+    def __init__(self, items: Optional[Sequence[Tuple[str, Any]]] = None) -> None:
+        self._items = items or ()
+        self._index: Optional[Dict[str, Any]] = None
+        # values of the repeated keys, collected by `getall`
+        self._multi: Optional[Dict[str, List[Any]]] = None
+
+    def _build(self) -> Dict[str, Any]:
+        # the first value of repeated key wins
+        index = self._index = dict(reversed(self._items))
+        return index
+
+    def __getitem__(self, key: str) -> Any:
+        index = self._index
+        if index is None:
+            index = self._build()
+        value = index[key]
+        # only binary values are bytes, they are wrapped at the first access
+        if type(value) is bytes:
+            value = index[key] = memoryview(value)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._index
+        if index is None:
+            index = self._build()
+        value = index.get(key, _sentinel)
+        if value is _sentinel:
+            return default
+        if type(value) is bytes:
+            value = index[key] = memoryview(value)
+        return value
+
+    def getall(self, key: str) -> List[Any]:
+        """All values of key in received order"""
+        index = self._index
+        if index is None:
+            index = self._build()
+        if key not in index:
+            return []
+        if len(index) == len(self._items):
+            return [self[key]]
+        multi = self._multi
+        if multi is None:
+            multi = {}
+            for k, v in self._items:
+                if type(v) is bytes:
+                    v = memoryview(v)
+                values = multi.get(k)
+                if values is None:
+                    multi[k] = [v]
+                else:
+                    values.append(v)
+            self._multi = multi
+        return list(multi[key])
+
+    def __contains__(self, key: object) -> bool:
+        index = self._index
+        if index is None:
+            index = self._build()
+        return key in index
+
+    def __iter__(self) -> Iterator[str]:
+        index = self._index
+        if index is None:
+            index = self._build()
+        return iter(index)
+
+    def __len__(self) -> int:
+        index = self._index
+        if index is None:
+            index = self._build()
+        return len(index)
+
+    @property
+    def raw(self) -> Tuple[Tuple[str, Any], ...]:
+        """The metadata tuples as received, with repeated keys"""
+        return tuple(self._items)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self._items)!r})"
+
+
+def metadata_of(context: Any) -> Metadata:
+    """Metadata of the call, shared with `request.headers` when the request context of
+    the call is active.
+    """
+    if context is None:
+        return Metadata()
+    top = _request_ctx_stack.top
+    if top is not None and top.request.context is context:
+        return top.request.headers
+    return Metadata(context.invocation_metadata())
@@ -0,0 +1,123 @@
+from typing import Callable, Dict, Optional
+import logging
+import os
+import signal
+import time
+import traceback
+
+from .constant import K_GRPCKIT_WORKER_ID
+
+
+# signals which stop the workers, others (e.g. SIGHUP) are only forwarded
+_STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM, getattr(signal, "SIGQUIT", signal.SIGTERM))
+_FORWARD_SIGNALS = _STOP_SIGNALS + tuple(
+    getattr(signal, name) for name in ("SIGHUP", "SIGUSR1", "SIGUSR2") if hasattr(signal, name)
+)
+
+
+def _exit_code(status: int) -> int:
+    """Exit code of waited process, the negative signal number if it's killed,
+    like `os.waitstatus_to_exitcode` of python 3.9
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class Supervisor:
+    """Pre-fork supervisor, which forks `workers` processes to run `target`, forwards the
+    signals to them and restarts the ones died unexpectedly.
+    Everything loaded before `run` (routes, pb models) is shared by the workers.
+    """
+
+    def __init__(
+        self,
+        target: Callable[[], None],
+        workers: int,
+        restart_delay: float = 1.0,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Multi-process server requires os.fork, which is not available")
+        if workers <= 0:
+            raise ValueError(f"Invalid workers: {workers}, should be greater than 0")
+        self.target = target
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.logger = logger or logging.getLogger(__name__)
+
+        # pid -> index of worker
+        self.children: Dict[int, int] = dict()
+        self._started: Dict[int, float] = dict()
+        self._stopping = False
+
+    def _spawn(self, index: int) -> None:
+        started = self._started.get(index)
+        if started is not None:
+            # avoid busy restarting of a worker which crashes at once
+            delay = self.restart_delay - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+            if self._stopping:
+                return
+        self._started[index] = time.monotonic()
+
+        # signals are held until the worker is known, so that it's never missed by `_forward`
+        signal.pthread_sigmask(signal.SIG_BLOCK, _FORWARD_SIGNALS)
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, _FORWARD_SIGNALS)
+            return
+
+        # worker process
+        code = 0
+        try:
+            for signum in _FORWARD_SIGNALS:
+                signal.signal(signum, signal.SIG_DFL)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, _FORWARD_SIGNALS)
+            os.environ[K_GRPCKIT_WORKER_ID] = str(index)
+            self.target()
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:  # pylint: disable=broad-except
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)  # pylint: disable=protected-access
+
+    def _forward(self, signum, frame) -> None:
+        if signum in _STOP_SIGNALS:
+            self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        handlers = {signum: signal.signal(signum, self._forward) for signum in _FORWARD_SIGNALS}
+        try:
+            for index in range(self.workers):
+                self._spawn(index)
+
+            while self.children:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+                index = self.children.pop(pid, None)
+                if index is None:
+                    continue
+                if self._stopping:
+                    continue
+                self.logger.warning(
+                    "worker %s (pid %s) exited with status %s, restarting",
+                    index,
+                    pid,
+                    _exit_code(status),
+                )
+                self._spawn(index)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
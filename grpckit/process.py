@@ -0,0 +1,104 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+import importlib
+import multiprocessing
+import sys
+import threading
+
+
+# name of the default process pool, `@svc.route(executor="process")`
+PROCESS_POOL_DEFAULT = "process"
+
+# pools are declared by the app, and started when the app runs
+_pool_options: Dict[str, Dict[str, Any]] = {PROCESS_POOL_DEFAULT: dict(max_workers=None)}
+_pools: Dict[str, ProcessPoolExecutor] = dict()
+_lock = threading.Lock()
+_start_method = "spawn"
+
+
+def set_process_start_method(method: str) -> None:
+    """Start method of worker processes, `spawn` is safe with the threads of gRPC"""
+    global _start_method
+    _start_method = method
+
+
+def add_process_pool(name: str, max_workers: Optional[int] = None) -> None:
+    """Declare a named process pool, `max_workers` defaults to the number of CPUs"""
+    with _lock:
+        if name in _pools:
+            raise AssertionError(f"Process pool is started already: {name}")
+        _pool_options[name] = dict(max_workers=max_workers)
+
+
+def has_process_pool(name: str) -> bool:
+    return name in _pool_options
+
+
+def has_process_pool_started(name: str) -> bool:
+    return name in _pools
+
+
+def get_process_pool(name: str) -> ProcessPoolExecutor:
+    """Get the pool by name, it's started at the first time"""
+    pool = _pools.get(name)
+    if pool is not None:
+        return pool
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            options = _pool_options.get(name)
+            if options is None:
+                raise ValueError(f"Invalid process pool: {name}")
+            pool = _pools[name] = ProcessPoolExecutor(
+                mp_context=multiprocessing.get_context(_start_method), **options
+            )
+        return pool
+
+
+def shutdown_process_pools(wait: bool = True) -> None:
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        if sys.version_info >= (3, 9):
+            pool.shutdown(wait=wait, cancel_futures=True)
+            continue
+        # `cancel_futures` is new in python 3.9, cancel the pending work as what it does
+        for item in list(getattr(pool, "_pending_work_items", {}).values()):
+            item.future.cancel()
+        pool.shutdown(wait=wait)
+
+
+# route functions resolved in worker process
+_funcs: Dict[Tuple[str, str], Callable] = dict()
+
+
+def _resolve(module: str, qualname: str) -> Callable:
+    func = _funcs.get((module, qualname))
+    if func is None:
+        obj = importlib.import_module(module)
+        for name in qualname.split("."):
+            obj = getattr(obj, name)
+        # the module attribute is the wrapper registered by `@svc.route`
+        route = getattr(obj, "__grpckit_route__", None)
+        func = _funcs[(module, qualname)] = route.func if route is not None else obj
+    return func
+
+
+def _call_in_process(module: str, qualname: str, args: tuple, kwargs: dict) -> Any:
+    return _resolve(module, qualname)(*args, **kwargs)
+
+
+def process_function(func: Callable, pool_name: str) -> Callable:
+    """Proxy of module level `func` which runs it in the process pool and waits the result.
+    Arguments and result are pickled, the function itself is sent by reference.
+    """
+    module, qualname = func.__module__, func.__qualname__
+    if "<locals>" in qualname:
+        raise ValueError(f"Invalid process route {qualname}, it must be defined at module level")
+
+    def call(*args, **kwargs):
+        pool = get_process_pool(pool_name)
+        return pool.submit(_call_in_process, module, qualname, args, kwargs).result()
+
+    return call
@@ -0,0 +1,547 @@
+from typing import Optional, Callable, Dict, Any, Sequence, Tuple, Union
+from concurrent.futures import Executor
+from functools import partial
+from inspect import (
+    getfullargspec,
+    iscoroutinefunction,
+    isasyncgenfunction,
+    isgeneratorfunction,
+    unwrap,
+)
+import asyncio
+import contextvars
+import types
+
+from .batch import BatchPolicy, Batcher
+from .cache import TTL, ResponseCache
+from .executor import PriorityExecutor
+from .flight import SingleFlight
+from .limit import ConcurrencyLimit
+from .metadata import metadata_of
+from .process import has_process_pool, process_function
+from .utils.converter import get_plan
+from .utils.parser import (
+    JsonDictToMessage,
+    JsonMessageToDict,
+    PARSER_ENGINE_JSON,
+    get_parser_engine,
+)
+from .types import MessageView, WrappedDict
+
+# end of the response iterator pulled in executor, a handler may yield None
+_end = object()
+
+
+# context globals, a route whose code refers any of them needs the request context
+_CONTEXT_NAMES = frozenset(("request", "g", "current_app"))
+
+
+def uses_context(func: Callable) -> bool:
+    """Whether the code of func or its nested functions refers the context globals.
+    Functions called by func are not inspected.
+    """
+    code = getattr(unwrap(func), "__code__", None)
+    if code is None:
+        return True
+    codes = [code]
+    while codes:
+        code = codes.pop()
+        if not _CONTEXT_NAMES.isdisjoint(code.co_names):
+            return True
+        codes.extend(const for const in code.co_consts if isinstance(const, types.CodeType))
+    return False
+
+
+def bind_handler(func: Callable) -> Callable:
+    """Bind `request`/`context` arguments of a plain handler once,
+    instead of inspecting the arguments for every call.
+    """
+    args = getfullargspec(func).args
+    with_request = "request" in args
+    with_context = "context" in args
+
+    def options(request, context):
+        rv = dict()
+        if with_request:
+            rv["request"] = request
+        if with_context:
+            rv["context"] = context
+        return rv
+
+    if iscoroutinefunction(func):
+
+        async def handler(request, context):
+            return await func(**options(request, context))
+
+        return handler
+
+    if isasyncgenfunction(func):
+
+        async def stream_handler(request, context):
+            async for item in func(**options(request, context)):
+                yield item
+
+        return stream_handler
+
+    if with_request and with_context:
+        return lambda request, context: func(request=request, context=context)
+    if with_request:
+        return lambda request, context: func(request=request)
+    if with_context:
+        return lambda request, context: func(context=context)
+    return lambda request, context: func()
+
+
+def is_async_handler(handler: Callable) -> bool:
+    return iscoroutinefunction(handler) or isasyncgenfunction(handler)
+
+
+def _sync_request_iterator(request_iterator, loop):
+    """Consume async request iterator of asyncio server from a worker thread"""
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(request_iterator.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+def _identity(value):
+    return value
+
+
+async def _aiter_converted(request_iterator, to_view: Callable):
+    """Convert requests of asyncio request iterator lazily"""
+    async for item in request_iterator:
+        yield to_view(item)
+
+
+def to_executor_handler(
+    handler: Callable, executor: Executor, response_streaming: bool = False
+) -> Callable:
+    """Hand plain handler off to the executor of service on sync server, the thread of
+    gRPC server waits for the result, and the contextvars are copied to the worker thread.
+    The waiting threads of server are bounded by `Service.executor_limit`.
+    """
+    if not response_streaming:
+
+        def unary_handler(request, context):
+            ctx = contextvars.copy_context()
+            return executor.submit(ctx.run, handler, request, context).result()
+
+        return unary_handler
+
+    def stream_handler(request, context):
+        ctx = contextvars.copy_context()
+        iterator = executor.submit(ctx.run, handler, request, context).result()
+        iterator = iter(iterator)
+        while True:
+            item = executor.submit(ctx.run, next, iterator, _end).result()
+            if item is _end:
+                return
+            yield item
+
+    return stream_handler
+
+
+def to_async_handler(
+    handler: Callable,
+    request_streaming: bool = False,
+    response_streaming: bool = False,
+    executor: Optional[Executor] = None,
+    method: Optional[str] = None,
+) -> Callable:
+    """Adapt plain handler to asyncio server, it's run in executor so that the
+    event loop is not blocked, and the contextvars are copied to the worker thread.
+    With `PriorityExecutor`, the work is scheduled in the lane of the RPC.
+    """
+    if is_async_handler(handler):
+        return handler
+
+    def run(loop, request, context):
+        if request_streaming:
+            request = _sync_request_iterator(request, loop)
+        return handler(request, context)
+
+    def submitter(loop, context):
+        if isinstance(executor, PriorityExecutor):
+            lane = executor.lane_for(method, metadata_of(context))
+            return lambda fn: asyncio.wrap_future(executor.submit_lane(lane, fn), loop=loop)
+        return lambda fn: loop.run_in_executor(executor, fn)
+
+    if not response_streaming:
+
+        async def unary_handler(request, context):
+            loop = asyncio.get_running_loop()
+            ctx = contextvars.copy_context()
+            submit = submitter(loop, context)
+            return await submit(partial(ctx.run, run, loop, request, context))
+
+        return unary_handler
+
+    async def stream_handler(request, context):
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        submit = submitter(loop, context)
+        iterator = await submit(partial(ctx.run, run, loop, request, context))
+        iterator = iter(iterator)
+        while True:
+            item = await submit(partial(ctx.run, next, iterator, _end))
+            if item is _end:
+                return
+            yield item
+
+    return stream_handler
+
+
+class Route:
+    """Route registered by `@service.route`/`@service.route_reduced`.
+    Everything which does not depend on the request (pb models, arguments, converters)
+    is resolved by `compile`, which is invoked when the service is bound to server,
+    and the compiled handler is a straight function call.
+    """
+
+    def __init__(
+        self,
+        service_name: str,
+        func: Callable,
+        request_pb: Any = None,
+        response_pb: Any = None,
+        transparent_transform: bool = True,
+        reduced: bool = False,
+        request_streaming: bool = False,
+        cache: Optional[TTL] = None,
+        max_entries: int = 1024,
+        cache_metadata: Sequence[str] = (),
+        single_flight: bool = False,
+        batch: Optional[BatchPolicy] = None,
+        concurrency: Union[int, ConcurrencyLimit, None] = None,
+        priority: Optional[str] = None,
+        executor: Optional[str] = None,
+        before: Sequence[Callable] = (),
+        after: Sequence[Callable] = (),
+        lightweight: Optional[bool] = None,
+    ) -> None:
+        self.service_name = service_name
+        self.func = func
+        self.request_pb = request_pb
+        self.response_pb = response_pb
+        self.transparent_transform = transparent_transform
+        self.reduced = reduced
+        # the route receives an iterator of requests, for client-streaming method
+        self.request_streaming = request_streaming
+        # cache of serialized responses, for routes which are pure functions of request
+        self.cache: Optional[ResponseCache] = None
+        if cache is not None:
+            self.cache = ResponseCache(cache, max_entries=max_entries, metadata=cache_metadata)
+        # coalescing of concurrent calls with the same request
+        self.single_flight: Optional[SingleFlight] = SingleFlight() if single_flight else None
+        # concurrent calls are merged into a batch, the function takes a list of requests
+        self.batcher: Optional[Batcher] = Batcher(func, batch) if batch is not None else None
+        # bulkhead of the route, cache hits are not limited
+        self.limit: Optional[ConcurrencyLimit] = ConcurrencyLimit.of(
+            concurrency, name=f"{service_name}.{func.__name__}"
+        )
+        # default lane of `PriorityExecutor`, overridden by the invocation metadata
+        self.priority = priority
+        # name of process pool which runs the function, conversion stays in the server
+        self.executor = executor
+        # before/after request funcs of the route only, run inside the ones of service and app
+        self.before: Tuple[Callable, ...] = tuple(before)
+        self.after: Tuple[Callable, ...] = tuple(after)
+        # served without request/app context, None to infer it when it's enabled by app
+        self.lightweight = lightweight
+        # what the compiled handler calls, the function or its process proxy
+        self._target: Callable = func
+
+        # compiled lazily with models of current app if the route is never bound
+        self.handler: Callable = self._lazy_handler
+        # serializers used when registering the route to gRPC server directly,
+        # default to the resolved pb models
+        self.request_deserializer: Optional[Callable] = None
+        self.response_serializer: Optional[Callable] = None
+
+    @property
+    def name(self) -> str:
+        return self.func.__name__
+
+    def __call__(self, request, context):
+        return self.handler(request, context)
+
+    def _lazy_handler(self, request, context):
+        from .globals import current_app
+
+        return self.compile(current_app._pb_request_models)(request, context)
+
+    def _resolve_pb(self, explicit: Any, suffix: str, pb_models: Dict[str, Any]) -> Any:
+        # pb model is optional, if not passed will be read from the scanned models,
+        # the format is "{service.name}__pb2.{func.name}_{suffix}"
+        if explicit:
+            return explicit
+        pb_name = f"{self.service_name}__pb2.{self.name}_{suffix}"
+        pb = pb_models.get(pb_name)
+        if not pb:
+            raise ValueError(f"Invalid {suffix}_pb! Can't find '{pb_name}' for {self.name}")
+        return pb
+
+    def compile(self, pb_models: Optional[Dict[str, Any]] = None) -> Callable:
+        """Compile route into a fixed call plan, raise ValueError if pb model is missing"""
+        self._target = self.func
+        if self.executor is not None:
+            if not has_process_pool(self.executor):
+                raise ValueError(
+                    f"Invalid executor of {self.name}, no process pool {self.executor}"
+                )
+            if is_async_handler(self.func) or self.response_streaming or self.request_streaming:
+                raise ValueError(
+                    f"Invalid executor of {self.name}, only plain unary route runs in process"
+                )
+            self._target = process_function(self.func, self.executor)
+            if self.batcher is not None:
+                self.batcher.func = self._target
+
+        if self.batcher is not None and (self.request_streaming or self.response_streaming):
+            raise ValueError(f"Invalid batch of {self.name}, only unary route can be batched")
+
+        if not self.transparent_transform:
+            if self.batcher is not None:
+                handler = self._compile_batch(_identity, _identity)
+            else:
+                handler = self._compile_raw()
+        else:
+            pb_models = pb_models or {}
+            request_pb = self._resolve_pb(self.request_pb, "request", pb_models)
+            response_pb = self._resolve_pb(self.response_pb, "response", pb_models)
+            if self.batcher is not None:
+                _, to_message = self._compile_converters(request_pb, response_pb)
+                handler = self._compile_batch(
+                    self._compile_view(request_pb), self._compile_response(to_message)
+                )
+            elif self.request_streaming:
+                handler = self._compile_request_stream(request_pb, response_pb)
+            elif self.reduced:
+                handler = self._compile_reduced(request_pb, response_pb)
+            else:
+                handler = self._compile_transparent(request_pb, response_pb)
+            self.request_deserializer = request_pb.FromString
+            self.response_serializer = response_pb.SerializeToString
+        if self.single_flight is not None:
+            if self.request_streaming or self.response_streaming:
+                raise ValueError(
+                    f"Invalid single_flight of {self.name}, only unary route can be coalesced"
+                )
+            handler = self.single_flight.wrap(handler)
+        if self.limit is not None:
+            handler = self.limit.wrap(handler, self.response_streaming)
+        if self.cache is not None:
+            if self.request_streaming or self.response_streaming:
+                raise ValueError(f"Invalid cache of {self.name}, only unary route can be cached")
+            handler = self.cache.wrap(handler)
+        self.handler = handler
+        return handler
+
+    @property
+    def serialized_response(self) -> bool:
+        """Whether the compiled handler returns serialized response bytes"""
+        return self.cache is not None or self.single_flight is not None
+
+    @property
+    def response_streaming(self) -> bool:
+        """Generator routes serve server-streaming method, every yielded item is a response"""
+        return isgeneratorfunction(self.func) or isasyncgenfunction(self.func)
+
+    def _finalize(self, call: Callable, make_response: Callable) -> Callable:
+        """Build handler from `call(request, context)`, which invokes the route function,
+        according to the kind of route function. Responses of generator are converted one by
+        one when they're yielded, gRPC pulls the next one only after the previous is sent.
+        """
+        func = self.func
+        if iscoroutinefunction(func):
+
+            async def async_handler(request, context):
+                return make_response(await call(request, context))
+
+            return async_handler
+
+        if isasyncgenfunction(func):
+
+            async def async_stream_handler(request, context):
+                async for item in call(request, context):
+                    yield make_response(item)
+
+            return async_stream_handler
+
+        if isgeneratorfunction(func):
+
+            def stream_handler(request, context):
+                for item in call(request, context):
+                    yield make_response(item)
+
+            return stream_handler
+
+        def handler(request, context):
+            return make_response(call(request, context))
+
+        return handler
+
+    def _compile_raw(self) -> Callable:
+        func = self._target
+        if self.reduced:
+            if self.executor is not None:
+                # gRPC context can't be sent to worker process
+                return lambda request, context: func(request, None)
+            return func
+        if self.request_streaming:
+            # nothing to extract from the request iterator, pass it through
+            return self._finalize(lambda request, context: func(request), _identity)
+
+        args = tuple(getfullargspec(self.func).args)
+
+        def extract(request):
+            options = dict()
+            for arg in args:
+                if not hasattr(request, arg):
+                    raise ValueError(f"Invalid argument, missing {arg}")
+                options[arg] = getattr(request, arg)
+            return options
+
+        return self._finalize(lambda request, context: func(**extract(request)), _identity)
+
+    def _compile_converters(self, request_pb: Any, response_pb: Any):
+        if get_parser_engine() == PARSER_ENGINE_JSON:
+            return JsonMessageToDict, lambda data: JsonDictToMessage(data, response_pb())
+
+        request_plan = get_plan(request_pb.DESCRIPTOR)
+        response_plan = get_plan(response_pb.DESCRIPTOR)
+        return request_plan.to_dict, lambda data: response_plan.from_dict(data, response_pb())
+
+    def _compile_view(self, request_pb: Any) -> Callable:
+        """Request of reduced, streaming and batch routes, a lazy `MessageView` which converts
+        the fields when they're read. The JSON engine converts the whole message up front.
+        """
+        if get_parser_engine() == PARSER_ENGINE_JSON:
+            return lambda request: WrappedDict(JsonMessageToDict(request))
+
+        plan = get_plan(request_pb.DESCRIPTOR)
+        return lambda request: MessageView(request, plan)
+
+    def _compile_response(self, to_message: Callable) -> Callable:
+        if self.reduced:
+
+            def make_reduced_response(response):
+                if type(response) is not dict:
+                    raise AssertionError("Response must be python dict!")
+                return to_message(response)
+
+            return make_reduced_response
+
+        def make_response(response):
+            if not isinstance(response, dict) and not isinstance(response, tuple):
+                raise AssertionError("Response must be python dict or tuple!")
+            # if the response is a tuple, wrap the data with key in a dict automatically
+            if isinstance(response, tuple):
+                if len(response) != 2:
+                    raise AssertionError(
+                        "Result data must be two items, first is data and second is key"
+                    )
+                k, v = response
+                response = {k: v}
+            return to_message(response)
+
+        return make_response
+
+    def _compile_batch(self, to_item: Callable, make_response: Callable) -> Callable:
+        """Every call converts its own request and response, only the route function is
+        shared by the batch, so an invalid result fails its own call only.
+        """
+        batcher = self.batcher
+        if iscoroutinefunction(self.func):
+
+            async def async_batch_handler(request, context):
+                return make_response(await batcher.submit_async(to_item(request)))
+
+            return async_batch_handler
+
+        def batch_handler(request, context):
+            return make_response(batcher.submit(to_item(request)))
+
+        return batch_handler
+
+    def _compile_request_stream(self, request_pb: Any, response_pb: Any) -> Callable:
+        """The route is called with a lazy iterator of converted requests, every message
+        is converted when it's pulled, so the stream is never held in memory.
+        `route` calls `func(requests)`, `route_reduced` calls `func(requests, context)`.
+        """
+        func = self._target
+        reduced = self.reduced
+        to_view = self._compile_view(request_pb)
+        _, to_message = self._compile_converters(request_pb, response_pb)
+
+        def call(request_iterator, context):
+            # request iterator of asyncio server is async, unless the route is run in executor
+            if hasattr(request_iterator, "__aiter__"):
+                requests = _aiter_converted(request_iterator, to_view)
+            else:
+                requests = (to_view(item) for item in request_iterator)
+            if reduced:
+                return func(requests, context)
+            return func(requests)
+
+        return self._finalize(call, self._compile_response(to_message))
+
+    def _compile_reduced(self, request_pb: Any, response_pb: Any) -> Callable:
+        func = self._target
+        to_view = self._compile_view(request_pb)
+        _, to_message = self._compile_converters(request_pb, response_pb)
+        if self.executor is not None:
+            # gRPC context can't be sent to worker process, the view is sent as WrappedDict
+            return self._finalize(
+                lambda request, context: func(to_view(request), None),
+                self._compile_response(to_message),
+            )
+        return self._finalize(
+            lambda request, context: func(to_view(request), context),
+            self._compile_response(to_message),
+        )
+
+    def _compile_transparent(self, request_pb: Any, response_pb: Any) -> Callable:
+        func = self._target
+        args = tuple(getfullargspec(self.func).args)
+        to_dict, to_message = self._compile_converters(request_pb, response_pb)
+
+        if get_parser_engine() == PARSER_ENGINE_JSON:
+
+            def extract(request):
+                request = WrappedDict(to_dict(request))
+                options = dict()
+                for arg in args:
+                    if not hasattr(request, arg):
+                        raise ValueError(f"Invalid argument, missing {arg}")
+                    options[arg] = getattr(request, arg)
+                return options
+
+        else:
+            # convert only the fields which are bound to arguments
+            request_plan = get_plan(request_pb.DESCRIPTOR)
+            extractors = []
+            for arg in args:
+                fp = request_plan.fields_by_name.get(arg)
+                if fp is None:
+                    raise ValueError(
+                        f"Invalid argument '{arg}' of {self.name}, "
+                        f"not a field of {request_plan.full_name}"
+                    )
+                extractors.append((arg, fp.check_presence, fp.to_dict))
+            extractors = tuple(extractors)
+
+            def extract(request):
+                options = dict()
+                for arg, check_presence, field_to_dict in extractors:
+                    if check_presence and not request.HasField(arg):
+                        raise ValueError(f"Invalid argument, missing {arg}")
+                    options[arg] = field_to_dict(getattr(request, arg), True)
+                return options
+
+        return self._finalize(
+            lambda request, context: func(**extract(request)),
+            self._compile_response(to_message),
+        )
@@ -1,21 +1,52 @@
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, List, Sequence, Tuple, Union
+from concurrent.futures import Executor
 from functools import partial, wraps
-from inspect import getfullargspec, isfunction
+from inspect import isfunction
 
 import grpc
 
 
-from .utils.parser import MessageToDict, DictToMessage
-from .types import WrappedDict
+from .batch import BatchPolicy
+from .cache import TTL, passthrough_serializer
+from .executor import PriorityExecutor
+from .limit import ConcurrencyLimit
+from .route import (
+    Route,
+    bind_handler,
+    is_async_handler,
+    to_async_handler,
+    to_executor_handler,
+)
+from .utils.proto import method_streaming
 
 
 class Service:
 
-    _router: Dict[str, Callable] = dict()
+    _router: Dict[str, Callable]
 
-    def __init__(self, name: str, router: Optional[Dict[str, Callable]] = None) -> None:
+    def __init__(
+        self,
+        name: str,
+        router: Optional[Dict[str, Callable]] = None,
+        concurrency: Union[int, ConcurrencyLimit, None] = None,
+        executor: Optional[Executor] = None,
+        max_queue: int = 0,
+    ) -> None:
         # The name of service, this value must be the same as the value in ProtoBuf
         self.name = name
+        self._router = dict()
+        # bulkhead shared by all the methods of service
+        self.limit: Optional[ConcurrencyLimit] = ConcurrencyLimit.of(concurrency, name=name)
+        # dedicated executor which runs the plain handlers of service
+        self.executor: Optional[Executor] = executor
+        # calls waiting for the busy executor, beyond them calls are rejected on sync server
+        self.max_queue = max_queue
+        self.executor_limit: Optional[ConcurrencyLimit] = None
+        # compiled handlers of methods, filled by `compile`
+        self._handlers: Dict[str, Callable] = dict()
+        # before/after request funcs of all the methods of service
+        self.before_request_funcs: List[Callable] = []
+        self.after_request_funcs: List[Callable] = []
 
         if router and isinstance(router, dict):
             for method, func in router.items():
@@ -37,67 +68,73 @@ class Service:
         request_pb: Any = None,
         response_pb: Any = None,
         transparent_transform: bool = True,
+        request_streaming: bool = False,
+        cache: Optional[TTL] = None,
+        max_entries: int = 1024,
+        cache_metadata: Sequence[str] = (),
+        single_flight: bool = False,
+        batch: Optional[BatchPolicy] = None,
+        concurrency: Union[int, ConcurrencyLimit, None] = None,
+        priority: Optional[str] = None,
+        executor: Optional[str] = None,
+        before: Sequence[Callable] = (),
+        after: Sequence[Callable] = (),
+        lightweight: Optional[bool] = None,
     ) -> Callable:
         """Add new route for service, final edition which enable write service function
         like a native python function, grpckit will wrap all the things those need to
         be done for grpc framework, like request parse, register and so on.
+        With `request_streaming`, the function is called with a lazy iterator of requests
+        of client-streaming method, instead of the fields of a single request.
+        Generator function serves server-streaming method, every yielded dict is a response.
+        With `cache=TTL(seconds)`, serialized responses of unary route are cached by the request
+        and the `cache_metadata` keys, at most `max_entries` are kept. Only the responses whose
+        status is left OK are cached. A hit skips the function only: `before_request` funcs
+        (of app, service and route) still run, and `after_request` funcs get the serialized
+        response bytes instead of the message, `isinstance(response, bytes)` tells a hit.
+        With `single_flight`, concurrent calls of unary route with the same request are
+        coalesced, the function is run once and all the callers share its response or error.
+        With `batch=BatchPolicy(max_size, max_wait_ms)`, concurrent calls of unary route are
+        merged, the function takes a list of request dicts and returns a list of responses,
+        an exception instance in the list fails its own call only.
+        With `concurrency` (max concurrency or `ConcurrencyLimit`), calls beyond the limit
+        wait in its bounded queue or are rejected with `ResourceExhausted`.
+        `priority` is the default lane of the route when the app runs with `PriorityExecutor`.
+        With `executor="process"` (or the name of a pool added by `app.add_process_pool`),
+        the function of plain unary route runs in a worker process, it must be defined at
+        module level, and takes/returns picklable values.
+        `before`/`after` are request funcs of this route only, like `before_request` and
+        `after_request` of app and service, which run outside of them.
+        With `lightweight=True`, the route is served without request/app context, `request`,
+        `g` and teardown funcs are not available while exceptions are still mapped. None
+        infers it from the route when `GRPCKIT_LIGHTWEIGHT_ROUTES` is enabled.
         """
 
         def decorator(func: Callable) -> Callable:
             if not func:
                 raise ValueError("Invalid func! Func should not be None")
 
-            @wraps(func)
-            def wrapper(request, context):
-                args = getfullargspec(func).args
-                options = dict()
-                if transparent_transform:
-                    # response_pb/request_pb is optional, if not passed
-                    # will read response from current app domain
-                    # response format is "{service.name}__pb2.{func.name}_response"
-                    # request format is "{service.name}__pb2.{func.name}_request"
-                    if not response_pb:
-                        # HACK: stateful method which gets data from current_app obj
-                        from .globals import current_app
-
-                        response_pb_name = f"{self.name}__pb2.{func.__name__}_response"
-                        request_pb_name = f"{self.name}__pb2.{func.__name__}_request"
-                        _response_pb = current_app._pb_request_models.get(response_pb_name)
-                        _request_pb = current_app._pb_request_models.get(request_pb_name)
-                    else:
-                        _response_pb = response_pb
-                        _request_pb = request_pb
-                    if not _request_pb:
-                        raise ValueError("Invalid request_pb!")
-                    if not _response_pb:
-                        raise ValueError("Invalid response_pb!")
-                    request = WrappedDict(MessageToDict(request))
-                    for arg in args:
-                        if not hasattr(request, arg):
-                            raise ValueError(f"Invalid argument, missing {arg}")
-                        options[arg] = getattr(request, arg)
-                    response = func(**options)
-                    if not isinstance(response, dict) and not isinstance(response, tuple):
-                        raise AssertionError("Response must be python dict or tuple!")
-                    # if the response is a tuple, wrap the data with key in a dict automatically
-                    if isinstance(response, tuple):
-                        if len(response) != 2:
-                            raise AssertionError(
-                                "Result data must be two items, first is data and second is key"
-                            )
-                        k, v = response
-                        return DictToMessage({k: v}, _response_pb())
-                    return DictToMessage(response, _response_pb())
-                # if not using transparent_transform
-                for arg in args:
-                    if not hasattr(request, arg):
-                        raise ValueError(f"Invalid argument, missing {arg}")
-                    options[arg] = getattr(request, arg)
-                response = func(**options)
-                return response
-
-            self.add_method_rule(wrapper.__name__, wrapper)
-            return wrapper
+            return self._add_route(
+                Route(
+                    self.name,
+                    func,
+                    request_pb=request_pb,
+                    response_pb=response_pb,
+                    transparent_transform=transparent_transform,
+                    request_streaming=request_streaming,
+                    cache=cache,
+                    max_entries=max_entries,
+                    cache_metadata=cache_metadata,
+                    single_flight=single_flight,
+                    batch=batch,
+                    concurrency=concurrency,
+                    priority=priority,
+                    executor=executor,
+                    before=before,
+                    after=after,
+                    lightweight=lightweight,
+                )
+            )
 
         if func is None:
             return decorator
@@ -110,52 +147,96 @@ class Service:
         request_pb: Any = None,
         response_pb: Any = None,
         transparent_transform: bool = True,
+        request_streaming: bool = False,
+        cache: Optional[TTL] = None,
+        max_entries: int = 1024,
+        cache_metadata: Sequence[str] = (),
+        single_flight: bool = False,
+        batch: Optional[BatchPolicy] = None,
+        concurrency: Union[int, ConcurrencyLimit, None] = None,
+        priority: Optional[str] = None,
+        executor: Optional[str] = None,
+        before: Sequence[Callable] = (),
+        after: Sequence[Callable] = (),
+        lightweight: Optional[bool] = None,
     ) -> Callable:
         """Add new route for service and parse request/response,
         with reduced ability to parse request/response.
+        With `request_streaming`, the function is called with a lazy iterator of requests
+        of client-streaming method and the context.
+        `cache`, `single_flight`, `batch`, `concurrency`, `priority`, `executor`, `before`,
+        `after` and `lightweight` work the same as `route`, the context is None when the function
+        runs in a worker process.
         """
 
         def decorator(func: Callable) -> Callable:
             if not func:
                 raise ValueError("Invalid func! Func should not be None")
 
-            @wraps(func)
-            def wrapper(request, context):
-                if transparent_transform:
-                    # response_pb/request_pb is optional, if not passed
-                    # will read response from current app domain
-                    # response format is "{service.name}__pb2.{func.name}_response"
-                    # request format is "{service.name}__pb2.{func.name}_request"
-                    if not response_pb:
-                        # HACK: stateful method which gets data from current_app obj
-                        from .globals import current_app
-
-                        response_pb_name = f"{self.name}__pb2.{func.__name__}_response"
-                        request_pb_name = f"{self.name}__pb2.{func.__name__}_request"
-                        _response_pb = current_app._pb_request_models.get(response_pb_name)
-                        _request_pb = current_app._pb_request_models.get(request_pb_name)
-                    else:
-                        _response_pb = response_pb
-                        _request_pb = request_pb
-                    if not _request_pb:
-                        raise ValueError("Invalid request_pb!")
-                    if not _response_pb:
-                        raise ValueError("Invalid response_pb!")
-                    request = WrappedDict(MessageToDict(request))
-                    response = func(request, context)
-                    if type(response) is not dict:
-                        raise AssertionError("Response must be python dict!")
-                    return DictToMessage(response, _response_pb())
-                response = func(request, context)
-                return response
-
-            self.add_method_rule(wrapper.__name__, wrapper)
-            return wrapper
+            return self._add_route(
+                Route(
+                    self.name,
+                    func,
+                    request_pb=request_pb,
+                    response_pb=response_pb,
+                    transparent_transform=transparent_transform,
+                    reduced=True,
+                    request_streaming=request_streaming,
+                    cache=cache,
+                    max_entries=max_entries,
+                    cache_metadata=cache_metadata,
+                    single_flight=single_flight,
+                    batch=batch,
+                    concurrency=concurrency,
+                    priority=priority,
+                    executor=executor,
+                    before=before,
+                    after=after,
+                    lightweight=lightweight,
+                )
+            )
 
         if func is None:
             return decorator
         return decorator(func)
 
+    def before_request(self, func: Callable) -> Callable:
+        """Register before request func of all the methods of service, `func(request, context)`
+        returns a response to skip the method, like the one of app.
+        """
+        self.before_request_funcs.append(func)
+        return func
+
+    def after_request(self, func: Callable) -> Callable:
+        """Register after request func of all the methods of service, `func(response)`"""
+        self.after_request_funcs.append(func)
+        return func
+
+    def get_route(self, method: str) -> Optional[Route]:
+        """Route of method, None if it's not added by `route`/`route_reduced`"""
+        return getattr(self._router.get(method), "__grpckit_route__", None)
+
+    def request_hooks(self, method: str) -> Tuple[List[Callable], List[Callable]]:
+        """Before and after request funcs of method, from service and route"""
+        route = self.get_route(method)
+        before = [*self.before_request_funcs, *(route.before if route is not None else ())]
+        after = [*(route.after if route is not None else ()), *self.after_request_funcs]
+        return before, after
+
+    def _add_route(self, route: Route) -> Callable:
+        @wraps(route.func)
+        def wrapper(request, context):
+            return route.handler(request, context)
+
+        wrapper.__grpckit_route__ = route
+        # exposed for invalidation and stats, None if the route is not cached
+        wrapper.cache = route.cache
+        wrapper.single_flight = route.single_flight
+        wrapper.batcher = route.batcher
+        wrapper.limit = route.limit
+        self.add_method_rule(wrapper.__name__, wrapper)
+        return wrapper
+
     def add_method_rule(self, method: Optional[str] = None, func: Optional[Callable] = None) -> Any:
         """Add new method handler rule"""
         if not method or not func:
@@ -170,24 +251,170 @@ class Service:
 
         self._router[method] = func
 
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss/eviction counters of the cached routes, by method"""
+        rv = dict()
+        for method, func in self._router.items():
+            cache = getattr(func, "cache", None)
+            if cache is not None:
+                rv[method] = cache.stats
+        return rv
+
+    def single_flight_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Coalescing counters of the single-flight routes, by method"""
+        rv = dict()
+        for method, func in self._router.items():
+            single_flight = getattr(func, "single_flight", None)
+            if single_flight is not None:
+                rv[method] = single_flight.stats
+        return rv
+
+    def concurrency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """In-flight/queued/rejected counters of the limited routes, by method.
+        Counters of the service limit are `service.limit.stats`.
+        """
+        rv = dict()
+        for method, func in self._router.items():
+            limit = getattr(func, "limit", None)
+            if limit is not None:
+                rv[method] = limit.stats
+        return rv
+
     def _not_implement_method(self, context):
         """Handler for not implement method"""
         context.set_code(grpc.StatusCode.NOT_FOUND)
         context.set_details("Method not found!")
         raise NotImplementedError("Method not found!")
 
+    def compile(self, pb_models: Optional[Dict[str, Any]] = None) -> None:
+        """Compile every method into a fixed call plan, which resolves the pb models,
+        arguments and converters in advance. Raise ValueError if a pb model is missing.
+        """
+        handlers = dict()
+        for method, func in self._router.items():
+            route = getattr(func, "__grpckit_route__", None)
+            if route is not None:
+                handlers[method] = route.compile(pb_models)
+            else:
+                handlers[method] = bind_handler(func)
+        self._handlers = handlers
+
+    def generic_handler(
+        self,
+        descriptor: Any,
+        message_classes: Dict[str, Any],
+        aio: bool = False,
+        executor: Optional[Executor] = None,
+        wrap: Optional[Callable] = None,
+    ) -> grpc.GenericRpcHandler:
+        """Build generic rpc handler from service descriptor, every method is mapped
+        to its compiled handler directly, without the generated servicer and `__getattr__`.
+        Methods without route are left to gRPC, which responds UNIMPLEMENTED.
+        With `aio`, plain handlers are run in executor to keep the event loop responsive.
+        Plain handlers are run in the executor of service if it has one, on sync server
+        the thread of server waits for the executor, so the calls handed off are bounded by
+        the workers of executor plus `max_queue`, the others are rejected with
+        `ResourceExhausted` without holding the server threads.
+        `wrap(rpc_method_handler, full_method)` fuses the app pipeline into each handler.
+        """
+        rpc_method_handlers = dict()
+        if not aio and self.executor is not None:
+            self.executor_limit = self._executor_limit()
+        for method in descriptor.methods:
+            handler = self._handlers.get(method.name)
+            if handler is None:
+                continue
+
+            route = getattr(self._router[method.name], "__grpckit_route__", None)
+            request_deserializer = route and route.request_deserializer
+            response_serializer = route and route.response_serializer
+            if not request_deserializer:
+                request_deserializer = message_classes[method.input_type.full_name].FromString
+            if not response_serializer:
+                response_serializer = message_classes[
+                    method.output_type.full_name
+                ].SerializeToString
+
+            if route is not None and route.serialized_response:
+                response_serializer = passthrough_serializer(response_serializer)
+
+            client_streaming, server_streaming = method_streaming(method)
+            full_method = f"/{descriptor.full_name}/{method.name}"
+            pool = self.executor or executor
+            if route is not None and route.priority and isinstance(pool, PriorityExecutor):
+                pool.set_route_lane(full_method, route.priority)
+            if route is not None and route.request_streaming != client_streaming:
+                raise ValueError(
+                    f"Method '{method.name}' is {'' if client_streaming else 'not '}"
+                    "client-streaming, the route should be declared with "
+                    f"`request_streaming={client_streaming}`"
+                )
+            if route is not None and route.response_streaming != server_streaming:
+                raise ValueError(
+                    f"Method '{method.name}' is {'' if server_streaming else 'not '}"
+                    "server-streaming, the route should "
+                    f"{'' if server_streaming else 'not '}be a generator"
+                )
+            if aio:
+                handler = to_async_handler(
+                    handler, client_streaming, server_streaming, pool, full_method
+                )
+            elif is_async_handler(handler):
+                raise ValueError(
+                    f"Method '{method.name}' is a coroutine, run the app with `run_async`"
+                )
+            elif self.executor is not None:
+                handler = to_executor_handler(handler, self.executor, server_streaming)
+                if self.executor_limit is not None:
+                    handler = self.executor_limit.wrap(handler, server_streaming)
+            if self.limit is not None:
+                handler = self.limit.wrap(handler, server_streaming)
+
+            if client_streaming and server_streaming:
+                rpc_method_handler = grpc.stream_stream_rpc_method_handler
+            elif client_streaming:
+                rpc_method_handler = grpc.stream_unary_rpc_method_handler
+            elif server_streaming:
+                rpc_method_handler = grpc.unary_stream_rpc_method_handler
+            else:
+                rpc_method_handler = grpc.unary_unary_rpc_method_handler
+            rpc_method_handler = rpc_method_handler(
+                handler,
+                request_deserializer=request_deserializer,
+                response_serializer=response_serializer,
+            )
+            if wrap is not None:
+                rpc_method_handler = wrap(rpc_method_handler, full_method)
+            rpc_method_handlers[method.name] = rpc_method_handler
+        return grpc.method_handlers_generic_handler(descriptor.full_name, rpc_method_handlers)
+
+    def _executor_limit(self) -> Optional[ConcurrencyLimit]:
+        """Limit shared by the methods handed off to executor, the executors which
+        don't tell their max workers are not bounded.
+        """
+        max_workers = getattr(self.executor, "max_workers", None) or getattr(
+            self.executor, "_max_workers", None
+        )
+        if not max_workers:
+            return None
+        return ConcurrencyLimit(max_workers + self.max_queue, name=f"{self.name} executor")
+
+    def _get_handler(self, method: str) -> Callable:
+        handler = self._handlers.get(method)
+        if handler is None:
+            func = self._router.get(method)
+            if func is None:
+                return lambda request, context: self._not_implement_method(context)
+            handler = self._handlers[method] = bind_handler(func)
+        return handler
+
     def _default_handler(self, request, context, **kwargs):
         """Default handler"""
-        func = self._router.get(kwargs["func"], self._not_implement_method)
-        args = getfullargspec(func).args
-
-        options = {}
-        if "request" in args:
-            options["request"] = request
-        if "context" in args:
-            options["context"] = context
-
-        return func(**options)
+        return self._get_handler(kwargs["func"])(request, context)
 
     def __getattr__(self, item):
+        # compiled handler is returned directly, without dispatching by `_default_handler`
+        handler = self.__dict__.get("_handlers", {}).get(item)
+        if handler is not None:
+            return handler
         return partial(self._default_handler, func=item)
@@ -1,5 +1,9 @@
+from typing import Optional
+from collections.abc import Mapping
+
 from google.protobuf.message import Message
 
+from .utils.converter import MessagePlan, get_plan
 from .utils.parser import MessageToDict
 
 
@@ -26,6 +30,79 @@ class WrappedDict(dict):
         return ins
 
 
+class MessageView(Mapping):
+    """Lazy read-only view over a protobuf message, reads like `WrappedDict(MessageToDict(msg))`
+    but a field is converted only the first time it's accessed, and the whole message only when
+    it's iterated or `to_dict` is called. Nested messages are plain dict as what `MessageToDict`
+    does, and the keys match it, so unset message fields and oneof members are missing.
+    """
+
+    __slots__ = ("_message", "_plan", "_cache")
+
+    def __init__(self, message: Message, plan: Optional[MessagePlan] = None) -> None:
+        object.__setattr__(self, "_message", message)
+        object.__setattr__(self, "_plan", plan or get_plan(message.DESCRIPTOR))
+        object.__setattr__(self, "_cache", {})
+
+    def __getitem__(self, k):
+        cache = self._cache
+        try:
+            return cache[k]
+        except KeyError:
+            pass
+
+        plan = self._plan
+        if plan.well_known:
+            return self.to_dict()[k]
+
+        fp = plan.fields_by_name.get(k)
+        if fp is None or not plan.has_field(self._message, fp):
+            raise KeyError(k)
+        value = cache[k] = fp.to_dict(getattr(self._message, k), True)
+        return value
+
+    def __getattr__(self, k):
+        try:
+            # parse KeyError to AttributeError, which enables hasattr works as a daisy.
+            return self[k]
+        except KeyError:
+            raise AttributeError(k)
+
+    def __setattr__(self, k, v):
+        raise AttributeError(f"{self.__class__.__name__} is read-only, copy it by to_dict()")
+
+    def __iter__(self):
+        plan = self._plan
+        if plan.well_known:
+            return iter(self.to_dict())
+        message = self._message
+        return (fp.name for fp in plan.fields if plan.has_field(message, fp))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, k):
+        try:
+            self[k]
+        except KeyError:
+            return False
+        return True
+
+    def __dir__(self):
+        return list(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # e.g. sent to a worker process, which gets a WrappedDict of the whole message
+        return WrappedDict, (self.to_dict(),)
+
+    def to_dict(self) -> dict:
+        """Materialize the whole message as a new dict"""
+        return self._plan.to_dict(self._message)
+
+
 class GrpcKitRequest:
     def __init__(self):
         pass
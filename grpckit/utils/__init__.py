@@ -1,9 +1,9 @@
 import sys
-from inspect import isbuiltin
 
 import grpc
 
 from .._internal import _Missing
+from .converter import message_to_native
 
 
 _missing = _Missing()
@@ -34,47 +34,39 @@ class cached_property(property):
         return value
 
 
-_RPC_BUILTIN_KEYS = {
-    "Extensions",
-    "DESCRIPTOR",
-    "_SetListener",
-    "_extensions_by_name",
-    "_extensions_by_number",
-}
+def _iter_deserialized(request_iterator):
+    for item in request_iterator:
+        yield deserialize_request(item)
 
 
-def deserialize_request(obj):
-    """Deserialize gRPC request"""
+async def _aiter_deserialized(request_iterator):
+    async for item in request_iterator:
+        yield deserialize_request(item)
+
+
+def deserialize_request(obj, lazy: bool = False):
+    """Deserialize gRPC request.
+    Requests of client-streaming are read into a list, with `lazy` a generator is returned
+    instead, which converts every message when it arrives and holds none of them.
+    """
     if isinstance(obj, grpc._server._RequestIterator):
+        if lazy:
+            return _iter_deserialized(obj)
         fmt_rst = list()
         for item in obj:
             fmt_rst.append(deserialize_request(item))
         return fmt_rst
 
+    # request iterator of asyncio server can only be consumed lazily
+    if lazy and hasattr(obj, "__aiter__"):
+        return _aiter_deserialized(obj)
+
     # do nothing about non grpc generated obj
     if not hasattr(obj, "DESCRIPTOR"):
         return obj
 
-    fmt_rst = {}
-    for key in dir(obj):
-        # skip inner property
-        if key.startswith("__") or key in _RPC_BUILTIN_KEYS or not hasattr(obj, key):
-            continue
-
-        val = getattr(obj, key)
-        # skip builtin in property
-        if isbuiltin(val):
-            continue
-
-        # deserialize recursively
-        if isinstance(val, (list, tuple, set)):
-            val = [deserialize_request(v) for v in val]
-        elif hasattr(val, "DESCRIPTOR"):
-            val = deserialize_request(val)
-
-        fmt_rst[key] = val
-
-    return fmt_rst
+    # reuse the cached conversion plan of message type
+    return message_to_native(obj)
 
 
 def import_string(import_name):
@@ -0,0 +1,540 @@
+"""Descriptor driven converter between python dict and protobuf message.
+
+The output and the accepted input follow the proto3 JSON mapping which is used by
+`google.protobuf.json_format`, so the converter could be used as a drop-in
+replacement of the `Message -> JSON text -> dict` round-trip.
+Well-known types (Timestamp, Struct, wrappers and so on) have a special JSON form,
+they are delegated to `json_format` directly.
+
+Conversion is driven by a `MessagePlan` compiled once per message type and cached
+by the descriptor full name, so the descriptor is only reflected the first time a
+message type is seen.
+"""
+from typing import Dict, Any, Callable, Iterable, List, Tuple
+from functools import partial
+from threading import RLock
+import base64
+import math
+
+from google.protobuf import json_format
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.internal import type_checkers
+from google.protobuf.json_format import ParseError
+from google.protobuf.message import Message
+
+
+_INT64_TYPES = frozenset((FieldDescriptor.CPPTYPE_INT64, FieldDescriptor.CPPTYPE_UINT64))
+_INT_TYPES = frozenset(
+    (
+        FieldDescriptor.CPPTYPE_INT32,
+        FieldDescriptor.CPPTYPE_UINT32,
+        FieldDescriptor.CPPTYPE_INT64,
+        FieldDescriptor.CPPTYPE_UINT64,
+    )
+)
+_FLOAT_TYPES = frozenset((FieldDescriptor.CPPTYPE_FLOAT, FieldDescriptor.CPPTYPE_DOUBLE))
+
+_INFINITY = "Infinity"
+_NEG_INFINITY = "-Infinity"
+_NAN = "NaN"
+
+_to_shortest_float = getattr(type_checkers, "ToShortestFloat", lambda v: v)
+
+
+def _is_map_entry(field) -> bool:
+    if field.type != FieldDescriptor.TYPE_MESSAGE or not field.message_type.has_options:
+        return False
+    return field.message_type.GetOptions().map_entry
+
+
+def _is_well_known_type(message_descriptor) -> bool:
+    return message_descriptor.file.name.startswith("google/protobuf/")
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _int64_to_str(value: int) -> str:
+    return str(value)
+
+
+def _bytes_to_str(value: bytes) -> str:
+    return base64.b64encode(value).decode("utf-8")
+
+
+def _double_to_dict_value(value: float) -> Any:
+    if math.isinf(value):
+        return _NEG_INFINITY if value < 0.0 else _INFINITY
+    if math.isnan(value):
+        return _NAN
+    return value
+
+
+def _float_to_dict_value(value: float) -> Any:
+    if math.isinf(value) or math.isnan(value):
+        return _double_to_dict_value(value)
+    return _to_shortest_float(value)
+
+
+def _compile_scalar_to_dict(field) -> Callable[[Any], Any]:
+    """Pick the scalar strategy of proto3 JSON mapping, enums are kept as integers"""
+    cpp_type = field.cpp_type
+    if cpp_type in _INT64_TYPES:
+        return _int64_to_str
+    if cpp_type == FieldDescriptor.CPPTYPE_DOUBLE:
+        return _double_to_dict_value
+    if cpp_type == FieldDescriptor.CPPTYPE_FLOAT:
+        return _float_to_dict_value
+    if field.type == FieldDescriptor.TYPE_BYTES:
+        return _bytes_to_str
+    return _identity
+
+
+def _bool_key_to_str(key: bool) -> str:
+    return "true" if key else "false"
+
+
+def _convert_integer(value) -> int:
+    if isinstance(value, float) and not value.is_integer():
+        raise ParseError(f"Couldn't parse integer: {value}")
+    if isinstance(value, str) and value.find(" ") != -1:
+        raise ParseError(f'Couldn\'t parse integer: "{value}"')
+    if isinstance(value, bool):
+        raise ParseError(f"Bool value {value} is not acceptable for integer field")
+    return int(value)
+
+
+def _convert_float(value, field) -> float:
+    if isinstance(value, float):
+        if math.isnan(value):
+            raise ParseError('Couldn\'t parse NaN, use quoted "NaN" instead')
+        if math.isinf(value):
+            raise ParseError('Couldn\'t parse Infinity, use quoted "Infinity" instead')
+        if field.cpp_type == FieldDescriptor.CPPTYPE_FLOAT:
+            if value > type_checkers._FLOAT_MAX:  # pylint: disable=protected-access
+                raise ParseError("Float value too large")
+            if value < type_checkers._FLOAT_MIN:  # pylint: disable=protected-access
+                raise ParseError("Float value too small")
+    if value == "nan":
+        raise ParseError('Couldn\'t parse float "nan", use "NaN" instead')
+    try:
+        return float(value)
+    except ValueError as e:
+        if value == _NEG_INFINITY:
+            return float("-inf")
+        if value == _INFINITY:
+            return float("inf")
+        if value == _NAN:
+            return float("nan")
+        raise ParseError(f"Couldn't parse float: {value}") from e
+
+
+def _convert_bool(value, require_str: bool) -> bool:
+    if require_str:
+        if value == "true":
+            return True
+        if value == "false":
+            return False
+        raise ParseError(f'Expected "true" or "false", not {value}')
+    if not isinstance(value, bool):
+        raise ParseError("Expected true or false without quotes")
+    return value
+
+
+def _convert_bytes(value) -> bytes:
+    # raw bytes are accepted as they are, str must be base64 encoded
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    encoded = value.encode("utf-8")
+    return base64.urlsafe_b64decode(encoded + b"=" * (4 - len(encoded) % 4))
+
+
+def _convert_enum(value, field) -> int:
+    enum_type = field.enum_type
+    enum_value = enum_type.values_by_name.get(value) if isinstance(value, str) else None
+    if enum_value is not None:
+        return enum_value.number
+    try:
+        number = _convert_integer(value)
+    except (ValueError, TypeError) as e:
+        raise ParseError(f"Invalid enum value {value} for enum type {enum_type.full_name}") from e
+    if number not in enum_type.values_by_number and getattr(enum_type, "is_closed", False):
+        raise ParseError(f"Invalid enum value {value} for enum type {enum_type.full_name}")
+    return number
+
+
+def _convert_str(value) -> str:
+    # bytes are decoded as utf-8, which is compatible with simplejson.dumps
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    if not isinstance(value, str):
+        raise ParseError(f"Expected string but got {type(value).__name__}")
+    return value
+
+
+def _compile_scalar_from_dict(field, require_str: bool = False) -> Callable[[Any], Any]:
+    cpp_type = field.cpp_type
+    if cpp_type in _INT_TYPES:
+        return _convert_integer
+    if cpp_type in _FLOAT_TYPES:
+        return partial(_convert_float, field=field)
+    if cpp_type == FieldDescriptor.CPPTYPE_BOOL:
+        return partial(_convert_bool, require_str=require_str)
+    if cpp_type == FieldDescriptor.CPPTYPE_ENUM:
+        return partial(_convert_enum, field=field)
+    if field.type == FieldDescriptor.TYPE_BYTES:
+        return _convert_bytes
+    return _convert_str
+
+
+_KIND_SCALAR = 0
+_KIND_MESSAGE = 1
+_KIND_REPEATED_SCALAR = 2
+_KIND_REPEATED_MESSAGE = 3
+_KIND_MAP_SCALAR = 4
+_KIND_MAP_MESSAGE = 5
+
+
+class FieldPlan:
+    """Precomputed accessors of a single field"""
+
+    __slots__ = (
+        "name",
+        "kind",
+        "oneof",
+        "check_presence",
+        "accept_null",
+        "plan",
+        "to_dict",
+        "to_native",
+        "from_dict",
+    )
+
+    def __init__(self, field) -> None:
+        self.name = field.name
+        self.oneof = field.containing_oneof.name if field.containing_oneof else None
+
+        value_field = field
+        if field.label == FieldDescriptor.LABEL_REPEATED and _is_map_entry(field):
+            value_field = field.message_type.fields_by_name["value"]
+            is_message = value_field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE
+            self.kind = _KIND_MAP_MESSAGE if is_message else _KIND_MAP_SCALAR
+        elif field.label == FieldDescriptor.LABEL_REPEATED:
+            is_message = field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE
+            self.kind = _KIND_REPEATED_MESSAGE if is_message else _KIND_REPEATED_SCALAR
+        else:
+            is_message = field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE
+            self.kind = _KIND_MESSAGE if is_message else _KIND_SCALAR
+
+        # Singular message fields and oneof fields are only output when they are set,
+        # as what json_format does.
+        self.check_presence = self.kind == _KIND_MESSAGE or self.oneof is not None
+        self.accept_null = (
+            self.kind == _KIND_MESSAGE and field.message_type.full_name == "google.protobuf.Value"
+        )
+        self.plan = _compile_plan(value_field.message_type) if is_message else None
+
+        self.to_dict = self._compile_to_dict(field, value_field)
+        self.to_native = self._compile_to_native(field)
+        self.from_dict = self._compile_from_dict(field, value_field)
+
+    def _compile_to_dict(self, field, value_field) -> Callable:
+        kind = self.kind
+        if kind == _KIND_MESSAGE:
+            return self.plan.to_dict
+        if kind == _KIND_REPEATED_MESSAGE:
+            to_dict = self.plan.to_dict
+            return lambda value, incl: [to_dict(v, incl) for v in value]
+
+        conv = None if kind == _KIND_MAP_MESSAGE else _compile_scalar_to_dict(value_field)
+        if kind == _KIND_SCALAR:
+            return lambda value, incl: conv(value)
+        if kind == _KIND_REPEATED_SCALAR:
+            if conv is _identity:
+                return lambda value, incl: list(value)
+            return lambda value, incl: [conv(v) for v in value]
+
+        key_field = field.message_type.fields_by_name["key"]
+        key_to_str = _bool_key_to_str if key_field.cpp_type == FieldDescriptor.CPPTYPE_BOOL else str
+        if kind == _KIND_MAP_MESSAGE:
+            to_dict = self.plan.to_dict
+            return lambda value, incl: {key_to_str(k): to_dict(v, incl) for k, v in value.items()}
+        return lambda value, incl: {key_to_str(k): conv(v) for k, v in value.items()}
+
+    def _compile_to_native(self, field) -> Callable:
+        kind = self.kind
+        if kind == _KIND_SCALAR:
+            return _identity
+        if kind == _KIND_MESSAGE:
+            return self.plan.to_native
+        if kind == _KIND_REPEATED_SCALAR:
+            return list
+        if kind == _KIND_REPEATED_MESSAGE:
+            to_native = self.plan.to_native
+            return lambda value: [to_native(v) for v in value]
+        if kind == _KIND_MAP_MESSAGE:
+            to_native = self.plan.to_native
+            return lambda value: {k: to_native(v) for k, v in value.items()}
+        return dict
+
+    def _compile_from_dict(self, field, value_field) -> Callable:
+        """Return setter with signature of func(message, value, ignore_unknown_fields)"""
+        name = self.name
+        kind = self.kind
+        if kind == _KIND_MESSAGE:
+            from_dict = self.plan.from_dict
+
+            def set_message(message, value, ignore_unknown_fields):
+                sub_message = getattr(message, name)
+                sub_message.SetInParent()
+                from_dict(value, sub_message, ignore_unknown_fields)
+
+            return set_message
+
+        if kind in (_KIND_MAP_SCALAR, _KIND_MAP_MESSAGE):
+            return self._compile_map_from_dict(field, value_field)
+        if kind == _KIND_REPEATED_MESSAGE:
+            return self._compile_repeated_message_from_dict(field)
+        if kind == _KIND_REPEATED_SCALAR:
+            return self._compile_repeated_scalar_from_dict(field)
+
+        conv = _compile_scalar_from_dict(field)
+
+        def set_scalar(message, value, ignore_unknown_fields):
+            setattr(message, name, conv(value))
+
+        return set_scalar
+
+    def _compile_map_from_dict(self, field, value_field) -> Callable:
+        name = self.name
+        key_field = field.message_type.fields_by_name["key"]
+        key_conv = _compile_scalar_from_dict(key_field, require_str=True)
+        if self.kind == _KIND_MAP_MESSAGE:
+            from_dict = self.plan.from_dict
+
+            def set_map(message, value, ignore_unknown_fields):
+                if not isinstance(value, dict):
+                    raise ParseError(f"Map field {name} must be in a dict which is {value}")
+                message.ClearField(name)
+                container = getattr(message, name)
+                for k, v in value.items():
+                    from_dict(v, container[key_conv(k)], ignore_unknown_fields)
+
+            return set_map
+
+        value_conv = _compile_scalar_from_dict(value_field)
+
+        def set_map(message, value, ignore_unknown_fields):
+            if not isinstance(value, dict):
+                raise ParseError(f"Map field {name} must be in a dict which is {value}")
+            message.ClearField(name)
+            container = getattr(message, name)
+            for k, v in value.items():
+                container[key_conv(k)] = value_conv(v)
+
+        return set_map
+
+    def _compile_repeated_message_from_dict(self, field) -> Callable:
+        name = self.name
+        from_dict = self.plan.from_dict
+        accept_null = field.message_type.full_name == "google.protobuf.Value"
+
+        def set_repeated_message(message, value, ignore_unknown_fields):
+            if not isinstance(value, (list, tuple)):
+                raise ParseError(f"repeated field {name} must be in [] which is {value}")
+            message.ClearField(name)
+            container = getattr(message, name)
+            for index, item in enumerate(value):
+                if item is None and not accept_null:
+                    raise ParseError(
+                        f"null is not allowed to be used as an element in a repeated field "
+                        f"at {name}[{index}]"
+                    )
+                from_dict(item, container.add(), ignore_unknown_fields)
+
+        return set_repeated_message
+
+    def _compile_repeated_scalar_from_dict(self, field) -> Callable:
+        name = self.name
+        conv = _compile_scalar_from_dict(field)
+
+        def set_repeated_scalar(message, value, ignore_unknown_fields):
+            if not isinstance(value, (list, tuple)):
+                raise ParseError(f"repeated field {name} must be in [] which is {value}")
+            if None in value:
+                raise ParseError(
+                    f"null is not allowed to be used as an element in a repeated field "
+                    f"at {name}[{value.index(None)}]"
+                )
+            message.ClearField(name)
+            getattr(message, name).extend([conv(item) for item in value])
+
+        return set_repeated_scalar
+
+
+class MessagePlan:
+    """Conversion plan of a message type, compiled once and shared by all instances"""
+
+    __slots__ = (
+        "full_name",
+        "well_known",
+        "fields",
+        "fields_by_name",
+        "fields_by_key",
+        "fields_by_number",
+    )
+
+    def __init__(self, descriptor) -> None:
+        self.full_name: str = descriptor.full_name
+        self.well_known: bool = _is_well_known_type(descriptor)
+        self.fields: Tuple[FieldPlan, ...] = ()
+        self.fields_by_name: Dict[str, FieldPlan] = {}
+        self.fields_by_key: Dict[str, FieldPlan] = {}
+        self.fields_by_number: Dict[int, FieldPlan] = {}
+
+    def compile(self, descriptor) -> None:
+        fields: List[FieldPlan] = []
+        for field in descriptor.fields:
+            fp = FieldPlan(field)
+            fields.append(fp)
+            self.fields_by_number[field.number] = fp
+            self.fields_by_name[field.name] = fp
+        # json name takes precedence over proto field name, as what json_format does
+        self.fields_by_key.update(self.fields_by_name)
+        for field in descriptor.fields:
+            self.fields_by_key[field.json_name] = self.fields_by_number[field.number]
+        self.fields = tuple(fields)
+
+    def to_dict(self, message: Message, including_default_value_fields: bool = True) -> Dict:
+        """Convert message to dict with proto field names and integer enums"""
+        if self.well_known:
+            return json_format.MessageToDict(
+                message,
+                including_default_value_fields=including_default_value_fields,
+                preserving_proto_field_name=True,
+                use_integers_for_enums=True,
+            )
+
+        rv = {}
+        if not including_default_value_fields:
+            fields_by_number = self.fields_by_number
+            for field, value in message.ListFields():
+                fp = fields_by_number.get(field.number)
+                if fp is not None and not field.is_extension:
+                    rv[fp.name] = fp.to_dict(value, False)
+            return rv
+
+        for fp in self.fields:
+            if fp.check_presence and not message.HasField(fp.name):
+                continue
+            rv[fp.name] = fp.to_dict(getattr(message, fp.name), True)
+        return rv
+
+    def has_field(self, message: Message, fp: FieldPlan) -> bool:
+        """Whether the field would be output by `to_dict` with default values"""
+        return not fp.check_presence or message.HasField(fp.name)
+
+    def to_native(self, message: Message) -> Dict:
+        """Convert message to dict of native python values, every field is included"""
+        return {fp.name: fp.to_native(getattr(message, fp.name)) for fp in self.fields}
+
+    def from_dict(
+        self, data: Dict, message: Message, ignore_unknown_fields: bool = True
+    ) -> Message:
+        """Merge dict into message, field names could be proto field name or json name"""
+        if self.well_known:
+            return json_format.ParseDict(data, message, ignore_unknown_fields=ignore_unknown_fields)
+        if not isinstance(data, dict):
+            raise ParseError(f"Message {self.full_name} must be a dict which is {data}")
+
+        fields_by_key = self.fields_by_key
+        oneofs = None
+        for key, value in data.items():
+            fp = fields_by_key.get(key)
+            if fp is None:
+                if ignore_unknown_fields:
+                    continue
+                raise ParseError(f'Message type "{self.full_name}" has no field named "{key}".')
+
+            if value is None:
+                if fp.accept_null:
+                    getattr(message, fp.name).null_value = 0
+                else:
+                    message.ClearField(fp.name)
+                continue
+
+            if fp.oneof is not None:
+                oneofs = oneofs if oneofs is not None else set()
+                if fp.oneof in oneofs:
+                    raise ParseError(
+                        f'Message type "{self.full_name}" should not have multiple '
+                        f'"{fp.oneof}" oneof fields.'
+                    )
+                oneofs.add(fp.oneof)
+
+            try:
+                fp.from_dict(message, value, ignore_unknown_fields)
+            except (ParseError, ValueError, TypeError) as e:
+                raise ParseError(f"Failed to parse {key} field: {e}.") from e
+        return message
+
+
+_plans: Dict[str, MessagePlan] = {}
+# plans which are being compiled, for the recursive message types
+_building: Dict[str, MessagePlan] = {}
+_lock = RLock()
+
+
+def _compile_plan(descriptor) -> MessagePlan:
+    with _lock:
+        name = descriptor.full_name
+        plan = _plans.get(name) or _building.get(name)
+        if plan is not None:
+            return plan
+
+        outermost = not _building
+        plan = _building[name] = MessagePlan(descriptor)
+        try:
+            plan.compile(descriptor)
+            if outermost:
+                # publish plans only when all the nested plans are compiled
+                _plans.update(_building)
+        finally:
+            if outermost:
+                _building.clear()
+        return plan
+
+
+def get_plan(descriptor) -> MessagePlan:
+    """Get the cached conversion plan of message type, compile it if not exists"""
+    plan = _plans.get(descriptor.full_name)
+    if plan is None:
+        plan = _compile_plan(descriptor)
+    return plan
+
+
+def compile_plans(models: Iterable[Any]) -> int:
+    """Compile conversion plans of message classes in advance,
+    return the number of compiled plans.
+    """
+    for model in models:
+        descriptor = getattr(model, "DESCRIPTOR", None)
+        if descriptor is not None:
+            get_plan(descriptor)
+    return len(_plans)
+
+
+def message_to_dict(message: Message, including_default_value_fields: bool = True) -> Dict:
+    """Convert message to dict with proto field names and integer enums"""
+    return get_plan(message.DESCRIPTOR).to_dict(message, including_default_value_fields)
+
+
+def message_to_native(message: Message) -> Dict:
+    """Convert message to dict of native python values"""
+    return get_plan(message.DESCRIPTOR).to_native(message)
+
+
+def dict_to_message(data: Dict, message: Message, ignore_unknown_fields: bool = True) -> Message:
+    """Merge dict into message, field names could be proto field name or json name"""
+    return get_plan(message.DESCRIPTOR).from_dict(data, message, ignore_unknown_fields)
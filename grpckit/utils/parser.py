@@ -1,15 +1,73 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 import simplejson
 from google.protobuf import json_format
 from google.protobuf.message import Message
 
+from . import converter
+
+
+# walk the message descriptor directly, default engine
+PARSER_ENGINE_DESCRIPTOR = "descriptor"
+# round-trip through JSON text, the legacy engine
+PARSER_ENGINE_JSON = "json"
+
+_PARSER_ENGINES = (PARSER_ENGINE_DESCRIPTOR, PARSER_ENGINE_JSON)
+_parser_engine = PARSER_ENGINE_DESCRIPTOR
+
+
+def set_parser_engine(engine: str) -> None:
+    """Set the default engine used by `DictToMessage` and `MessageToDict`"""
+    global _parser_engine
+    if engine not in _PARSER_ENGINES:
+        raise ValueError(f"Invalid parser engine: {engine}, should be one of {_PARSER_ENGINES}")
+    _parser_engine = engine
+
+
+def get_parser_engine() -> str:
+    return _parser_engine
+
 
 def DictToMessage(
     data: Dict[Any, Any],
     message: Message,
     ignore_unknown_fields: bool = True,
+    engine: Optional[str] = None,
 ) -> Message:
+    if not isinstance(message, Message):
+        raise ValueError("Invalid message! Must be an instance of Message")
+    if (engine or _parser_engine) == PARSER_ENGINE_DESCRIPTOR:
+        return converter.dict_to_message(data, message, ignore_unknown_fields=ignore_unknown_fields)
+    return JsonDictToMessage(data, message, ignore_unknown_fields=ignore_unknown_fields)
+
+
+def MessageToDict(
+    message: Message,
+    including_default_value_fields: bool = True,
+    preserving_proto_field_name: bool = True,
+    use_integers_for_enums: bool = True,
+    engine: Optional[str] = None,
+) -> Dict[Any, Any]:
+    # descriptor engine only speaks proto field names and integer enums
+    native = preserving_proto_field_name and use_integers_for_enums
+    if native and (engine or _parser_engine) == PARSER_ENGINE_DESCRIPTOR:
+        return converter.message_to_dict(
+            message, including_default_value_fields=including_default_value_fields
+        )
+    return JsonMessageToDict(
+        message,
+        including_default_value_fields=including_default_value_fields,
+        preserving_proto_field_name=preserving_proto_field_name,
+        use_integers_for_enums=use_integers_for_enums,
+    )
+
+
+def JsonDictToMessage(
+    data: Dict[Any, Any],
+    message: Message,
+    ignore_unknown_fields: bool = True,
+) -> Message:
+    """Legacy engine, dump data to JSON text then parse it into message"""
     if not isinstance(message, Message):
         raise ValueError("Invalid message! Must be an instance of Message")
     return json_format.Parse(
@@ -19,12 +77,13 @@ def DictToMessage(
     )
 
 
-def MessageToDict(
+def JsonMessageToDict(
     message: Message,
     including_default_value_fields: bool = True,
     preserving_proto_field_name: bool = True,
     use_integers_for_enums: bool = True,
 ) -> Dict[Any, Any]:
+    """Legacy engine, print message to JSON text then load it as dict"""
     return simplejson.loads(
         json_format.MessageToJson(
             message=message,
@@ -1,8 +1,12 @@
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Any
 import importlib
 import os
 import re
 
+from google.protobuf.descriptor_pb2 import MethodDescriptorProto
+
+from .converter import compile_plans
+
 r_add_funcs = re.compile(r"add_\S+Servicer_to_server")
 r_request_model = re.compile(r"request_serializer=(.+?)\.(.+?)\.SerializeToString")
 r_response_model = re.compile(r"response_deserializer=(.+?)\.(.+?)\.FromString,")
@@ -51,3 +55,40 @@ def scan_pb_grpc(path=None, import_request_model=False) -> Tuple[Dict, Dict]:
                     server_request_models[f"{model}.{response}"] = getattr(_m, response)
 
     return server_register_funcs, server_request_models
+
+
+def precompile_pb_models(path=None, pb_models=None) -> int:
+    """Compile conversion plans of all pb models in advance,
+    so the first request would not pay for reflecting the descriptors.
+    Return the number of compiled plans.
+    """
+    if pb_models is None:
+        _, pb_models = scan_pb_grpc(path=path, import_request_model=True)
+    return compile_plans(pb_models.values())
+
+
+def scan_service_descriptors(pb_models: Dict[str, Any]) -> Tuple[Dict, Dict]:
+    """Return two dict read from the files where pb models are defined,
+    the former is service descriptors by service name,
+    the latter is message classes by message full name
+    """
+    services = dict()
+    message_classes = dict()
+    for model in pb_models.values():
+        descriptor = getattr(model, "DESCRIPTOR", None)
+        if descriptor is None:
+            continue
+        message_classes[descriptor.full_name] = model
+        for name, service in descriptor.file.services_by_name.items():
+            services[name] = service
+    return services, message_classes
+
+
+def method_streaming(method) -> Tuple[bool, bool]:
+    """Return (client_streaming, server_streaming) of a method descriptor"""
+    if hasattr(method, "client_streaming"):
+        return method.client_streaming, method.server_streaming
+    # old protobuf runtime does not expose the streaming flags
+    proto = MethodDescriptorProto()
+    method.CopyToProto(proto)
+    return proto.client_streaming, proto.server_streaming
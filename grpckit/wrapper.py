@@ -1,53 +1,109 @@
+from .metadata import Metadata
 from .utils import (
-    cached_property,
+    _missing,
     deserialize_request,
 )
 
 
 class Request:
-    def __init__(self, request, context):
+    """Request of current call, the lazy properties are computed at the first access.
+    Instances are recycled by `RequestContext.acquire`, so they should not be kept after
+    the call is finished. Attributes set by the application (e.g. `request.user`) are
+    cleared when the request is rebound to another call.
+    """
+
+    __slots__ = (
+        "__dict__",
+        "request",
+        "context",
+        "_method",
+        "_headers",
+        "_values",
+        "_stream",
+        "_rpc_event",
+    )
+
+    def __init__(self, request, context, method=None):
         """Init request"""
+        self.reset(request, context, method)
+
+    def reset(self, request=None, context=None, method=None) -> None:
+        """Rebind to another call, the lazy properties and extra attributes are cleared"""
+        extra = self.__dict__
+        if extra:
+            extra.clear()
         self.request = request
         self.context = context
+        self._method = method
+        self._headers = _missing
+        self._values = _missing
+        self._stream = _missing
+        self._rpc_event = _missing
 
-    @cached_property
+    @property
     def headers(self):
-        """Get header"""
-        if self.rpc_event is not None:
-            metadata = getattr(self.rpc_event, "invocation_metadata")
-            return dict(metadata)
-        return None
+        """Get invocation metadata as a read-only `Metadata` view"""
+        rv = self._headers
+        if rv is _missing:
+            rv = None
+            if self.context is not None:
+                rv = Metadata(self.context.invocation_metadata())
+            self._headers = rv
+        return rv
 
-    @cached_property
+    @property
     def values(self):
         """Get request params"""
-        if self.request is not None:
-            return deserialize_request(self.request)
-        return None
+        rv = self._values
+        if rv is _missing:
+            rv = None
+            if self.request is not None:
+                rv = deserialize_request(self.request)
+            self._values = rv
+        return rv
+
+    @property
+    def stream(self):
+        """Get request params of client-streaming request lazily,
+        every message is converted when it's pulled from the stream.
+        The stream can only be consumed once, either by this or by `values`.
+        """
+        rv = self._stream
+        if rv is _missing:
+            rv = None
+            if self.request is not None:
+                rv = deserialize_request(self.request, lazy=True)
+            self._stream = rv
+        return rv
 
-    @cached_property
+    @property
     def method(self):
         """Get request method"""
-        if self.call_details is not None:
+        # asyncio context has no rpc event, method is passed by interceptor
+        if self._method is None and self.call_details is not None:
             method = getattr(self.call_details, "method")
-            return method.decode("utf8") if method else method
-        return None
+            self._method = method.decode("utf8") if method else method
+        return self._method
 
-    @cached_property
+    @property
     def service(self):
         """Get request method"""
         if self.method is not None:
             return self.method.split("/")[-2]
         return None
 
-    @cached_property
+    @property
     def rpc_event(self):
         """Get rpc event"""
-        if self.context is not None:
-            return getattr(self.context, "_rpc_event")
-        return None
+        rv = self._rpc_event
+        if rv is _missing:
+            rv = None
+            if self.context is not None:
+                rv = getattr(self.context, "_rpc_event", None)
+            self._rpc_event = rv
+        return rv
 
-    @cached_property
+    @property
     def call_details(self):
         """Get call details"""
         if self.rpc_event is not None:
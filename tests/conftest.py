@@ -0,0 +1,92 @@
+"""Compile the protos of the tests into a temporary directory, which is importable by the
+test modules as `kit_pb2`, `legacy_pb2`, `Greeter_pb2`/`Greeter_pb2_grpc` and
+`Pinger_pb2`/`Pinger_pb2_grpc`, and the fixtures which serve an app on a local port.
+"""
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import grpc
+import grpc_tools
+import pytest
+from grpc_tools import protoc
+
+from grpckit import GrpcKitApp
+
+PROTOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "protos")
+
+_out = tempfile.mkdtemp(prefix="grpckit-tests-")
+
+
+def _compile_protos() -> None:
+    # the well-known types shipped with grpcio-tools
+    includes = os.path.join(os.path.dirname(grpc_tools.__file__), "_proto")
+    files = sorted(name for name in os.listdir(PROTOS) if name.endswith(".proto"))
+    args = ["grpc_tools.protoc", f"-I{PROTOS}", f"-I{includes}"]
+    rv = protoc.main(args + [f"--python_out={_out}", f"--grpc_python_out={_out}", *files])
+    if rv != 0:
+        raise RuntimeError(f"Failed to compile protos of tests in {PROTOS}")
+    sys.path.insert(0, _out)
+
+
+_compile_protos()
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_out, ignore_errors=True)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """App which scans the compiled protos, services are registered on a clean registry"""
+    monkeypatch.chdir(_out)
+    monkeypatch.setattr(GrpcKitApp, "_services", dict())
+    monkeypatch.setattr(GrpcKitApp, "_pb_request_models", dict())
+    return GrpcKitApp()
+
+
+@pytest.fixture
+def serve():
+    """`serve(app, aio=False)` runs the app in a thread and returns a channel to it,
+    the servers which are still running are stopped at teardown.
+    """
+    running = []
+
+    def start(app, aio=False):
+        port = free_port()
+        thread = threading.Thread(
+            target=app.run_async if aio else app.run,
+            kwargs=dict(host="127.0.0.1", port=port),
+            daemon=True,
+        )
+        thread.start()
+        wait_for(lambda: app.serving or not thread.is_alive())
+        if not app.serving:
+            raise RuntimeError("Failed to start server")
+        channel = grpc.insecure_channel(f"127.0.0.1:{port}")
+        running.append((app, thread, channel))
+        return channel
+
+    yield start
+    for app, thread, channel in running:
+        channel.close()
+        app.stop(0)
+        thread.join(10)
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+
+from grpckit import Service
+from grpckit.route import Route
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+import kit_pb2
+
+
+def test_async_route():
+    async def Echo(name):
+        return dict(name=name)
+
+    route = Route("Kit", Echo, request_pb=kit_pb2.EchoRequest, response_pb=kit_pb2.EchoResponse)
+    route.compile()
+    response = asyncio.run(route(kit_pb2.EchoRequest(name="a"), None))
+    assert response == kit_pb2.EchoResponse(name="a")
+
+
+def test_aio_server(app, serve):
+    svc = Service(name="Greeter")
+    release = threading.Event()
+    loops = []
+
+    @svc.route
+    async def Echo(name, age):
+        loops.append(asyncio.get_running_loop())
+        await asyncio.sleep(0)
+        return dict(name=name, age=age)
+
+    @svc.route
+    def Slow(name):
+        # plain routes run in the threadpool, the event loop is not blocked
+        release.wait(5)
+        return dict(name=name)
+
+    @svc.route
+    async def Count(n):
+        for i in range(n):
+            yield dict(i=i)
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app, aio=True))
+
+    slow = stub.Slow.future(Greeter_pb2.Slow_request(name="slow"))
+    start = time.monotonic()
+    response = stub.Echo(Greeter_pb2.Echo_request(name="a", age=1), timeout=5)
+    assert time.monotonic() - start < 1
+    assert response == Greeter_pb2.Echo_response(name="a", age=1)
+    assert loops == [app._loop]
+    assert not slow.done()
+    release.set()
+    assert slow.result(5).name == "slow"
+
+    assert [r.i for r in stub.Count(Greeter_pb2.Count_request(n=3))] == [0, 1, 2]
@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
+
+import pytest
+
+from grpckit.batch import BatchPolicy, Batcher
+from grpckit.route import Route
+
+import kit_pb2
+
+
+def test_flush_on_max_size():
+    batches = []
+
+    def func(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    # the wait is long enough that only a full batch is flushed in time
+    batcher = Batcher(func, BatchPolicy(max_size=4, max_wait_ms=10000))
+    with ThreadPoolExecutor(8) as pool:
+        start = time.monotonic()
+        results = list(pool.map(batcher.submit, range(8)))
+        elapsed = time.monotonic() - start
+
+    assert results == [i * 2 for i in range(8)]
+    assert sorted(len(batch) for batch in batches) == [4, 4]
+    assert elapsed < 5
+    assert batcher.stats == dict(batches=2, items=8, mean_size=4.0)
+
+
+def test_flush_on_max_wait():
+    batches = []
+
+    def func(items):
+        batches.append(list(items))
+        return items
+
+    batcher = Batcher(func, BatchPolicy(max_size=100, max_wait_ms=20))
+    start = time.monotonic()
+    assert batcher.submit("a") == "a"
+    assert time.monotonic() - start >= 0.02
+    assert batches == [["a"]]
+
+
+def test_errors():
+    def func(items):
+        return [ValueError(item) if item % 2 else item for item in items]
+
+    batcher = Batcher(func, BatchPolicy(max_size=2, max_wait_ms=1000))
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(batcher.submit, i) for i in range(2)]
+    # an exception instance in results fails its own call only
+    assert futures[0].result() == 0
+    with pytest.raises(ValueError):
+        futures[1].result()
+
+    batcher = Batcher(lambda items: 1 / 0, BatchPolicy(max_size=1))
+    with pytest.raises(ZeroDivisionError):
+        batcher.submit(0)
+
+    batcher = Batcher(lambda items: [], BatchPolicy(max_size=1))
+    with pytest.raises(AssertionError, match="list of 1 results"):
+        batcher.submit(0)
+
+
+def test_async_flush():
+    batches = []
+
+    async def func(items):
+        batches.append(list(items))
+        return [item + 1 for item in items]
+
+    batcher = Batcher(func, BatchPolicy(max_size=3, max_wait_ms=20))
+
+    async def main():
+        return await asyncio.gather(*[batcher.submit_async(i) for i in range(5)])
+
+    assert asyncio.run(main()) == [1, 2, 3, 4, 5]
+    assert batches == [[0, 1, 2], [3, 4]]
+
+
+def test_batch_route():
+    batches = []
+
+    def Echo(requests):
+        batches.append([r.name for r in requests])
+        return [dict(name=r.name.upper()) for r in requests]
+
+    route = Route(
+        "Kit",
+        Echo,
+        request_pb=kit_pb2.EchoRequest,
+        response_pb=kit_pb2.EchoResponse,
+        batch=BatchPolicy(max_size=3, max_wait_ms=10000),
+    )
+    route.compile()
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(route, kit_pb2.EchoRequest(name=n), None) for n in "abc"]
+    assert sorted(f.result().name for f in futures) == ["A", "B", "C"]
+    assert [sorted(batch) for batch in batches] == [["a", "b", "c"]]
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        BatchPolicy(max_size=0)
+    with pytest.raises(ValueError):
+        BatchPolicy(max_wait_ms=-1)
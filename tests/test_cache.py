@@ -0,0 +1,211 @@
+import asyncio
+
+import grpc
+import pytest
+
+from grpckit import Service
+from grpckit import cache as cache_module
+from grpckit.cache import TTL, ResponseCache, passthrough_serializer
+from grpckit.route import Route
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+import kit_pb2
+
+
+class Context:
+    """Stands for grpc.ServicerContext of a call"""
+
+    def __init__(self, metadata=(), code=None):
+        self.metadata = metadata
+        self._code = code
+
+    def invocation_metadata(self):
+        return self.metadata
+
+    def code(self):
+        return self._code
+
+    def set_code(self, code):
+        self._code = code
+
+
+def echo_handler(calls):
+    def handler(request, context):
+        calls.append(request.name)
+        return kit_pb2.EchoResponse(name=request.name)
+
+    return handler
+
+
+def test_hit_and_miss():
+    calls = []
+    handler = ResponseCache(TTL(60)).wrap(echo_handler(calls))
+    request = kit_pb2.EchoRequest(name="a")
+
+    # a miss returns the message of handler, a hit its serialized bytes
+    response = handler(request, Context())
+    assert response == kit_pb2.EchoResponse(name="a")
+    assert handler(request, Context()) == response.SerializeToString()
+    assert calls == ["a"]
+
+    handler(kit_pb2.EchoRequest(name="b"), Context())
+    assert calls == ["a", "b"]
+
+
+def test_stats_and_invalidate():
+    cache = ResponseCache(TTL(60))
+    handler = cache.wrap(echo_handler([]))
+    request = kit_pb2.EchoRequest(name="a")
+    handler(request, None)
+    handler(request, None)
+    assert cache.stats == dict(hits=1, misses=1, evictions=0, entries=1)
+    assert cache.invalidate(request)
+    assert not cache.invalidate(request)
+    assert len(cache) == 0
+
+
+def test_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    calls = []
+    handler = ResponseCache(TTL(10)).wrap(echo_handler(calls))
+    request = kit_pb2.EchoRequest(name="a")
+    handler(request, None)
+    now[0] += 9.9
+    handler(request, None)
+    assert calls == ["a"]
+    now[0] += 0.1
+    handler(request, None)
+    assert calls == ["a", "a"]
+
+
+def test_lru_eviction():
+    cache = ResponseCache(TTL(60), max_entries=2)
+    calls = []
+    handler = cache.wrap(echo_handler(calls))
+    for name in ("a", "b", "a", "c", "a", "b"):
+        handler(kit_pb2.EchoRequest(name=name), None)
+    # "b" is the least recently used one when "c" comes
+    assert calls == ["a", "b", "c", "b"]
+    assert cache.evictions == 2
+
+
+def test_metadata_keys():
+    calls = []
+    handler = ResponseCache(TTL(60), metadata=["X-Tenant"]).wrap(echo_handler(calls))
+    request = kit_pb2.EchoRequest(name="a")
+    handler(request, Context((("x-tenant", "1"), ("x-other", "1"))))
+    handler(request, Context((("x-tenant", "1"), ("x-other", "2"))))
+    handler(request, Context((("x-tenant", "2"),)))
+    assert calls == ["a", "a"]
+
+
+@pytest.mark.parametrize("code", [grpc.StatusCode.NOT_FOUND, 5])
+def test_only_ok_calls_are_cached(code):
+    calls = []
+
+    def handler(request, context):
+        calls.append(request.name)
+        if request.name == "missing":
+            context.set_code(code)
+        return kit_pb2.EchoResponse()
+
+    handler = ResponseCache(TTL(60)).wrap(handler)
+    for _ in range(2):
+        handler(kit_pb2.EchoRequest(name="missing"), Context())
+        handler(kit_pb2.EchoRequest(name="found"), Context(code=grpc.StatusCode.OK))
+    assert calls == ["missing", "found", "missing"]
+
+
+def test_async_handler():
+    calls = []
+
+    async def handler(request, context):
+        calls.append(request.name)
+        return kit_pb2.EchoResponse(name=request.name)
+
+    handler = ResponseCache(TTL(60)).wrap(handler)
+
+    async def main():
+        request = kit_pb2.EchoRequest(name="a")
+        return [await handler(request, Context()) for _ in range(2)]
+
+    miss, hit = asyncio.run(main())
+    assert miss == kit_pb2.EchoResponse(name="a")
+    assert hit == miss.SerializeToString()
+    assert calls == ["a"]
+
+
+def test_cached_route():
+    calls = []
+
+    def Echo(name):
+        calls.append(name)
+        return dict(name=name)
+
+    route = Route(
+        "Kit",
+        Echo,
+        request_pb=kit_pb2.EchoRequest,
+        response_pb=kit_pb2.EchoResponse,
+        cache=TTL(60),
+    )
+    route.compile()
+    assert route.serialized_response
+    serialize = passthrough_serializer(route.response_serializer)
+    responses = [serialize(route(kit_pb2.EchoRequest(name="a"), None)) for _ in range(3)]
+    assert responses == [kit_pb2.EchoResponse(name="a").SerializeToString()] * 3
+    assert calls == ["a"]
+
+
+def test_request_hooks_on_hit(app, serve):
+    svc = Service(name="Greeter")
+    calls, before, after = [], [], []
+
+    @svc.route(cache=TTL(60))
+    def Echo(name, age):
+        calls.append(name)
+        return dict(name=name, age=age)
+
+    @svc.before_request
+    def count(request, context):
+        before.append(request.name)
+
+    @svc.after_request
+    def record(response):
+        after.append(type(response))
+        return response
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+    for request in [Greeter_pb2.Echo_request(name="a", age=1)] * 2 + [
+        Greeter_pb2.Echo_request()
+    ] * 2:
+        assert stub.Echo(request) == Greeter_pb2.Echo_response(name=request.name, age=request.age)
+
+    # before request funcs run on hits, only the route function is skipped
+    assert calls == ["a", ""]
+    assert before == ["a", "a", "", ""]
+    # after request funcs get the message on a miss and its bytes on a hit, even empty bytes
+    assert after == [Greeter_pb2.Echo_response, bytes] * 2
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        TTL(0)
+    with pytest.raises(ValueError):
+        ResponseCache(TTL(1), max_entries=0)
+
+    def Stream(name):
+        yield dict(name=name)
+
+    route = Route(
+        "Kit",
+        Stream,
+        request_pb=kit_pb2.EchoRequest,
+        response_pb=kit_pb2.EchoResponse,
+        cache=TTL(60),
+    )
+    with pytest.raises(ValueError, match="only unary route can be cached"):
+        route.compile()
@@ -0,0 +1,186 @@
+"""The descriptor engine must produce and accept what the JSON engine does"""
+import math
+
+import pytest
+from google.protobuf.json_format import ParseError
+
+from grpckit.utils import converter
+from grpckit.utils.parser import (
+    PARSER_ENGINE_JSON,
+    DictToMessage,
+    JsonDictToMessage,
+    JsonMessageToDict,
+    MessageToDict,
+)
+
+import kit_pb2
+import legacy_pb2
+
+
+def _everything():
+    msg = kit_pb2.Everything(
+        inner=kit_pb2.Inner(name="in", big=2**40, nums=[1, -2]),
+        inners=[kit_pb2.Inner(name="a"), kit_pb2.Inner(big=-1)],
+        tags=["x", "y"],
+        blobs=[b"\x00\xff", b"hi"],
+        counts={"a": 1, "b": 2**62},
+        by_id={1: kit_pb2.Inner(name="one"), -7: kit_pb2.Inner()},
+        flags={True: "yes", False: "no"},
+        nested=kit_pb2.Inner(name="n"),
+        colors=[kit_pb2.GREEN, kit_pb2.BLUE],
+        camel_case_name="camel",
+        ratios=[0.5, math.inf, -math.inf],
+    )
+    s = msg.scalars
+    s.i32, s.i64, s.u64, s.si32, s.f64 = -3, -(2**60), 2**64 - 1, -9, 2**63
+    s.f, s.d, s.b, s.s, s.raw, s.color = 0.1, 1e300, True, "héllo", b"\x01\x02", kit_pb2.BLUE
+    s.nick = ""
+    msg.at.FromSeconds(1600000000)
+    msg.took.FromMilliseconds(1500)
+    msg.extra.update({"k": [1, "v", None, {"z": True}]})
+    msg.value.string_value = "s"
+    msg.maybe.value = 5
+    return msg
+
+
+MESSAGES = [
+    kit_pb2.Everything(),
+    kit_pb2.Scalars(),
+    kit_pb2.Everything(text="t"),
+    kit_pb2.Everything(value={"null_value": 0}),
+    _everything(),
+    legacy_pb2.Legacy(id=1),
+    legacy_pb2.Legacy(
+        name="n",
+        id=2,
+        level=legacy_pb2.HIGH,
+        values=[1, 2**50],
+        data=b"\x00",
+        child=legacy_pb2.Legacy(id=3),
+        labels={"a": "b"},
+    ),
+]
+
+
+@pytest.mark.parametrize("including_default_value_fields", [True, False])
+@pytest.mark.parametrize("message", MESSAGES)
+def test_message_to_dict_parity(message, including_default_value_fields):
+    expected = JsonMessageToDict(message, including_default_value_fields)
+    assert converter.message_to_dict(message, including_default_value_fields) == expected
+
+
+@pytest.mark.parametrize("including_default_value_fields", [True, False])
+@pytest.mark.parametrize("message", MESSAGES)
+def test_dict_round_trip_parity(message, including_default_value_fields):
+    data = JsonMessageToDict(message, including_default_value_fields)
+    expected = JsonDictToMessage(data, type(message)())
+    assert converter.dict_to_message(data, type(message)()) == expected
+    if not including_default_value_fields:
+        # printed defaults of proto2 fields are set by parsing
+        assert expected == message
+
+
+def test_message_to_dict_nan():
+    msg = kit_pb2.Scalars(d=math.nan)
+    assert converter.message_to_dict(msg)["d"] == "NaN"
+    assert JsonMessageToDict(msg)["d"] == "NaN"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"camelCaseName": "json name", "counts": {"a": "7"}},
+        {"scalars": {"i64": "12", "u64": 12, "color": "GREEN", "f": "Infinity", "d": "-1e3"}},
+        {"scalars": {"raw": "AQI=", "b": False, "nick": "x"}},
+        {"scalars": {"i32": 1.0, "color": 2}},
+        {"by_id": {"3": {"name": "three"}}, "flags": {"true": "t"}},
+        {"blobs": ["AAE", "-_8="], "colors": ["RED", 2]},
+        {"at": "2020-01-01T00:00:00.500Z", "took": "1.5s", "maybe": "5"},
+        {"extra": {"a": [1, None, "b"]}, "value": None},
+        {"nested": {"name": "n"}},
+        {"inner": {}, "inners": [{}, {"nums": [1, "2"]}]},
+        {"unknown": 1, "tags": []},
+    ],
+)
+def test_dict_to_message_parity(data):
+    expected = JsonDictToMessage(data, kit_pb2.Everything())
+    assert converter.dict_to_message(data, kit_pb2.Everything()) == expected
+
+
+def test_dict_to_message_proto2():
+    data = {"id": 1, "level": "LOW", "values": ["3"], "child": {"id": 2, "name": "c"}}
+    expected = JsonDictToMessage(data, legacy_pb2.Legacy())
+    msg = converter.dict_to_message(data, legacy_pb2.Legacy())
+    assert msg == expected
+    # proto2 presence and defaults
+    assert not msg.HasField("name") and msg.name == "anon"
+    assert msg.child.HasField("name")
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"scalars": {"i32": 1.5}},
+        {"scalars": {"i32": "1 2"}},
+        {"scalars": {"i32": True}},
+        {"scalars": {"b": "true"}},
+        {"scalars": {"s": 1}},
+        {"scalars": {"f": 1e39}},
+        {"scalars": {"d": "nan"}},
+        {"scalars": {"color": "PURPLE"}},
+        {"tags": "x"},
+        {"tags": ["x", None]},
+        {"inners": [None]},
+        {"counts": [1]},
+        {"flags": {"yes": "y"}},
+        {"text": "t", "nested": {}},
+        {"inner": 1},
+        {"at": "yesterday"},
+    ],
+)
+def test_dict_to_message_errors(data):
+    with pytest.raises(ParseError):
+        JsonDictToMessage(data, kit_pb2.Everything())
+    with pytest.raises(ParseError):
+        converter.dict_to_message(data, kit_pb2.Everything())
+
+
+def test_unknown_fields():
+    with pytest.raises(ParseError):
+        converter.dict_to_message({"nope": 1}, kit_pb2.Inner(), ignore_unknown_fields=False)
+    assert converter.dict_to_message({"nope": 1}, kit_pb2.Inner()) == kit_pb2.Inner()
+
+
+def test_raw_bytes_are_accepted():
+    # the descriptor engine takes bytes as they are, which JSON text can't carry
+    msg = converter.dict_to_message({"raw": b"\x00\xff"}, kit_pb2.Scalars())
+    assert msg.raw == b"\x00\xff"
+
+
+def test_message_to_native():
+    msg = kit_pb2.Inner(name="n", big=2**40, nums=[1])
+    assert converter.message_to_native(msg) == {"name": "n", "big": 2**40, "nums": [1]}
+
+
+def test_parser_engines():
+    msg = _everything()
+    assert MessageToDict(msg) == MessageToDict(msg, engine=PARSER_ENGINE_JSON)
+    # json names are always served by the JSON engine
+    assert "camelCaseName" in MessageToDict(msg, preserving_proto_field_name=False)
+    data = MessageToDict(msg)
+    assert DictToMessage(data, kit_pb2.Everything()) == DictToMessage(
+        data, kit_pb2.Everything(), engine=PARSER_ENGINE_JSON
+    )
+    with pytest.raises(ValueError):
+        DictToMessage({}, {})
+
+
+def test_plans_are_cached():
+    plan = converter.get_plan(kit_pb2.Everything.DESCRIPTOR)
+    assert converter.get_plan(kit_pb2.Everything.DESCRIPTOR) is plan
+    assert plan.fields_by_key["camelCaseName"] is plan.fields_by_name["camel_case_name"]
+    # nested and recursive message types are compiled along
+    inner = converter.get_plan(kit_pb2.Inner.DESCRIPTOR)
+    assert plan.fields_by_name["inner"].plan is inner
+    legacy = converter.get_plan(legacy_pb2.Legacy.DESCRIPTOR)
+    assert legacy.fields_by_name["child"].plan is legacy
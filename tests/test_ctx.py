@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from grpckit import g, request
+from grpckit.ctx import _POOL_SIZE, AppContext, RequestContext, _free_list
+
+METHOD = "/kit.Kit/Echo"
+
+
+class Context:
+    """Stands for grpc.ServicerContext of a call"""
+
+    def __init__(self, *metadata):
+        self.metadata = metadata
+
+    def invocation_metadata(self):
+        return self.metadata
+
+
+@pytest.fixture(autouse=True)
+def empty_pool():
+    _free_list.request_ctx.clear()
+    _free_list.app_ctx.clear()
+
+
+def call(app, params, context, func):
+    ctx = RequestContext.acquire(app, params, context, METHOD)
+    ctx.push()
+    try:
+        return func()
+    finally:
+        ctx.pop(None)
+        ctx.release()
+
+
+def test_contexts_are_recycled(app):
+    ctx = RequestContext.acquire(app, None, Context(), METHOD)
+    ctx.push()
+    app_ctx = ctx._implicit_app_ctx_stack[-1]
+    ctx.pop(None)
+    ctx.release()
+    assert _free_list.request_ctx == [ctx]
+    assert _free_list.app_ctx == [app_ctx]
+
+    again = RequestContext.acquire(app, None, Context(), METHOD)
+    assert again is ctx
+    assert again.app is app
+    again.push()
+    assert again._implicit_app_ctx_stack[-1] is app_ctx
+    again.pop(None)
+    again.release()
+
+
+def test_released_context_is_reset(app):
+    def first():
+        request.user = "bob"
+        g["user"] = "bob"
+        return request.headers["x-id"], request.method
+
+    assert call(app, None, Context(("x-id", "1")), first) == ("1", METHOD)
+    ctx = _free_list.request_ctx[-1]
+    assert ctx.app is None
+    assert ctx.request.context is None
+    assert not hasattr(ctx.request, "user")
+    assert _free_list.app_ctx[-1].g == {}
+
+    # the lazy properties are computed for the new call
+    def second():
+        return request.headers.get("x-id"), hasattr(request, "user"), dict(g)
+
+    assert call(app, None, Context(("x-id", "2")), second) == ("2", False, {})
+
+
+def test_pool_size_is_bounded(app):
+    contexts = [RequestContext.acquire(app, None, None, METHOD) for _ in range(_POOL_SIZE + 1)]
+    for ctx in contexts:
+        ctx.release()
+    assert len(_free_list.request_ctx) == _POOL_SIZE
+
+
+def test_pool_is_per_thread(app):
+    RequestContext.acquire(app, None, None, METHOD).release()
+    pooled = []
+    thread = threading.Thread(target=lambda: pooled.append(len(_free_list.request_ctx)))
+    thread.start()
+    thread.join()
+    assert pooled == [0]
+    assert len(_free_list.request_ctx) == 1
+
+
+def test_teardown_receives_exception(app):
+    seen = []
+    app.teardown_request(lambda exc: seen.append(("request", exc)))
+    app.teardown_app_context(lambda exc: seen.append(("app", exc)))
+    error = ValueError("boom")
+    ctx = RequestContext.acquire(app, None, None, METHOD)
+    ctx.push()
+    ctx.pop(error)
+    ctx.release()
+    assert seen == [("request", error), ("app", error)]
+
+
+def test_explicit_app_context_is_reused(app):
+    with AppContext(app) as app_ctx:
+        ctx = RequestContext.acquire(app, None, None, METHOD)
+        ctx.push()
+        assert ctx._implicit_app_ctx_stack == [None]
+        ctx.pop(None)
+        ctx.release()
+        assert _free_list.app_ctx == []
+        assert app_ctx._ref_cnt == 1
@@ -0,0 +1,177 @@
+import threading
+import time
+
+import grpc
+import pytest
+
+from grpckit import Service
+from grpckit.constant import K_GRPCKIT_MAX_WORKERS
+from grpckit.executor import InstrumentedExecutor, PriorityExecutor
+from grpckit.metadata import Metadata
+from grpckit.route import to_executor_handler
+
+from conftest import wait_for
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+import Pinger_pb2
+import Pinger_pb2_grpc
+
+
+@pytest.fixture
+def executor():
+    executor = PriorityExecutor(max_workers=1, starvation_ms=10000)
+    yield executor
+    executor.shutdown(cancel_futures=True)
+
+
+def block(executor):
+    """Occupy the only worker, until the returned event is set"""
+    started, release = threading.Event(), threading.Event()
+
+    def run():
+        started.set()
+        release.wait(5)
+
+    executor.submit(run)
+    started.wait(5)
+    return release
+
+
+def test_lanes_are_ordered(executor):
+    order = []
+    release = block(executor)
+    futures = [
+        executor.submit_lane(lane, order.append, f"{lane}{i}")
+        for i in range(2)
+        for lane in ("low", "normal", "high")
+    ]
+    release.set()
+    for future in futures:
+        future.result(5)
+    assert order == ["high0", "high1", "normal0", "normal1", "low0", "low1"]
+    stats = executor.stats
+    assert [stats[lane]["count"] for lane in executor.lanes] == [2, 3, 2]
+    assert all(stats[lane]["queued"] == 0 for lane in executor.lanes)
+
+
+def test_starved_lane_runs_first():
+    executor = PriorityExecutor(max_workers=1, starvation_ms=20)
+    order = []
+    release = block(executor)
+    low = executor.submit_lane("low", order.append, "low")
+    time.sleep(0.05)
+    high = executor.submit_lane("high", order.append, "high")
+    release.set()
+    low.result(5)
+    high.result(5)
+    executor.shutdown()
+    assert order == ["low", "high"]
+
+
+def test_lane_for(executor):
+    executor.set_route_lane("/kit.Kit/Slow", "low")
+    assert executor.default_lane == "normal"
+    assert executor.lane_for() == "normal"
+    assert executor.lane_for("/kit.Kit/Slow") == "low"
+    assert executor.lane_for(b"/kit.Kit/Slow") == "low"
+    # metadata overrides the lane of route, unknown lanes are ignored
+    assert executor.lane_for("/kit.Kit/Slow", (("x-priority", "high"),)) == "high"
+    assert executor.lane_for("/kit.Kit/Slow", (("x-priority", b"high"),)) == "high"
+    assert executor.lane_for("/kit.Kit/Slow", Metadata((("x-priority", "high"),))) == "high"
+    assert executor.lane_for("/kit.Kit/Slow", (("x-priority", "urgent"),)) == "low"
+    with pytest.raises(ValueError):
+        executor.set_route_lane("/kit.Kit/Slow", "urgent")
+
+
+class RpcEvent:
+    """Stands for the rpc event passed by gRPC server to its thread pool"""
+
+    class call_details:
+        method = b"/kit.Kit/Echo"
+
+    def __init__(self, lane):
+        self.invocation_metadata = (("x-priority", lane),)
+
+
+def test_submit_reads_lane_of_rpc_event(executor):
+    order = []
+    release = block(executor)
+    futures = [
+        executor.submit(lambda event, lane: order.append(lane), RpcEvent(lane), lane)
+        for lane in ("low", "high", "normal")
+    ]
+    release.set()
+    for future in futures:
+        future.result(5)
+    assert order == ["high", "normal", "low"]
+
+
+def test_shutdown_cancels_queued_work():
+    executor = PriorityExecutor(max_workers=1)
+    release = block(executor)
+    future = executor.submit(time.sleep, 0)
+    executor.shutdown(wait=False, cancel_futures=True)
+    assert future.cancelled()
+    release.set()
+    with pytest.raises(RuntimeError):
+        executor.submit(time.sleep, 0)
+
+
+def test_instrumented_executor(executor):
+    instrumented = InstrumentedExecutor(executor, max_workers=1)
+    release = block(instrumented)
+    queued = instrumented.submit(time.sleep, 0)
+    assert instrumented.stats == dict(
+        max_workers=1, active=1, queued=1, completed=0, utilisation=1.0
+    )
+    release.set()
+    queued.result(5)
+    assert instrumented.stats["completed"] == 2
+
+
+def test_executor_handler_streams_none(executor):
+    def handler(request, context):
+        yield from (1, None, 2)
+
+    stream = to_executor_handler(handler, executor, response_streaming=True)
+    assert list(stream(None, None)) == [1, None, 2]
+
+
+def test_served_service_executor(app, serve):
+    app.config[K_GRPCKIT_MAX_WORKERS] = 3
+    greeter, pinger = Service(name="Greeter"), Service(name="Pinger")
+    release = threading.Event()
+    threads = []
+
+    @greeter.route
+    def Slow(name, seconds):
+        threads.append(threading.current_thread().name)
+        release.wait(5)
+        return dict(name=name)
+
+    @pinger.route
+    def Ping(name):
+        return dict(name=name)
+
+    app.register_service(greeter, max_workers=1, max_queue=1)
+    app.register_service(pinger)
+    channel = serve(app)
+    stub, ping = Greeter_pb2_grpc.GreeterStub(channel), Pinger_pb2_grpc.PingerStub(channel)
+    limit = greeter.executor_limit
+    assert limit.max_concurrency == 2
+
+    # one call runs on the pool of service, the other waits for it
+    calls = [stub.Slow.future(Greeter_pb2.Slow_request(name=str(i))) for i in range(2)]
+    wait_for(lambda: limit.in_flight == 2 and threads)
+    assert threads[0].startswith("grpckit-Greeter")
+    with pytest.raises(grpc.RpcError) as excinfo:
+        stub.Slow(Greeter_pb2.Slow_request(name="rejected"), timeout=5)
+    assert excinfo.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+    assert limit.rejected == 1
+
+    # the server threads which are left still serve the other services
+    assert ping.Ping(Pinger_pb2.Ping_request(name="p"), timeout=5).name == "p"
+    release.set()
+    assert [c.result(5).name for c in calls] == ["0", "1"]
+    assert limit.in_flight == 0
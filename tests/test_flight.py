@@ -0,0 +1,224 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+
+import pytest
+
+from grpckit import Service
+from grpckit.exception import DeadlineExceeded
+from grpckit.flight import SingleFlight
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+import kit_pb2
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_are_collapsed():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def handler(request, context):
+        calls.append(request.name)
+        release.wait(5)
+        return kit_pb2.EchoResponse(name=request.name)
+
+    handler = flight.wrap(handler)
+    request = kit_pb2.EchoRequest(name="a")
+    with ThreadPoolExecutor(5) as pool:
+        futures = [pool.submit(handler, request, None) for _ in range(4)]
+        wait_for(lambda: flight.coalesced == 3)
+        other = pool.submit(handler, kit_pb2.EchoRequest(name="b"), None)
+        wait_for(lambda: len(calls) == 2)
+        release.set()
+        results = [f.result() for f in futures]
+        other.result()
+
+    expected = kit_pb2.EchoResponse(name="a")
+    # the leader gets the message of handler, the followers its serialized bytes
+    assert [r for r in results if not isinstance(r, bytes)] == [expected]
+    assert [r for r in results if isinstance(r, bytes)] == [expected.SerializeToString()] * 3
+    assert sorted(calls) == ["a", "b"]
+    assert flight.stats == dict(calls=5, leaders=2, coalesced=3, in_flight=0, ratio=0.6)
+
+    # nothing is kept once the leader is finished
+    handler(request, None)
+    assert calls.count("a") == 2
+
+
+def test_error_is_shared():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def handler(request, context):
+        release.wait(5)
+        raise KeyError(request.name)
+
+    handler = flight.wrap(handler)
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(handler, kit_pb2.EchoRequest(name="a"), None) for _ in range(3)]
+        wait_for(lambda: flight.coalesced == 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(KeyError):
+                future.result()
+    assert flight.stats["in_flight"] == 0
+
+
+def test_async_calls_are_collapsed():
+    flight = SingleFlight()
+    calls = []
+
+    async def handler(request, context):
+        calls.append(request.name)
+        await asyncio.sleep(0.05)
+        return kit_pb2.EchoResponse(name=request.name)
+
+    handler = flight.wrap(handler)
+
+    async def main():
+        request = kit_pb2.EchoRequest(name="a")
+        return await asyncio.gather(*[handler(request, None) for _ in range(5)])
+
+    results = asyncio.run(main())
+    assert calls == ["a"]
+    assert results[0] == kit_pb2.EchoResponse(name="a")
+    assert results[1:] == [results[0].SerializeToString()] * 4
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    flight = SingleFlight()
+
+    async def handler(request, context):
+        await asyncio.sleep(0.05)
+        return kit_pb2.EchoResponse(name=request.name)
+
+    handler = flight.wrap(handler)
+
+    async def main():
+        request = kit_pb2.EchoRequest(name="a")
+        leader = asyncio.ensure_future(handler(request, None))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(handler(request, None))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == kit_pb2.EchoResponse(name="a")
+
+
+class Context:
+    """Stands for grpc.ServicerContext of a call with deadline"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def time_remaining(self):
+        return self.timeout
+
+
+def test_follower_waits_until_its_deadline():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def handler(request, context):
+        release.wait(5)
+        return kit_pb2.EchoResponse(name=request.name)
+
+    handler = flight.wrap(handler)
+    request = kit_pb2.EchoRequest(name="a")
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(handler, request, None)
+        wait_for(lambda: flight.stats["in_flight"] == 1)
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            handler(request, Context(0.05))
+        assert time.monotonic() - start < 1
+        # no deadline at all, as what grpc reports for calls without deadline
+        follower = pool.submit(handler, request, Context(1e10))
+        wait_for(lambda: flight.coalesced == 2)
+        release.set()
+        assert leader.result() == kit_pb2.EchoResponse(name="a")
+    assert follower.result() == leader.result().SerializeToString()
+
+
+def test_async_follower_waits_until_its_deadline():
+    flight = SingleFlight()
+
+    async def handler(request, context):
+        await asyncio.sleep(1)
+        return kit_pb2.EchoResponse(name=request.name)
+
+    handler = flight.wrap(handler)
+
+    async def main():
+        request = kit_pb2.EchoRequest(name="a")
+        leader = asyncio.ensure_future(handler(request, None))
+        await asyncio.sleep(0)
+        try:
+            await handler(request, Context(0.05))
+        finally:
+            leader.cancel()
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+
+
+def test_follower_takes_over_cancelled_leader():
+    flight = SingleFlight()
+    calls = []
+
+    async def handler(request, context):
+        calls.append(request.name)
+        await asyncio.sleep(0.05)
+        return kit_pb2.EchoResponse(name=request.name)
+
+    handler = flight.wrap(handler)
+
+    async def main():
+        request = kit_pb2.EchoRequest(name="a")
+        leader = asyncio.ensure_future(handler(request, None))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(handler(request, None)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*followers)
+
+    results = asyncio.run(main())
+    # one of the followers runs the handler again, the other one follows it
+    assert calls == ["a", "a"]
+    expected = kit_pb2.EchoResponse(name="a")
+    assert sorted(results, key=lambda r: isinstance(r, bytes)) == [
+        expected,
+        expected.SerializeToString(),
+    ]
+    assert flight.stats == dict(calls=3, leaders=2, coalesced=1, in_flight=0, ratio=1 / 3)
+
+
+@pytest.mark.parametrize("aio", [False, True])
+def test_served_single_flight(app, serve, aio):
+    svc = Service(name="Greeter")
+    calls = []
+
+    @svc.route(single_flight=True)
+    def Slow(name, seconds):
+        calls.append(name)
+        time.sleep(seconds)
+        return dict(name=name)
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app, aio=aio))
+    request = Greeter_pb2.Slow_request(name="a", seconds=0.2)
+    # calls without deadline and with a long one
+    futures = [stub.Slow.future(request), stub.Slow.future(request, timeout=30)]
+    assert [f.result(5).name for f in futures] == ["a", "a"]
+    assert calls == ["a"]
@@ -0,0 +1,112 @@
+import grpc
+import pytest
+
+from grpckit import Service
+from grpckit.constant import K_GRPCKIT_HEALTH_MAX_WATCHERS
+from grpckit.health import NOT_SERVING, SERVING, SERVICE_UNKNOWN, HealthServicer, health_pb2
+
+from conftest import wait_for
+
+
+class HealthStub:
+    def __init__(self, channel):
+        Response = health_pb2.HealthCheckResponse
+        options = dict(
+            request_serializer=health_pb2.HealthCheckRequest.SerializeToString,
+            response_deserializer=Response.FromString,
+        )
+        self.Check = channel.unary_unary("/grpc.health.v1.Health/Check", **options)
+        self.Watch = channel.unary_stream("/grpc.health.v1.Health/Watch", **options)
+
+
+def check(stub, service=""):
+    return stub.Check(health_pb2.HealthCheckRequest(service=service), timeout=5).status
+
+
+def greeter():
+    svc = Service(name="Greeter")
+
+    @svc.route
+    def Echo(name, age):
+        return dict(name=name, age=age)
+
+    return svc
+
+
+def test_checks_update_status():
+    health = HealthServicer()
+    health.add_check(lambda: False, "a")
+    health.add_check(lambda: 1 / 0, "b")
+    health.add_check(lambda: SERVING, "c")
+    for c in health._checks:
+        health._run_check(c)
+    assert [health.get_status(s) for s in "abc"] == [NOT_SERVING, NOT_SERVING, SERVING]
+
+
+@pytest.mark.parametrize("aio", [False, True])
+def test_check(app, serve, aio):
+    app.register_service(greeter())
+    stub = HealthStub(serve(app, aio=aio))
+
+    # the server and the services by short and full names
+    for service in ("", "Greeter", "grpckit.greeter.Greeter"):
+        assert check(stub, service) == SERVING
+    app.health.set_status("Greeter", NOT_SERVING)
+    assert check(stub, "Greeter") == NOT_SERVING
+    with pytest.raises(grpc.RpcError) as excinfo:
+        check(stub, "Nope")
+    assert excinfo.value.code() == grpc.StatusCode.NOT_FOUND
+
+
+@pytest.mark.parametrize("aio", [False, True])
+def test_watch_while_draining(app, serve, aio):
+    app.register_service(greeter())
+    stub = HealthStub(serve(app, aio=aio))
+
+    stream = stub.Watch(health_pb2.HealthCheckRequest(service="Greeter"))
+    assert next(stream).status == SERVING
+    app.health.enter_graceful_shutdown()
+    assert next(stream).status == NOT_SERVING
+    # updates are ignored while draining
+    app.health.set_status("Greeter", SERVING)
+    assert check(stub) == check(stub, "Greeter") == NOT_SERVING
+    app.health.resume()
+    app.health.set_status("Greeter", SERVING)
+    assert next(stream).status == SERVING
+    stream.cancel()
+
+    unknown = stub.Watch(health_pb2.HealthCheckRequest(service="Nope"))
+    assert next(unknown).status == SERVICE_UNKNOWN
+    unknown.cancel()
+
+
+def test_stop_reports_not_serving(app, serve):
+    app.register_service(greeter())
+    stub = HealthStub(serve(app))
+    stream = stub.Watch(health_pb2.HealthCheckRequest())
+    assert next(stream).status == SERVING
+    app.stop(5)
+    assert not app.serving
+    assert next(stream).status == NOT_SERVING
+    stream.cancel()
+
+
+def test_watchers_are_capped(app, serve):
+    app.config[K_GRPCKIT_HEALTH_MAX_WATCHERS] = 1
+    app.register_service(greeter())
+    stub = HealthStub(serve(app))
+
+    first = stub.Watch(health_pb2.HealthCheckRequest())
+    assert next(first).status == SERVING
+    with pytest.raises(grpc.RpcError) as excinfo:
+        next(stub.Watch(health_pb2.HealthCheckRequest()))
+    assert excinfo.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+    # Check is never capped
+    assert check(stub) == SERVING
+
+    # the thread of the cancelled stream is released
+    first.cancel()
+    wait_for(lambda: app.health._sync_watchers == 0)
+    second = stub.Watch(health_pb2.HealthCheckRequest())
+    assert next(second).status == SERVING
+    second.cancel()
@@ -0,0 +1,88 @@
+import grpc
+import pytest
+
+from grpckit import Service, current_app, g, request
+from grpckit.constant import K_GRPCKIT_LIGHTWEIGHT_ROUTES
+from grpckit.ctx import RequestContext
+from grpckit.exception import NotFound
+from grpckit.route import uses_context
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+
+ECHO, SLOW = "/grpckit.greeter.Greeter/Echo", "/grpckit.greeter.Greeter/Slow"
+
+
+def test_uses_context():
+    def plain(name):
+        return dict(name=name)
+
+    def nested(name):
+        def inner():
+            return request.method
+
+        return inner()
+
+    def with_g(name):
+        return g.user
+
+    def with_app(name):
+        return current_app.name
+
+    assert not uses_context(plain)
+    assert uses_context(nested)
+    assert uses_context(with_g) and uses_context(with_app)
+
+
+def test_lightweight_is_inferred(app):
+    svc = Service(name="Greeter")
+
+    @svc.route
+    def Echo(name, age):
+        return dict(name=name)
+
+    @svc.route
+    def Slow(name, seconds):
+        return dict(name=request.method)
+
+    app.register_service(svc)
+    assert not app._is_lightweight(ECHO)
+
+    app.config[K_GRPCKIT_LIGHTWEIGHT_ROUTES] = True
+    assert app._is_lightweight(ECHO)
+    assert not app._is_lightweight(SLOW)
+    # the explicit flag of route wins
+    svc.get_route("Echo").lightweight = False
+    assert not app._is_lightweight(ECHO)
+    svc.get_route("Echo").lightweight = None
+
+    # hooks and teardown funcs need the request context
+    svc.before_request(lambda request, context: None)
+    assert not app._is_lightweight(ECHO)
+    svc.before_request_funcs.clear()
+    app.teardown_request(lambda exc: None)
+    assert not app._is_lightweight(ECHO)
+
+
+@pytest.mark.parametrize("aio", [False, True])
+def test_served_without_request_context(app, serve, monkeypatch, aio):
+    svc = Service(name="Greeter")
+
+    @svc.route(lightweight=True)
+    def Echo(name, age):
+        if not name:
+            raise NotFound(msg="no name")
+        return dict(name=name, age=age)
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app, aio=aio))
+
+    def acquire(*args, **kwargs):
+        raise AssertionError("request context of lightweight route")
+
+    monkeypatch.setattr(RequestContext, "acquire", acquire)
+    assert stub.Echo(Greeter_pb2.Echo_request(name="a", age=1), timeout=5).age == 1
+    # exception mapping is kept
+    with pytest.raises(grpc.RpcError) as excinfo:
+        stub.Echo(Greeter_pb2.Echo_request(), timeout=5)
+    assert (excinfo.value.code(), excinfo.value.details()) == (grpc.StatusCode.NOT_FOUND, "no name")
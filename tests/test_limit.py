@@ -0,0 +1,321 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import gc
+import threading
+import time
+
+import grpc
+import pytest
+
+from grpckit import Service
+from grpckit.constant import (
+    K_GRPCKIT_ADAPTIVE_LIMIT,
+    K_GRPCKIT_ADAPTIVE_LIMIT_INITIAL,
+    K_GRPCKIT_ADAPTIVE_LIMIT_LATENCY_MS,
+    K_GRPCKIT_ADAPTIVE_LIMIT_MAX,
+    K_GRPCKIT_ADAPTIVE_LIMIT_MIN,
+    K_GRPCKIT_MAX_WORKERS,
+)
+from grpckit.exception import ResourceExhausted
+from grpckit.executor import AdmissionExecutor, PriorityExecutor
+from grpckit.interceptor import AdaptiveLimitInterceptor
+from grpckit.limit import AdaptiveLimiter, Admission, ConcurrencyLimit
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        time.sleep(0.001)
+
+
+def blocking_handler(release):
+    def handler(request, context):
+        release.wait(5)
+        return request
+
+    return handler
+
+
+def test_calls_beyond_limit_are_rejected():
+    limit = ConcurrencyLimit(2, name="Kit.Echo")
+    release = threading.Event()
+    handler = limit.wrap(blocking_handler(release))
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(handler, i, None) for i in range(2)]
+        wait_for(lambda: limit.in_flight == 2)
+        with pytest.raises(ResourceExhausted) as excinfo:
+            handler(2, None)
+        assert excinfo.value.details == "Too many concurrent calls of Kit.Echo"
+        release.set()
+        assert [f.result() for f in futures] == [0, 1]
+    assert limit.stats == dict(in_flight=0, queued=0, rejected=1, max_concurrency=2)
+
+
+def test_queued_calls_take_released_slots():
+    limit = ConcurrencyLimit(1, max_queue=1)
+    release = threading.Event()
+    handler = limit.wrap(blocking_handler(release))
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(handler, 0, None)
+        wait_for(lambda: limit.in_flight == 1)
+        queued = pool.submit(handler, 1, None)
+        wait_for(lambda: limit.stats["queued"] == 1)
+        # the queue is full too
+        with pytest.raises(ResourceExhausted):
+            handler(2, None)
+        release.set()
+        assert (first.result(), queued.result()) == (0, 1)
+    assert limit.stats["in_flight"] == 0
+
+
+def test_queue_timeout():
+    limit = ConcurrencyLimit(1, max_queue=1, queue_timeout=0.01)
+    limit.acquire()
+    with pytest.raises(ResourceExhausted):
+        limit.acquire()
+    assert limit.stats == dict(in_flight=1, queued=0, rejected=1, max_concurrency=1)
+    limit.release()
+
+
+def test_stream_holds_slot_till_the_end():
+    limit = ConcurrencyLimit(1)
+
+    def handler(request, context):
+        yield from range(request)
+
+    handler = limit.wrap(handler, response_streaming=True)
+    stream = handler(2, None)
+    assert next(stream) == 0
+    with pytest.raises(ResourceExhausted):
+        next(handler(1, None))
+    assert list(stream) == [1]
+    assert limit.in_flight == 0
+
+
+def test_async_limit():
+    limit = ConcurrencyLimit(1, max_queue=1)
+
+    async def handler(request, context):
+        await asyncio.sleep(0.01)
+        return request
+
+    handler = limit.wrap(handler)
+
+    async def main():
+        return await asyncio.gather(*[handler(i, None) for i in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert results[:2] == [0, 1]
+    assert isinstance(results[2], ResourceExhausted)
+    assert limit.in_flight == 0
+
+
+def test_limit_shorthand():
+    assert ConcurrencyLimit.of(None) is None
+    limit = ConcurrencyLimit.of(3, name="a")
+    assert (limit.max_concurrency, limit.name) == (3, "a")
+    shared = ConcurrencyLimit(1)
+    assert ConcurrencyLimit.of(shared, name="b") is shared and shared.name == "b"
+    with pytest.raises(ValueError):
+        ConcurrencyLimit(0)
+
+
+def test_served_limit(app, serve):
+    svc = Service(name="Greeter")
+    release = threading.Event()
+
+    @svc.route(concurrency=1)
+    def Slow(name, seconds):
+        release.wait(5)
+        return dict(name=name)
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+    first = stub.Slow.future(Greeter_pb2.Slow_request(name="a"))
+    wait_for(lambda: Slow.limit.in_flight == 1)
+    with pytest.raises(grpc.RpcError) as excinfo:
+        stub.Slow(Greeter_pb2.Slow_request(name="b"))
+    assert excinfo.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+    release.set()
+    assert first.result(5).name == "a"
+    assert svc.concurrency_stats()["Slow"]["rejected"] == 1
+
+
+def test_adaptive_limiter_sheds_beyond_limit():
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=1, max_limit=4)
+    admissions = [limiter.admit(), limiter.admit()]
+    assert limiter.admit() is None
+    assert limiter.stats == dict(limit=2, in_flight=2, shed=1)
+    for admission in admissions:
+        admission.release()
+    assert limiter.stats["in_flight"] == 0
+
+
+def test_adaptive_limiter_aimd():
+    limiter = AdaptiveLimiter(
+        initial_limit=4, min_limit=2, max_limit=5, latency_threshold_ms=10, backoff_ratio=0.5
+    )
+    # grows only when the limit is in use
+    assert limiter.try_acquire()
+    limiter.release(0.001)
+    assert limiter.limit == 4
+    for _ in range(2):
+        assert limiter.try_acquire()
+    limiter.release(0.001)
+    limiter.release(0.001)
+    assert limiter.limit == 5
+    for _ in range(3):
+        assert limiter.try_acquire()
+        limiter.release(1)
+    assert limiter.limit == 2
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(initial_limit=1, min_limit=2)
+
+
+def test_admission_releases_once():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    admission = limiter.admit()
+    admission.release(sample=True)
+    admission.release(sample=True)
+    assert limiter.in_flight == 0
+    assert isinstance(limiter.admit(), Admission)
+
+
+class HandlerCallDetails(grpc.HandlerCallDetails):
+    def __init__(self, method):
+        self.method = method
+        self.invocation_metadata = ()
+
+
+class Context:
+    def __init__(self):
+        self.aborted = None
+
+    def abort(self, code, details):
+        self.aborted = code
+        raise grpc.RpcError(details)
+
+
+def test_interceptor_admits_calls_on_arrival():
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=1)
+    interceptor = AdaptiveLimitInterceptor(limiter)
+    calls = []
+
+    def behavior(request, context):
+        calls.append(request)
+        return request
+
+    handler = grpc.unary_unary_rpc_method_handler(behavior)
+
+    def intercept(method="/kit.Kit/Echo"):
+        return interceptor.intercept_service(lambda d: handler, HandlerCallDetails(method))
+
+    # the slot is taken when the call arrives, before it runs on a pool thread
+    admitted = intercept()
+    assert limiter.in_flight == 1
+    shed = intercept()
+    context = Context()
+    with pytest.raises(grpc.RpcError):
+        shed.unary_unary(1, context)
+    assert context.aborted == grpc.StatusCode.UNAVAILABLE
+    assert calls == []
+    # health probes are never shed
+    assert intercept("/grpc.health.v1.Health/Check") is handler
+
+    assert admitted.unary_unary(0, Context()) == 0
+    assert calls == [0]
+    assert limiter.stats == dict(limit=1, in_flight=0, shed=1)
+
+
+def test_admission_executor():
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=1, max_limit=2)
+    interceptor = AdaptiveLimitInterceptor(limiter)
+    handler = grpc.unary_unary_rpc_method_handler(lambda request, context: request)
+
+    def behavior():
+        intercepted = interceptor.intercept_service(
+            lambda d: handler, HandlerCallDetails("/kit.Kit/Echo")
+        )
+        return intercepted.unary_unary
+
+    pool = PriorityExecutor(max_workers=1)
+    executor = AdmissionExecutor(pool)
+    release = threading.Event()
+    blocker = executor.submit(release.wait, 5)
+
+    # the call ends before its behavior runs, e.g. it's cancelled while queued
+    admitted = behavior()
+    future = executor.submit(lambda state, behavior: None, object(), admitted)
+    assert limiter.in_flight == 1
+    queued = behavior()
+    # the rejection does not wait for the blocked server pool
+    shed = behavior()
+    context = Context()
+    rejected = executor.submit(lambda behavior: behavior(0, context), shed)
+    with pytest.raises(grpc.RpcError):
+        rejected.result(5)
+    assert context.aborted == grpc.StatusCode.UNAVAILABLE
+    assert not blocker.done()
+
+    release.set()
+    future.result(5)
+    assert limiter.in_flight == 1
+    # cancelled by the shutdown of server pool
+    release.clear()
+    blocker = pool.submit(release.wait, 5)
+    cancelled = executor.submit(lambda behavior: behavior(0, None), queued)
+    pool.shutdown(wait=False, cancel_futures=True)
+    release.set()
+    assert cancelled.cancelled()
+    assert limiter.in_flight == 0
+    executor.shutdown()
+
+
+def test_served_adaptive_limit(app, serve):
+    app.config.update(
+        {
+            K_GRPCKIT_MAX_WORKERS: 1,
+            K_GRPCKIT_ADAPTIVE_LIMIT: True,
+            K_GRPCKIT_ADAPTIVE_LIMIT_INITIAL: 2,
+            K_GRPCKIT_ADAPTIVE_LIMIT_MIN: 2,
+            K_GRPCKIT_ADAPTIVE_LIMIT_MAX: 2,
+            K_GRPCKIT_ADAPTIVE_LIMIT_LATENCY_MS: 10000,
+        }
+    )
+    svc = Service(name="Greeter")
+    release = threading.Event()
+
+    @svc.route
+    def Slow(name, seconds):
+        release.wait(5)
+        return dict(name=name)
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+    limiter = app.adaptive_limiter
+    running = stub.Slow.future(Greeter_pb2.Slow_request(name="running"))
+    queued = stub.Slow.future(Greeter_pb2.Slow_request(name="queued"))
+    wait_for(lambda: limiter.in_flight == 2)
+
+    # the only worker is busy, yet the shed call is answered at once
+    start = time.monotonic()
+    with pytest.raises(grpc.RpcError) as excinfo:
+        stub.Slow(Greeter_pb2.Slow_request(name="shed"), timeout=5)
+    assert excinfo.value.code() == grpc.StatusCode.UNAVAILABLE
+    assert time.monotonic() - start < 1
+    assert limiter.shed == 1
+
+    # the queued call never reaches its handler, its slot is still released
+    queued.cancel()
+    release.set()
+    assert running.result(5).name == "running"
+    gc.disable()
+    try:
+        wait_for(lambda: limiter.in_flight == 0)
+    finally:
+        gc.enable()
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+
+from grpckit import Service, request
+from grpckit.local import Local, LocalStack
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+
+
+def test_local_is_isolated_across_tasks():
+    local = Local()
+    local.user = "main"
+
+    async def task(name):
+        # a task starts from a copy of the context which created it
+        seen = local.user
+        local.user = name
+        await asyncio.sleep(0.01)
+        return seen, local.user
+
+    async def main():
+        return await asyncio.gather(*[task(name) for name in ("a", "b", "c")])
+
+    assert asyncio.run(main()) == [("main", "a"), ("main", "b"), ("main", "c")]
+    assert local.user == "main"
+
+
+def test_local_is_isolated_across_threads():
+    local = Local()
+    local.user = "main"
+    seen = []
+
+    def run():
+        seen.append(hasattr(local, "user"))
+        local.user = "thread"
+        seen.append(local.user)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    assert seen == [False, "thread"]
+    assert local.user == "main"
+
+    del local.user
+    with pytest.raises(AttributeError):
+        local.user
+
+
+def test_stack_is_isolated_across_tasks():
+    stack = LocalStack()
+    stack.push("app")
+    proxy = stack()
+
+    async def task(name):
+        stack.push(name)
+        await asyncio.sleep(0.01)
+        top = proxy.upper()
+        stack.pop()
+        return top, stack.top
+
+    async def main():
+        return await asyncio.gather(task("a"), task("b"))
+
+    assert asyncio.run(main()) == [("A", "app"), ("B", "app")]
+    assert stack.pop() == "app"
+    assert stack.pop() is None
+    with pytest.raises(RuntimeError):
+        proxy.upper()
+
+
+def test_request_is_isolated_across_concurrent_calls(app, serve):
+    svc = Service(name="Greeter")
+
+    @svc.route
+    async def Echo(name, age):
+        await asyncio.sleep(0.05)
+        return dict(name=request.headers["x-id"], age=age)
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app, aio=True))
+    calls = [
+        stub.Echo.future(Greeter_pb2.Echo_request(age=i), metadata=(("x-id", str(i)),))
+        for i in range(5)
+    ]
+    assert [(c.result(5).name, c.result().age) for c in calls] == [(str(i), i) for i in range(5)]
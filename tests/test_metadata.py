@@ -0,0 +1,55 @@
+import pytest
+
+from grpckit import Service, request
+from grpckit.metadata import Metadata, metadata_of
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+
+
+def test_multi_map():
+    metadata = Metadata((("a", "1"), ("b", "x"), ("a", "2")))
+    assert metadata._index is None
+    # the first value of repeated key wins
+    assert metadata["a"] == "1"
+    assert metadata.getall("a") == ["1", "2"]
+    assert metadata.getall("b") == ["x"]
+    assert metadata.getall("c") == []
+    assert list(metadata) == ["a", "b"] and len(metadata) == 2
+    assert dict(metadata) == {"a": "1", "b": "x"}
+    assert "c" not in metadata and metadata.get("c", "-") == "-"
+    with pytest.raises(KeyError):
+        metadata["c"]
+    assert metadata.raw == (("a", "1"), ("b", "x"), ("a", "2"))
+
+    # read-only view
+    with pytest.raises(TypeError):
+        metadata["a"] = "3"
+    assert len(Metadata()) == 0
+
+
+def test_binary_values_are_not_copied():
+    value, other = b"\x00\xff", b"\x01"
+    metadata = Metadata((("k-bin", value), ("k-bin", other)))
+    view = metadata["k-bin"]
+    assert isinstance(view, memoryview) and view.obj is value
+    assert metadata.get("k-bin") is view
+    assert [v.obj for v in metadata.getall("k-bin")] == [value, other]
+
+
+def test_shared_by_request_headers(app, serve):
+    svc = Service(name="Greeter")
+    seen = []
+
+    @svc.route_reduced
+    def Echo(message, context):
+        headers = request.headers
+        seen.append(metadata_of(context) is headers)
+        return dict(name=",".join(headers.getall("x-name")), age=headers["x-age-bin"][0])
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+    metadata = (("x-name", "a"), ("x-age-bin", b"\x07"), ("x-name", "b"))
+    response = stub.Echo(Greeter_pb2.Echo_request(), metadata=metadata, timeout=5)
+    assert (response.name, response.age) == ("a,b", 7)
+    assert seen == [True]
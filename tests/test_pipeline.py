@@ -0,0 +1,168 @@
+import grpc
+import pytest
+
+from grpckit import Service, request
+from grpckit.exception import NotFound
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+import Pinger_pb2
+import Pinger_pb2_grpc
+
+ECHO = "/grpckit.greeter.Greeter/Echo"
+
+
+def test_fused_pipeline(app, serve, monkeypatch):
+    svc = Service(name="Greeter")
+    events = []
+
+    @svc.route
+    def Echo(name, age):
+        events.append(("route", request.method))
+        if name == "missing":
+            raise NotFound(msg=f"no {name}")
+        if name == "invalid":
+            raise KeyError(name)
+        if name == "crash":
+            raise RuntimeError(name)
+        return dict(name=name, age=age)
+
+    @svc.route
+    def Count(n):
+        for i in range(n):
+            # the request context is kept until the stream is exhausted
+            events.append(("stream", request.method))
+            yield dict(i=i)
+
+    @app.before_request
+    def before(request, context):
+        events.append("before")
+
+    @app.after_request
+    def after(response):
+        events.append("after")
+        return response
+
+    @app.teardown_request
+    def teardown(exc):
+        events.append(("teardown", type(exc).__name__ if exc else None))
+
+    @app.exception_handler(KeyError)
+    def invalid(e, context):
+        context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+        context.set_details(f"invalid {e}")
+        return Greeter_pb2.Echo_response()
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+
+    # the handlers are fused at bind time, nothing is wrapped per call
+    fused = app._pipeline._handlers[ECHO][1]
+    monkeypatch.setattr(app._pipeline, "wrap", None)
+    assert stub.Echo(Greeter_pb2.Echo_request(name="a"), timeout=5).name == "a"
+    assert events == ["before", ("route", ECHO), "after", ("teardown", None)]
+    assert app._pipeline._handlers[ECHO][1] is fused
+
+    events.clear()
+    assert [r.i for r in stub.Count(Greeter_pb2.Count_request(n=2), timeout=5)] == [0, 1]
+    method = "/grpckit.greeter.Greeter/Count"
+    assert events == ["before", "after", ("stream", method), ("stream", method), ("teardown", None)]
+
+    for name, code, details in (
+        ("missing", grpc.StatusCode.NOT_FOUND, "no missing"),
+        ("invalid", grpc.StatusCode.INVALID_ARGUMENT, "invalid 'invalid'"),
+        ("crash", grpc.StatusCode.INTERNAL, "Internal Error"),
+    ):
+        events.clear()
+        with pytest.raises(grpc.RpcError) as excinfo:
+            stub.Echo(Greeter_pb2.Echo_request(name=name), timeout=5)
+        assert (excinfo.value.code(), excinfo.value.details()) == (code, details)
+        # after funcs are skipped, and teardown sees the exception
+        exc = {"missing": "NotFound", "invalid": "KeyError", "crash": "RuntimeError"}[name]
+        assert events == ["before", ("route", ECHO), ("teardown", exc)]
+
+
+def test_before_request_returns_response(app, serve):
+    svc = Service(name="Greeter")
+
+    @svc.route
+    def Echo(name, age):
+        raise AssertionError("not called")
+
+    @app.before_request
+    def cached(request, context):
+        return Greeter_pb2.Echo_response(name="cached")
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+    assert stub.Echo(Greeter_pb2.Echo_request(name="a"), timeout=5).name == "cached"
+
+
+def test_scoped_hooks(app, serve):
+    greeter, pinger = Service(name="Greeter"), Service(name="Pinger")
+    events = []
+
+    def hook(name):
+        def before(request, context):
+            events.append(f"before {name}")
+
+        def after(response):
+            events.append(f"after {name}")
+            return response
+
+        return before, after
+
+    app_before, app_after = hook("app")
+    app.before_request(app_before)
+    app.after_request(app_after)
+    # the funcs of app scoped to a service, by the name of service
+    scoped_before, scoped_after = hook("app.Greeter")
+    app.before_request_funcs["Greeter"].append(scoped_before)
+    app.after_request_funcs["Greeter"].append(scoped_after)
+    svc_before, svc_after = hook("Greeter")
+    greeter.before_request(svc_before)
+    greeter.after_request(svc_after)
+    route_before, route_after = hook("Echo")
+
+    @greeter.route(before=[route_before], after=[route_after])
+    def Echo(name, age):
+        events.append("Echo")
+        return dict(name=name)
+
+    @greeter.route
+    def Slow(name, seconds):
+        events.append("Slow")
+        return dict(name=name)
+
+    @pinger.route
+    def Ping(name):
+        events.append("Ping")
+        return dict(name=name)
+
+    app.register_service(greeter)
+    app.register_service(pinger)
+    channel = serve(app)
+    stub, ping = Greeter_pb2_grpc.GreeterStub(channel), Pinger_pb2_grpc.PingerStub(channel)
+
+    stub.Echo(Greeter_pb2.Echo_request(name="a"), timeout=5)
+    scopes = ["app", "app.Greeter", "Greeter"]
+    assert events == [
+        *(f"before {scope}" for scope in scopes + ["Echo"]),
+        "Echo",
+        *(f"after {scope}" for scope in reversed(scopes + ["Echo"])),
+    ]
+    events.clear()
+    stub.Slow(Greeter_pb2.Slow_request(name="a"), timeout=5)
+    assert events == [
+        *(f"before {scope}" for scope in scopes),
+        "Slow",
+        *(f"after {scope}" for scope in reversed(scopes)),
+    ]
+    events.clear()
+    ping.Ping(Pinger_pb2.Ping_request(name="a"), timeout=5)
+    assert events == ["before app", "Ping", "after app"]
+
+    # the chains are resolved once per method
+    before, after, _ = app._pipeline._plans[ECHO]
+    assert before == [app_before, scoped_before, svc_before, route_before]
+    assert after == [route_after, svc_after, scoped_after, app_after]
@@ -0,0 +1,54 @@
+import logging
+import os
+import signal
+
+import pytest
+
+from grpckit.constant import K_GRPCKIT_WORKER_ID
+from grpckit.prefork import Supervisor, _exit_code
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+
+
+def _wait_child(code=None, signum=None):
+    pid = os.fork()
+    if not pid:
+        if signum is not None:
+            os.kill(os.getpid(), signum)
+        os._exit(code)
+    return os.waitpid(pid, 0)[1]
+
+
+def test_exit_code():
+    assert _exit_code(_wait_child(code=0)) == 0
+    assert _exit_code(_wait_child(code=3)) == 3
+    assert _exit_code(_wait_child(signum=signal.SIGKILL)) == -signal.SIGKILL
+
+
+def test_supervisor_restarts_crashed_worker(tmp_path, caplog):
+    runs = tmp_path / "runs"
+
+    def target():
+        with open(runs, "a") as f:
+            f.write(f"{os.environ[K_GRPCKIT_WORKER_ID]}\n")
+        if len(runs.read_text().split()) < 3:
+            raise SystemExit(3)
+        # the third run stops the supervisor, which forwards the signal back
+        os.kill(os.getppid(), signal.SIGTERM)
+        while True:
+            signal.pause()
+
+    with caplog.at_level(logging.WARNING):
+        Supervisor(target, workers=1, restart_delay=0).run()
+
+    assert runs.read_text().split() == ["0", "0", "0"]
+    restarts = [r.getMessage() for r in caplog.records if "restarting" in r.getMessage()]
+    assert len(restarts) == 2
+    assert all("worker 0" in m and "status 3" in m for m in restarts)
+    # the handlers of supervisor are uninstalled
+    assert signal.getsignal(signal.SIGTERM) is signal.SIG_DFL
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError, match="Invalid workers"):
+        Supervisor(lambda: None, workers=0)
@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+
+from grpckit import Service
+from grpckit.process import add_process_pool, has_process_pool_started, shutdown_process_pools
+from grpckit.route import Route
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+import kit_pb2
+
+
+# the functions run in the worker processes are resolved by module and name, so this
+# module is imported by them too, without conftest which compiles the protos
+def Echo(name, age):
+    return dict(name=name, age=os.getpid())
+
+
+def Reduced(request, context):
+    return dict(name=type(request).__name__, age=request.age)
+
+
+def test_reduced_route_in_process():
+    add_process_pool("tests", 1)
+    route = Route(
+        "Kit",
+        Reduced,
+        request_pb=kit_pb2.EchoRequest,
+        response_pb=kit_pb2.EchoResponse,
+        reduced=True,
+        executor="tests",
+    )
+    route.compile()
+    assert not has_process_pool_started("tests")
+    try:
+        # the view is sent as WrappedDict, and the context stays in the server
+        response = route(kit_pb2.EchoRequest(age=3), object())
+        assert response == kit_pb2.EchoResponse(name="WrappedDict", age=3)
+        assert has_process_pool_started("tests")
+    finally:
+        shutdown_process_pools()
+
+
+def test_only_plain_unary_route_in_process():
+    def Local(name):
+        return dict(name=name)
+
+    with pytest.raises(ValueError, match="no process pool"):
+        Route("Kit", Echo, kit_pb2.EchoRequest, kit_pb2.EchoResponse, executor="nope").compile()
+    with pytest.raises(ValueError, match="module level"):
+        Route("Kit", Local, kit_pb2.EchoRequest, kit_pb2.EchoResponse, executor="process").compile()
+
+
+def test_served_process_route(app, serve):
+    svc = Service(name="Greeter")
+    svc.route(executor="process")(Echo)
+    app.add_process_pool("process", 1)
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+
+    pids = {stub.Echo(Greeter_pb2.Echo_request(name="a"), timeout=30).age for _ in range(2)}
+    assert len(pids) == 1 and os.getpid() not in pids
+    app.stop(0)
+    # the pool is shut down with the server
+    deadline = time.monotonic() + 10
+    while has_process_pool_started("process") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not has_process_pool_started("process")
@@ -0,0 +1,131 @@
+import pytest
+
+from grpckit.route import Route, bind_handler
+from grpckit.types import MessageView, WrappedDict
+from grpckit.utils.parser import (
+    PARSER_ENGINE_DESCRIPTOR,
+    PARSER_ENGINE_JSON,
+    JsonMessageToDict,
+    set_parser_engine,
+)
+
+import kit_pb2
+
+PB_MODELS = {
+    "Kit__pb2.Echo_request": kit_pb2.EchoRequest,
+    "Kit__pb2.Echo_response": kit_pb2.EchoResponse,
+}
+
+
+@pytest.fixture(params=[PARSER_ENGINE_DESCRIPTOR, PARSER_ENGINE_JSON])
+def engine(request):
+    set_parser_engine(request.param)
+    yield request.param
+    set_parser_engine(PARSER_ENGINE_DESCRIPTOR)
+
+
+def compile_route(func, **kwargs):
+    route = Route("Kit", func, **kwargs)
+    route.compile(PB_MODELS)
+    return route
+
+
+def test_transparent_route(engine):
+    def Echo(name, age):
+        return dict(name=name.upper(), age=age + 1)
+
+    route = compile_route(Echo)
+    response = route(kit_pb2.EchoRequest(name="abc", age=1), None)
+    assert response == kit_pb2.EchoResponse(name="ABC", age=2)
+    assert route.request_deserializer == kit_pb2.EchoRequest.FromString
+    assert route.response_serializer == kit_pb2.EchoResponse.SerializeToString
+
+
+def test_extractors_convert_bound_fields(engine):
+    seen = []
+
+    def Echo(inner):
+        seen.append(inner)
+        return dict()
+
+    route = compile_route(Echo)
+    message = kit_pb2.EchoRequest(inner=kit_pb2.Inner(name="i", big=5, nums=[1]))
+    route(message, None)
+    assert seen == [JsonMessageToDict(message)["inner"]]
+    # unset message field is a missing argument
+    with pytest.raises(ValueError, match="missing inner"):
+        route(kit_pb2.EchoRequest(), None)
+
+
+def test_argument_must_be_field():
+    def Echo(nope):
+        return dict()
+
+    with pytest.raises(ValueError, match="not a field of grpckit.test.EchoRequest"):
+        compile_route(Echo)
+
+
+def test_missing_pb_model():
+    def Other():
+        return dict()
+
+    with pytest.raises(ValueError, match="Can't find 'Kit__pb2.Other_request'"):
+        compile_route(Other)
+    route = compile_route(Other, request_pb=kit_pb2.EchoRequest, response_pb=kit_pb2.EchoResponse)
+    assert route(kit_pb2.EchoRequest(), None) == kit_pb2.EchoResponse()
+
+
+def test_responses(engine):
+    route = compile_route(
+        lambda: ("tags", ["a", "b"]),
+        request_pb=kit_pb2.EchoRequest,
+        response_pb=kit_pb2.EchoResponse,
+    )
+    assert route(kit_pb2.EchoRequest(), None) == kit_pb2.EchoResponse(tags=["a", "b"])
+
+    def Echo():
+        return ["not", "dict"]
+
+    with pytest.raises(AssertionError):
+        compile_route(Echo)(kit_pb2.EchoRequest(), None)
+
+
+def test_reduced_route(engine):
+    def Echo(request, context):
+        # the JSON engine converts the whole request
+        assert isinstance(request, WrappedDict if engine == PARSER_ENGINE_JSON else MessageView)
+        return dict(name=request.name, age=context)
+
+    route = compile_route(Echo, reduced=True)
+    assert route(kit_pb2.EchoRequest(name="x"), 3) == kit_pb2.EchoResponse(name="x", age=3)
+
+    def Bad(request, context):
+        return ("name", "x")
+
+    with pytest.raises(AssertionError):
+        compile_route(
+            Bad, reduced=True, request_pb=kit_pb2.EchoRequest, response_pb=kit_pb2.EchoResponse
+        )(kit_pb2.EchoRequest(), None)
+
+
+def test_raw_route():
+    def Echo(name):
+        return kit_pb2.EchoResponse(name=name)
+
+    route = compile_route(Echo, transparent_transform=False)
+    assert route(kit_pb2.EchoRequest(name="raw"), None) == kit_pb2.EchoResponse(name="raw")
+
+
+def test_bind_handler():
+    def plain():
+        return 0
+
+    def with_request(request):
+        return request
+
+    def with_both(request, context):
+        return request, context
+
+    assert bind_handler(plain)(1, 2) == 0
+    assert bind_handler(with_request)(1, 2) == 1
+    assert bind_handler(with_both)(1, 2) == (1, 2)
@@ -0,0 +1,85 @@
+import grpc
+import pytest
+
+from grpckit import Service
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+
+SERVICE = Greeter_pb2.DESCRIPTOR.services_by_name["Greeter"]
+MESSAGES = {
+    message.DESCRIPTOR.full_name: message
+    for message in (Greeter_pb2.Echo_request, Greeter_pb2.Echo_response)
+}
+
+
+class HandlerCallDetails(grpc.HandlerCallDetails):
+    def __init__(self, method):
+        self.method = method
+        self.invocation_metadata = ()
+
+
+def greeter():
+    svc = Service(name="Greeter")
+
+    @svc.route
+    def Echo(name, age):
+        return dict(name=name, age=age + 1)
+
+    return svc
+
+
+def test_methods_map_to_compiled_handlers():
+    svc = greeter()
+    # a missing pb model fails when the service is bound
+    with pytest.raises(ValueError, match="Can't find 'Greeter__pb2.Echo_response'"):
+        svc.compile({"Greeter__pb2.Echo_request": Greeter_pb2.Echo_request})
+
+    svc.compile(
+        {
+            "Greeter__pb2.Echo_request": Greeter_pb2.Echo_request,
+            "Greeter__pb2.Echo_response": Greeter_pb2.Echo_response,
+        }
+    )
+    generic = svc.generic_handler(SERVICE, MESSAGES)
+    assert generic.service_name() == "grpckit.greeter.Greeter"
+
+    handler = generic.service(HandlerCallDetails("/grpckit.greeter.Greeter/Echo"))
+    assert handler.request_deserializer == Greeter_pb2.Echo_request.FromString
+    assert not handler.request_streaming and not handler.response_streaming
+    # the compiled handler is the behavior itself, without servicer dispatch
+    assert handler.unary_unary is svc.Echo is svc._handlers["Echo"]
+    response = handler.unary_unary(Greeter_pb2.Echo_request(name="a", age=1), None)
+    assert response == Greeter_pb2.Echo_response(name="a", age=2)
+
+    # methods without route are left to gRPC
+    assert generic.service(HandlerCallDetails("/grpckit.greeter.Greeter/Count")) is None
+
+
+def test_streaming_must_match_descriptor():
+    svc = Service(name="Greeter")
+
+    @svc.route
+    def Count(n):
+        return dict(i=n)
+
+    svc.compile(
+        {
+            "Greeter__pb2.Count_request": Greeter_pb2.Count_request,
+            "Greeter__pb2.Count_response": Greeter_pb2.Count_response,
+        }
+    )
+    with pytest.raises(ValueError, match="should be a generator"):
+        svc.generic_handler(SERVICE, MESSAGES)
+
+
+def test_served_by_generic_handler(app, serve):
+    app.register_service(greeter())
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+
+    response = stub.Echo(Greeter_pb2.Echo_request(name="a", age=1))
+    assert response == Greeter_pb2.Echo_response(name="a", age=2)
+
+    with pytest.raises(grpc.RpcError) as excinfo:
+        stub.Slow(Greeter_pb2.Slow_request())
+    assert excinfo.value.code() == grpc.StatusCode.UNIMPLEMENTED
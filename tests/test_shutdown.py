@@ -0,0 +1,120 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import grpc
+import pytest
+
+from grpckit import Service
+
+from conftest import _out, free_port, wait_for
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# how gRPC fails the calls rejected or cancelled by a stopping server
+STOPPED = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.CANCELLED)
+
+
+def slow_service(started, release):
+    svc = Service(name="Greeter")
+
+    @svc.route
+    def Slow(name, seconds):
+        started.set()
+        release.wait(5)
+        return dict(name=name)
+
+    return svc
+
+
+def test_stop_drains_in_flight_calls(app, serve):
+    started, release = threading.Event(), threading.Event()
+    stopped = []
+    app.on_shutdown(lambda: stopped.append(app.serving))
+    app.register_service(slow_service(started, release))
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+
+    call = stub.Slow.future(Greeter_pb2.Slow_request(name="in-flight"))
+    assert started.wait(5)
+    # the copy of the signal which follows at once doesn't cancel the call
+    app._handle_signal(signal.SIGTERM)
+    app._handle_signal(signal.SIGTERM)
+    assert not app.serving
+    with pytest.raises(grpc.RpcError) as excinfo:
+        stub.Slow(Greeter_pb2.Slow_request(name="new"), timeout=5)
+    assert excinfo.value.code() in STOPPED
+
+    release.set()
+    assert call.result(5).name == "in-flight"
+    wait_for(lambda: stopped == [False])
+
+
+def test_repeated_signal_stops_at_once(app, serve, monkeypatch):
+    monkeypatch.setattr("grpckit.app._REPEATED_SIGNAL_INTERVAL", 0)
+    started, release = threading.Event(), threading.Event()
+    app.register_service(slow_service(started, release))
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+
+    call = stub.Slow.future(Greeter_pb2.Slow_request(name="in-flight"))
+    assert started.wait(5)
+    app._handle_signal(signal.SIGINT)
+    app._handle_signal(signal.SIGINT)
+    with pytest.raises(grpc.RpcError) as excinfo:
+        call.result(5)
+    assert excinfo.value.code() in STOPPED
+    release.set()
+
+
+PREFORK_SERVER = """
+import os, sys, time
+from grpckit import GrpcKitApp, Service
+
+svc = Service(name="Greeter")
+
+@svc.route
+def Slow(name, seconds):
+    open(os.path.join(sys.argv[2], str(os.getpid())), "w").close()
+    time.sleep(seconds)
+    return dict(name=name)
+
+app = GrpcKitApp()
+app.register_service(svc)
+app.run("127.0.0.1", int(sys.argv[1]), workers=2)
+"""
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_prefork_drains_on_group_signal(tmp_path):
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, _out]))
+    # in a session of its own, like a server started by a terminal or a process manager
+    proc = subprocess.Popen(
+        [sys.executable, "-c", PREFORK_SERVER, str(port), str(tmp_path)],
+        cwd=_out,
+        env=env,
+        start_new_session=True,
+    )
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            grpc.channel_ready_future(channel).result(timeout=30)
+            stub = Greeter_pb2_grpc.GreeterStub(channel)
+            call = stub.Slow.future(Greeter_pb2.Slow_request(name="in-flight", seconds=1))
+            wait_for(lambda: os.listdir(tmp_path), timeout=10)
+
+            # both the supervisor and the workers get the signal of the group, and the
+            # supervisor forwards it to the workers again, the copy which arrives after
+            # the worker started draining is not merged with the first one
+            os.killpg(proc.pid, signal.SIGTERM)
+            time.sleep(0.1)
+            os.kill(int(os.listdir(tmp_path)[0]), signal.SIGTERM)
+            assert call.result(10).name == "in-flight"
+        assert proc.wait(15) == 0
+    finally:
+        if proc.poll() is None:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
@@ -0,0 +1,100 @@
+import threading
+
+from grpckit import Service
+from grpckit.route import Route
+from grpckit.types import MessageView
+
+import Greeter_pb2
+import Greeter_pb2_grpc
+import kit_pb2
+
+
+def test_request_stream_route():
+    seen = []
+
+    def Sum(requests):
+        total = 0
+        for r in requests:
+            seen.append(r)
+            total += r.age
+        return dict(age=total)
+
+    route = Route(
+        "Kit",
+        Sum,
+        request_pb=kit_pb2.EchoRequest,
+        response_pb=kit_pb2.EchoResponse,
+        request_streaming=True,
+    )
+    route.compile()
+    requests = iter([kit_pb2.EchoRequest(age=1), kit_pb2.EchoRequest(age=2)])
+    assert route(requests, None) == kit_pb2.EchoResponse(age=3)
+    assert all(isinstance(r, MessageView) for r in seen)
+
+
+def test_requests_are_read_when_they_arrive(app, serve):
+    svc = Service(name="Greeter")
+    first = threading.Event()
+
+    @svc.route(request_streaming=True)
+    def Sum(requests):
+        total = 0
+        for r in requests:
+            total += r.n
+            first.set()
+        return dict(total=total)
+
+    def requests():
+        yield Greeter_pb2.Sum_request(n=1)
+        # the route has the first message before the client sends the next one
+        assert first.wait(5)
+        yield Greeter_pb2.Sum_request(n=2)
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+    assert stub.Sum(requests(), timeout=10).total == 3
+
+
+def test_response_stream_route():
+    produced = []
+
+    def Echo(name):
+        for i in range(3):
+            produced.append(i)
+            yield dict(name=name, age=i)
+
+    route = Route("Kit", Echo, request_pb=kit_pb2.EchoRequest, response_pb=kit_pb2.EchoResponse)
+    route.compile()
+    assert route.response_streaming
+    # every response is produced and converted when it's pulled
+    stream = route(kit_pb2.EchoRequest(name="s"), None)
+    assert produced == []
+    assert next(stream) == kit_pb2.EchoResponse(name="s", age=0)
+    assert produced == [0]
+    assert [r.age for r in stream] == [1, 2]
+
+
+def test_cancelled_stream_closes_generator(app, serve):
+    svc = Service(name="Greeter")
+    closed = threading.Event()
+    produced = []
+
+    @svc.route
+    def Count(n):
+        try:
+            for i in range(n):
+                produced.append(i)
+                yield dict(i=i)
+        finally:
+            closed.set()
+
+    app.register_service(svc)
+    stub = Greeter_pb2_grpc.GreeterStub(serve(app))
+    stream = stub.Count(Greeter_pb2.Count_request(n=10**9))
+    assert next(stream).i == 0
+    stream.cancel()
+    assert closed.wait(5)
+    # flow control stops the generator long before it's exhausted
+    assert len(produced) < 10**6
+
+    assert [r.i for r in stub.Count(Greeter_pb2.Count_request(n=3))] == [0, 1, 2]
@@ -0,0 +1,87 @@
+import pickle
+
+import pytest
+
+from grpckit.route import Route
+from grpckit.types import MessageView, WrappedDict
+from grpckit.utils.parser import MessageToDict
+
+import kit_pb2
+
+
+def _message():
+    return kit_pb2.EchoRequest(name="a", age=3, inner=kit_pb2.Inner(name="i", big=5, nums=[1, 2]))
+
+
+def test_fields_are_converted_when_read():
+    message = _message()
+    view = MessageView(message)
+    assert view._cache == {}
+    assert view.name == "a"
+    assert view["inner"] == {"name": "i", "big": "5", "nums": [1, 2]}
+    assert set(view._cache) == {"name", "inner"}
+    # the converted value is kept, the message is read once per field
+    assert view.inner is view["inner"]
+
+
+def test_keys_match_message_to_dict():
+    for message in (_message(), kit_pb2.EchoRequest()):
+        view = MessageView(message)
+        expected = MessageToDict(message)
+        assert dict(view) == expected == view.to_dict()
+        assert view == expected
+        assert len(view) == len(expected)
+
+    # unset message field is missing, which fails the argument check of routes
+    view = MessageView(kit_pb2.EchoRequest(name="a"))
+    assert not hasattr(view, "inner")
+    assert "inner" not in view
+    assert view.get("inner") is None
+    with pytest.raises(KeyError):
+        view["inner"]
+    with pytest.raises(AttributeError):
+        view.nope
+
+
+def test_view_is_read_only():
+    view = MessageView(_message())
+    with pytest.raises(AttributeError, match="read-only"):
+        view.name = "b"
+    with pytest.raises(TypeError):
+        view["name"] = "b"
+    # to_dict gives a copy which can be changed
+    data = view.to_dict()
+    data["name"] = "b"
+    assert view.name == "a"
+
+
+def test_pickled_as_wrapped_dict():
+    view = pickle.loads(pickle.dumps(MessageView(_message())))
+    assert type(view) is WrappedDict
+    assert view.inner["big"] == "5"
+
+
+def test_well_known_type():
+    from google.protobuf.struct_pb2 import Struct
+
+    message = Struct()
+    message.update({"k": "v"})
+    view = MessageView(message)
+    assert view["k"] == "v"
+    assert list(view) == ["k"]
+
+
+def test_reduced_route_reads_view():
+    seen = []
+
+    def Echo(request, context):
+        seen.append(request)
+        return dict(name=request.name)
+
+    route = Route(
+        "Kit", Echo, request_pb=kit_pb2.EchoRequest, response_pb=kit_pb2.EchoResponse, reduced=True
+    )
+    route.compile()
+    assert route(_message(), None) == kit_pb2.EchoResponse(name="a")
+    assert isinstance(seen[0], MessageView)
+    assert set(seen[0]._cache) == {"name"}